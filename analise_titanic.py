@@ -1,66 +1,42 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.backends.backend_pdf import PdfPages
 import os
+import io
+import contextlib
 
-# Configurando estilo de plots
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set(font_scale=1.2)
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['axes.facecolor'] = '#f0f0f0'
+from cli_comum import carregar_cubo, executar, silencioso, texto_ic, texto_p
+from cubo_sobrevivencia import obter_cubo
+from instrumentacao import instrumentar
+from intervalos import resumo_intervalos
+from permutacoes import resumo_testes
+from resultados import para_json
+
+# matplotlib e seaborn são importados apenas dentro das funções de plotagem
+# (módulo graficos), para que o modo somente-estatísticas inicie rápido
 
 # Definindo paleta de cores para gráficos
 cores = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6']
 
-# Função para carregar e pré-processar dados
-def carregar_dados(arquivo):
-    print(f"Carregando dados de {arquivo}...")
-    # Carregamento dos dados
-    df = pd.read_csv(arquivo, sep=';')
-    
-    # Visualização inicial dos dados
-    print("\nInformações do Dataset:")
-    print(f"Número de registros: {df.shape[0]}")
-    print(f"Número de colunas: {df.shape[1]}")
-    
-    # Verificação de valores nulos
-    print("\nValores nulos por coluna:")
-    print(df.isnull().sum())
-    
-    # Conversão de tipos - tratar valores nulos antes da conversão para int
-    # Primeiro, vamos garantir que não haja valores nulos em 'survived'
-    if df['survived'].isnull().any():
-        print(f"Atenção: {df['survived'].isnull().sum()} valores nulos encontrados na coluna 'survived'. Preenchendo com 0.")
-        df['survived'] = df['survived'].fillna(0)
-    
-    # Agora podemos converter com segurança
-    df['survived'] = df['survived'].astype(int)
-    
-    # Tratamento da coluna de idade
-    df['age'] = pd.to_numeric(df['age'], errors='coerce')
-    
-    # Criando coluna para classificar como criança (menos de 18 anos)
-    df['is_child'] = df['age'] < 18
-    
-    # Convertendo valores de fare (tarifa) para numérico
-    df['fare'] = df['fare'].str.replace(',', '.').astype(float)
-    
-    return df
+# Os p-valores dos testes de permutação ficam em uma linha própria abaixo de cada afirmação
+RECUO_TESTES = "\n     "
 
 # Função para analisar taxa de sobrevivência por sexo
-def analisar_sobrevivencia_por_sexo(df):
-    print("\nAnálise de sobrevivência por sexo:")
-    sobrev_sexo = df.groupby('sex')['survived'].mean().reset_index()
-    total_por_sexo = df.groupby('sex').size().reset_index(name='total')
-    
-    sobrev_sexo = pd.merge(sobrev_sexo, total_por_sexo, on='sex')
-    sobrev_sexo['survived_count'] = (sobrev_sexo['survived'] * sobrev_sexo['total']).astype(int)
-    sobrev_sexo['taxa_sobrevivencia'] = sobrev_sexo['survived'] * 100
-    
-    print(sobrev_sexo[['sex', 'taxa_sobrevivencia', 'survived_count', 'total']])
-    
+# (`dados` pode ser o DataFrame ou o cubo de sobrevivência já construído;
+# com `plotar=False` apenas a tabela é calculada e a figura fica como None,
+# e com `exibir=False` nada é impresso no console)
+@instrumentar
+def analisar_sobrevivencia_por_sexo(dados, plotar=True, exibir=True):
+    saida = print if exibir else silencioso
+    saida("\nAnálise de sobrevivência por sexo:")
+    sobrev_sexo = obter_cubo(dados).tabela(['sex'])
+    
+    saida(sobrev_sexo[['sex', 'taxa_sobrevivencia', 'survived_count', 'total']])
+    
+    fig = plotar_sobrevivencia_por_sexo(sobrev_sexo) if plotar else None
+    return fig, sobrev_sexo
+
+# Função para gerar o gráfico de sobrevivência por sexo
+def plotar_sobrevivencia_por_sexo(sobrev_sexo):
+    from graficos import plt, sns
     fig, ax = plt.subplots()
     sns.barplot(x='sex', y='taxa_sobrevivencia', data=sobrev_sexo, palette=[cores[0], cores[1]], ax=ax)
     ax.set_title('Taxa de Sobrevivência por Sexo')
@@ -74,25 +50,26 @@ def analisar_sobrevivencia_por_sexo(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=12, color='black')
     
-    return fig, sobrev_sexo
+    return fig
 
 # Função para analisar taxa de sobrevivência por idade (crianças vs adultos)
-def analisar_sobrevivencia_por_idade(df):
-    print("\nAnálise de sobrevivência por idade (crianças vs adultos):")
-    # Remover registros sem idade definida
-    df_idade = df.dropna(subset=['age'])
-    
-    sobrev_idade = df_idade.groupby('is_child')['survived'].mean().reset_index()
-    total_por_idade = df_idade.groupby('is_child').size().reset_index(name='total')
-    
-    sobrev_idade = pd.merge(sobrev_idade, total_por_idade, on='is_child')
-    sobrev_idade['survived_count'] = (sobrev_idade['survived'] * sobrev_idade['total']).astype(int)
-    sobrev_idade['taxa_sobrevivencia'] = sobrev_idade['survived'] * 100
+@instrumentar
+def analisar_sobrevivencia_por_idade(dados, plotar=True, exibir=True):
+    saida = print if exibir else silencioso
+    saida("\nAnálise de sobrevivência por idade (crianças vs adultos):")
+    # Registros sem idade definida ficam fora do eixo is_child do cubo
+    sobrev_idade = obter_cubo(dados).tabela(['is_child'])
     
     sobrev_idade['categoria'] = sobrev_idade['is_child'].map({True: 'Crianças (<18)', False: 'Adultos (≥18)'})
     
-    print(sobrev_idade[['categoria', 'taxa_sobrevivencia', 'survived_count', 'total']])
+    saida(sobrev_idade[['categoria', 'taxa_sobrevivencia', 'survived_count', 'total']])
     
+    fig = plotar_sobrevivencia_por_idade(sobrev_idade) if plotar else None
+    return fig, sobrev_idade
+
+# Função para gerar o gráfico de sobrevivência por idade
+def plotar_sobrevivencia_por_idade(sobrev_idade):
+    from graficos import plt, sns
     fig, ax = plt.subplots()
     sns.barplot(x='categoria', y='taxa_sobrevivencia', data=sobrev_idade, palette=[cores[2], cores[3]], ax=ax)
     ax.set_title('Taxa de Sobrevivência por Idade')
@@ -105,20 +82,23 @@ def analisar_sobrevivencia_por_idade(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=12, color='black')
     
-    return fig, sobrev_idade
+    return fig
 
 # Função para analisar taxa de sobrevivência por classe
-def analisar_sobrevivencia_por_classe(df):
-    print("\nAnálise de sobrevivência por classe:")
-    sobrev_classe = df.groupby('pclass')['survived'].mean().reset_index()
-    total_por_classe = df.groupby('pclass').size().reset_index(name='total')
-    
-    sobrev_classe = pd.merge(sobrev_classe, total_por_classe, on='pclass')
-    sobrev_classe['survived_count'] = (sobrev_classe['survived'] * sobrev_classe['total']).astype(int)
-    sobrev_classe['taxa_sobrevivencia'] = sobrev_classe['survived'] * 100
+@instrumentar
+def analisar_sobrevivencia_por_classe(dados, plotar=True, exibir=True):
+    saida = print if exibir else silencioso
+    saida("\nAnálise de sobrevivência por classe:")
+    sobrev_classe = obter_cubo(dados).tabela(['pclass'])
     
-    print(sobrev_classe[['pclass', 'taxa_sobrevivencia', 'survived_count', 'total']])
+    saida(sobrev_classe[['pclass', 'taxa_sobrevivencia', 'survived_count', 'total']])
     
+    fig = plotar_sobrevivencia_por_classe(sobrev_classe) if plotar else None
+    return fig, sobrev_classe
+
+# Função para gerar o gráfico de sobrevivência por classe
+def plotar_sobrevivencia_por_classe(sobrev_classe):
+    from graficos import plt, sns
     fig, ax = plt.subplots()
     sns.barplot(x='pclass', y='taxa_sobrevivencia', data=sobrev_classe, palette=cores[:3], ax=ax)
     ax.set_title('Taxa de Sobrevivência por Classe')
@@ -131,20 +111,23 @@ def analisar_sobrevivencia_por_classe(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=12, color='black')
     
-    return fig, sobrev_classe
+    return fig
 
 # Função para análise cruzada: classe, sexo e taxa de sobrevivência
-def analisar_sobrevivencia_classe_sexo(df):
-    print("\nAnálise cruzada de sobrevivência por classe e sexo:")
-    sobrev_classe_sexo = df.groupby(['pclass', 'sex'])['survived'].mean().reset_index()
-    total_por_classe_sexo = df.groupby(['pclass', 'sex']).size().reset_index(name='total')
+@instrumentar
+def analisar_sobrevivencia_classe_sexo(dados, plotar=True, exibir=True):
+    saida = print if exibir else silencioso
+    saida("\nAnálise cruzada de sobrevivência por classe e sexo:")
+    sobrev_classe_sexo = obter_cubo(dados).tabela(['pclass', 'sex'])
     
-    sobrev_classe_sexo = pd.merge(sobrev_classe_sexo, total_por_classe_sexo, on=['pclass', 'sex'])
-    sobrev_classe_sexo['survived_count'] = (sobrev_classe_sexo['survived'] * sobrev_classe_sexo['total']).astype(int)
-    sobrev_classe_sexo['taxa_sobrevivencia'] = sobrev_classe_sexo['survived'] * 100
-    
-    print(sobrev_classe_sexo[['pclass', 'sex', 'taxa_sobrevivencia', 'survived_count', 'total']])
+    saida(sobrev_classe_sexo[['pclass', 'sex', 'taxa_sobrevivencia', 'survived_count', 'total']])
     
+    fig = plotar_sobrevivencia_classe_sexo(sobrev_classe_sexo) if plotar else None
+    return fig, sobrev_classe_sexo
+
+# Função para gerar o gráfico cruzado por classe e sexo
+def plotar_sobrevivencia_classe_sexo(sobrev_classe_sexo):
+    from graficos import plt, sns
     fig, ax = plt.subplots()
     sns.barplot(x='pclass', y='taxa_sobrevivencia', hue='sex', data=sobrev_classe_sexo, palette=[cores[0], cores[1]], ax=ax)
     ax.set_title('Taxa de Sobrevivência por Classe e Sexo')
@@ -158,25 +141,26 @@ def analisar_sobrevivencia_classe_sexo(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=10, color='black')
     
-    return fig, sobrev_classe_sexo
+    return fig
 
 # Função para análise cruzada: classe, idade (criança/adulto) e taxa de sobrevivência
-def analisar_sobrevivencia_classe_idade(df):
-    print("\nAnálise cruzada de sobrevivência por classe e idade:")
-    # Remover registros sem idade definida
-    df_idade = df.dropna(subset=['age'])
-    
-    sobrev_classe_idade = df_idade.groupby(['pclass', 'is_child'])['survived'].mean().reset_index()
-    total_por_classe_idade = df_idade.groupby(['pclass', 'is_child']).size().reset_index(name='total')
-    
-    sobrev_classe_idade = pd.merge(sobrev_classe_idade, total_por_classe_idade, on=['pclass', 'is_child'])
-    sobrev_classe_idade['survived_count'] = (sobrev_classe_idade['survived'] * sobrev_classe_idade['total']).astype(int)
-    sobrev_classe_idade['taxa_sobrevivencia'] = sobrev_classe_idade['survived'] * 100
+@instrumentar
+def analisar_sobrevivencia_classe_idade(dados, plotar=True, exibir=True):
+    saida = print if exibir else silencioso
+    saida("\nAnálise cruzada de sobrevivência por classe e idade:")
+    # Registros sem idade definida ficam fora do eixo is_child do cubo
+    sobrev_classe_idade = obter_cubo(dados).tabela(['pclass', 'is_child'])
     
     sobrev_classe_idade['categoria'] = sobrev_classe_idade['is_child'].map({True: 'Crianças (<18)', False: 'Adultos (≥18)'})
     
-    print(sobrev_classe_idade[['pclass', 'categoria', 'taxa_sobrevivencia', 'survived_count', 'total']])
+    saida(sobrev_classe_idade[['pclass', 'categoria', 'taxa_sobrevivencia', 'survived_count', 'total']])
     
+    fig = plotar_sobrevivencia_classe_idade(sobrev_classe_idade) if plotar else None
+    return fig, sobrev_classe_idade
+
+# Função para gerar o gráfico cruzado por classe e idade
+def plotar_sobrevivencia_classe_idade(sobrev_classe_idade):
+    from graficos import plt, sns
     fig, ax = plt.subplots()
     sns.barplot(x='pclass', y='taxa_sobrevivencia', hue='categoria', data=sobrev_classe_idade, palette=[cores[2], cores[3]], ax=ax)
     ax.set_title('Taxa de Sobrevivência por Classe e Idade')
@@ -189,99 +173,181 @@ def analisar_sobrevivencia_classe_idade(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=10, color='black')
     
-    return fig, sobrev_classe_idade
+    return fig
+
+# Função para calcular tabelas e conclusões sem gerar gráficos nem imprimir resultados
+# (`opcoes_carga` são repassadas para carregar_cubo)
+def calcular_estatisticas(arquivo, **opcoes_carga):
+    return estatisticas_do_cubo(carregar_cubo(arquivo, **opcoes_carga))
+
+# Função que calcula as tabelas, intervalos, testes e conclusões a partir de um cubo já carregado
+def estatisticas_do_cubo(cubo):
+    tabelas = {
+        'sexo': analisar_sobrevivencia_por_sexo(cubo, plotar=False, exibir=False)[1],
+        'idade': analisar_sobrevivencia_por_idade(cubo, plotar=False, exibir=False)[1],
+        'classe': analisar_sobrevivencia_por_classe(cubo, plotar=False, exibir=False)[1],
+        'classe_sexo': analisar_sobrevivencia_classe_sexo(cubo, plotar=False, exibir=False)[1],
+        'classe_idade': analisar_sobrevivencia_classe_idade(cubo, plotar=False, exibir=False)[1],
+    }
+    intervalos = resumo_intervalos(cubo)
+    testes = resumo_testes(cubo)
+    conclusoes = gerar_conclusoes(
+        tabelas['sexo'], tabelas['idade'], tabelas['classe_sexo'], tabelas['classe_idade'],
+        intervalos=intervalos, testes=testes, exibir=False
+    )
+    return {'tabelas': tabelas, 'intervalos': intervalos, 'testes': testes, 'conclusoes': conclusoes}
+
+# Função que monta as páginas do relatório como pares (função, argumentos), na ordem do PDF
+def paginas_analise_titanic(dados_sexo, dados_idade, dados_classe, dados_classe_sexo, dados_classe_idade):
+    return [
+        (plotar_sobrevivencia_por_sexo, (dados_sexo,)),
+        (plotar_sobrevivencia_por_idade, (dados_idade,)),
+        (plotar_sobrevivencia_por_classe, (dados_classe,)),
+        (plotar_sobrevivencia_classe_sexo, (dados_classe_sexo,)),
+        (plotar_sobrevivencia_classe_idade, (dados_classe_idade,)),
+    ]
+
+# Função que monta as seções do relatório HTML (título, gráfico SVG e tabela), na ordem do PDF
+def secoes_html_analise_titanic(dados_sexo, dados_idade, dados_classe, dados_classe_sexo, dados_classe_idade):
+    from relatorio_html import barras_da_tabela
+    sexos = {'female': 'Feminino', 'male': 'Masculino'}
+    return [
+        ('Sobrevivência por sexo', barras_da_tabela(
+            'Taxa de Sobrevivência por Sexo', dados_sexo, 'sex', 'taxa_sobrevivencia',
+            [cores[0], cores[1]], nomes=sexos, rotulo_x='Sexo'
+        ), dados_sexo),
+        ('Sobrevivência por idade', barras_da_tabela(
+            'Taxa de Sobrevivência por Idade', dados_idade, 'categoria', 'taxa_sobrevivencia',
+            [cores[2], cores[3]], rotulo_x='Categoria de Idade'
+        ), dados_idade),
+        ('Sobrevivência por classe', barras_da_tabela(
+            'Taxa de Sobrevivência por Classe', dados_classe, 'pclass', 'taxa_sobrevivencia',
+            cores[:3], rotulo_x='Classe'
+        ), dados_classe),
+        ('Sobrevivência por classe e sexo', barras_da_tabela(
+            'Taxa de Sobrevivência por Classe e Sexo', dados_classe_sexo, 'pclass', 'taxa_sobrevivencia',
+            [cores[0], cores[1]], grupo='sex', nomes=sexos, rotulo_x='Classe'
+        ), dados_classe_sexo),
+        ('Sobrevivência por classe e idade', barras_da_tabela(
+            'Taxa de Sobrevivência por Classe e Idade', dados_classe_idade, 'pclass', 'taxa_sobrevivencia',
+            [cores[2], cores[3]], grupo='categoria', rotulo_x='Classe'
+        ), dados_classe_idade),
+    ]
+
 
 # Função principal para executar todas as análises
-def analisar_dados_titanic(arquivo):
-    # Carregar e processar os dados
-    df = carregar_dados(arquivo)
+# (`formato='html'` gera o relatório HTML/SVG e o JSON, sem importar matplotlib)
+def analisar_dados_titanic(arquivo, processos=None, formato='pdf', **opcoes_carga):
+    cubo = carregar_cubo(arquivo, **opcoes_carga)
     
     # Remover o arquivo PDF antigo se ele existir
     output_pdf = 'analise_titanic.pdf'
-    if os.path.exists(output_pdf):
+    if formato == 'pdf' and os.path.exists(output_pdf):
         try:
             os.remove(output_pdf)
             print(f"Arquivo antigo {output_pdf} removido com sucesso.")
         except Exception as e:
             print(f"Não foi possível remover o arquivo antigo: {e}")
     
-    # Criar figuras individualmente
-    fig_sexo, dados_sexo = analisar_sobrevivencia_por_sexo(df)
-    fig_idade, dados_idade = analisar_sobrevivencia_por_idade(df)
-    fig_classe, dados_classe = analisar_sobrevivencia_por_classe(df)
-    fig_classe_sexo, dados_classe_sexo = analisar_sobrevivencia_classe_sexo(df)
-    fig_classe_idade, dados_classe_idade = analisar_sobrevivencia_classe_idade(df)
-    
-    # Gerar conclusões baseadas nos dados
-    gerar_conclusoes(dados_sexo, dados_idade, dados_classe_sexo, dados_classe_idade)
-    
-    # Salvar figuras em PDF após todas as análises estarem concluídas
-    try:
-        with PdfPages(output_pdf) as pdf:
-            pdf.savefig(fig_sexo)
-            pdf.savefig(fig_idade)
-            pdf.savefig(fig_classe)
-            pdf.savefig(fig_classe_sexo)
-            pdf.savefig(fig_classe_idade)
-            
-        # Fechar todas as figuras para liberar memória
-        plt.close(fig_sexo)
-        plt.close(fig_idade)
-        plt.close(fig_classe)
-        plt.close(fig_classe_sexo)
-        plt.close(fig_classe_idade)
-        
-        print(f"\nAnálise concluída. Os resultados foram salvos em '{output_pdf}'")
-    except Exception as e:
-        print(f"\nErro ao salvar o PDF: {e}")
-        print("Tentando salvar as figuras individualmente como arquivos PNG...")
-        
-        # Plano B: Salvar figuras individuais como PNG se o PDF falhar
-        fig_sexo.savefig('sobrevivencia_por_sexo.png')
-        fig_idade.savefig('sobrevivencia_por_idade.png')
-        fig_classe.savefig('sobrevivencia_por_classe.png')
-        fig_classe_sexo.savefig('sobrevivencia_por_classe_e_sexo.png')
-        fig_classe_idade.savefig('sobrevivencia_por_classe_e_idade.png')
-        
-        print("Figuras salvas como arquivos PNG separados.")
-        
-        # Fechar todas as figuras
-        plt.close('all')
+    # Calcular as tabelas (as figuras são renderizadas depois, em processos separados)
+    _, dados_sexo = analisar_sobrevivencia_por_sexo(cubo, plotar=False)
+    _, dados_idade = analisar_sobrevivencia_por_idade(cubo, plotar=False)
+    _, dados_classe = analisar_sobrevivencia_por_classe(cubo, plotar=False)
+    _, dados_classe_sexo = analisar_sobrevivencia_classe_sexo(cubo, plotar=False)
+    _, dados_classe_idade = analisar_sobrevivencia_classe_idade(cubo, plotar=False)
+    
+    # Gerar conclusões baseadas nos dados, com intervalos de confiança bootstrap
+    # e p-valores dos testes de permutação
+    intervalos = resumo_intervalos(cubo)
+    testes = resumo_testes(cubo)
+    texto_conclusoes = io.StringIO()
+    with contextlib.redirect_stdout(texto_conclusoes):
+        conclusoes = gerar_conclusoes(
+            dados_sexo, dados_idade, dados_classe_sexo, dados_classe_idade,
+            intervalos=intervalos, testes=testes
+        )
+    print(texto_conclusoes.getvalue(), end='')
+    
+    if formato == 'html':
+        from relatorio_html import gerar_relatorio_html
+        secoes = secoes_html_analise_titanic(dados_sexo, dados_idade, dados_classe, dados_classe_sexo, dados_classe_idade)
+        dados = {
+            'arquivo': arquivo,
+            'tabelas': {
+                'sexo': dados_sexo, 'idade': dados_idade, 'classe': dados_classe,
+                'classe_sexo': dados_classe_sexo, 'classe_idade': dados_classe_idade,
+            },
+            'intervalos': intervalos,
+            'testes': testes,
+            'conclusoes': conclusoes,
+        }
+        gerar_relatorio_html(
+            'Análise de Sobrevivência do Titanic', secoes, 'analise_titanic.html',
+            texto_conclusoes.getvalue(), dados, 'analise_titanic.json'
+        )
+        return
+    
+    paginas = paginas_analise_titanic(dados_sexo, dados_idade, dados_classe, dados_classe_sexo, dados_classe_idade)
+    nomes_png = [
+        'sobrevivencia_por_sexo.png',
+        'sobrevivencia_por_idade.png',
+        'sobrevivencia_por_classe.png',
+        'sobrevivencia_por_classe_e_sexo.png',
+        'sobrevivencia_por_classe_e_idade.png',
+    ]
+    
+    # Cada página é renderizada e liberada em um processo de trabalho;
+    # se o PDF falhar, os PNGs já gerados são gravados individualmente
+    from relatorio_pdf import gerar_relatorio
+    gerar_relatorio(paginas, output_pdf, nomes_png, processos=processos)
 
 # Função para gerar conclusões baseadas nos dados analisados
-def gerar_conclusoes(dados_sexo, dados_idade, dados_classe_sexo, dados_classe_idade):
-    print("\n=== CONCLUSÕES DA ANÁLISE ===")
+# (`intervalos`, de resumo_intervalos, acrescenta os intervalos de confiança de 95%,
+# e `testes`, de resumo_testes, os p-valores das afirmações sobre a Lei do Mar)
+@instrumentar
+def gerar_conclusoes(dados_sexo, dados_idade, dados_classe_sexo, dados_classe_idade, intervalos=None,
+                     testes=None, exibir=True):
+    saida = print if exibir else silencioso
+    taxas_ic = intervalos['taxas'] if intervalos else {}
+    razoes_ic = intervalos['razoes'] if intervalos else {}
+    saida("\n=== CONCLUSÕES DA ANÁLISE ===")
     
     # Conclusão sobre taxa de sobrevivência por sexo
     taxa_mulheres = dados_sexo[dados_sexo['sex'] == 'female']['taxa_sobrevivencia'].values[0]
     taxa_homens = dados_sexo[dados_sexo['sex'] == 'male']['taxa_sobrevivencia'].values[0]
     
-    print(f"\n1. Taxa de sobrevivência por sexo:")
-    print(f"   - Mulheres: {taxa_mulheres:.1f}%")
-    print(f"   - Homens: {taxa_homens:.1f}%")
-    print(f"   - As mulheres tiveram {taxa_mulheres/taxa_homens:.1f} vezes mais chances de sobreviver que os homens")
+    saida(f"\n1. Taxa de sobrevivência por sexo:")
+    saida(f"   - Mulheres: {taxa_mulheres:.1f}%{texto_ic(taxas_ic.get('sexo'), sex='female')}")
+    saida(f"   - Homens: {taxa_homens:.1f}%{texto_ic(taxas_ic.get('sexo'), sex='male')}")
+    saida(f"   - As mulheres tiveram {taxa_mulheres/taxa_homens:.1f} vezes mais chances de sobreviver que os homens"
+          f"{texto_ic(razoes_ic.get('mulheres_homens'))}")
     
     # Conclusão sobre taxa de sobrevivência por idade
     taxa_criancas = dados_idade[dados_idade['is_child'] == True]['taxa_sobrevivencia'].values[0]
     taxa_adultos = dados_idade[dados_idade['is_child'] == False]['taxa_sobrevivencia'].values[0]
     
-    print(f"\n2. Taxa de sobrevivência por idade:")
-    print(f"   - Crianças (<18 anos): {taxa_criancas:.1f}%")
-    print(f"   - Adultos (≥18 anos): {taxa_adultos:.1f}%")
-    print(f"   - As crianças tiveram {taxa_criancas/taxa_adultos:.1f} vezes mais chances de sobreviver que os adultos")
+    saida(f"\n2. Taxa de sobrevivência por idade:")
+    saida(f"   - Crianças (<18 anos): {taxa_criancas:.1f}%{texto_ic(taxas_ic.get('idade'), is_child=True)}")
+    saida(f"   - Adultos (≥18 anos): {taxa_adultos:.1f}%{texto_ic(taxas_ic.get('idade'), is_child=False)}")
+    saida(f"   - As crianças tiveram {taxa_criancas/taxa_adultos:.1f} vezes mais chances de sobreviver que os adultos"
+          f"{texto_ic(razoes_ic.get('criancas_adultos'))}")
     
     # Conclusão sobre taxa de sobrevivência por classe e sexo
-    print("\n3. Taxa de sobrevivência por classe e sexo:")
+    saida("\n3. Taxa de sobrevivência por classe e sexo:")
+    taxas_por_classe = {}
     for classe in [1, 2, 3]:
         dados_classe = dados_classe_sexo[dados_classe_sexo['pclass'] == classe]
         taxa_m = dados_classe[dados_classe['sex'] == 'female']['taxa_sobrevivencia'].values[0]
         taxa_h = dados_classe[dados_classe['sex'] == 'male']['taxa_sobrevivencia'].values[0]
-        print(f"   - Classe {classe}:")
-        print(f"     * Mulheres: {taxa_m:.1f}%")
-        print(f"     * Homens: {taxa_h:.1f}%")
+        taxas_por_classe[classe] = {'mulheres': taxa_m, 'homens': taxa_h}
+        saida(f"   - Classe {classe}:")
+        saida(f"     * Mulheres: {taxa_m:.1f}%{texto_ic(taxas_ic.get('classe_sexo'), pclass=classe, sex='female')}")
+        saida(f"     * Homens: {taxa_h:.1f}%{texto_ic(taxas_ic.get('classe_sexo'), pclass=classe, sex='male')}")
+        saida(f"     * Razão mulheres/homens: {taxa_m/taxa_h:.1f}"
+              f"{texto_ic(razoes_ic.get('mulheres_homens_por_classe'), pclass=classe)}")
     
     # Análise da "Lei do Mar" (mulheres e crianças primeiro)
-    print("\n4. Avaliação sobre a 'Lei do Mar' (mulheres e crianças primeiro):")
+    saida("\n4. Avaliação sobre a 'Lei do Mar' (mulheres e crianças primeiro):")
     
     # Verificar se a taxa de sobrevivência de mulheres é maior que homens em todas as classes
     # Corrigindo a comparação para evitar o erro de Series com índices diferentes
@@ -295,23 +361,39 @@ def gerar_conclusoes(dados_sexo, dados_idade, dados_classe_sexo, dados_classe_id
             break
     
     if mulheres_maior_taxa:
-        print("   - Os dados mostram que mulheres tiveram maior taxa de sobrevivência em todas as classes")
+        saida("   - Os dados mostram que mulheres tiveram maior taxa de sobrevivência em todas as classes"
+              f"{texto_p(testes, 'mulheres_homens', RECUO_TESTES)}")
     else:
-        print("   - Não há evidência consistente de que mulheres tiveram prioridade em todas as classes")
+        saida("   - Não há evidência consistente de que mulheres tiveram prioridade em todas as classes"
+              f"{texto_p(testes, 'mulheres_homens', RECUO_TESTES)}")
         
     if taxa_criancas > taxa_adultos:
-        print("   - Os dados mostram que crianças tiveram maior taxa de sobrevivência que adultos")
+        saida("   - Os dados mostram que crianças tiveram maior taxa de sobrevivência que adultos"
+              f"{texto_p(testes, 'criancas_adultos', RECUO_TESTES)}")
     else:
-        print("   - Não há evidência de que crianças tiveram prioridade sobre adultos")
+        saida("   - Não há evidência de que crianças tiveram prioridade sobre adultos"
+              f"{texto_p(testes, 'criancas_adultos', RECUO_TESTES)}")
     
     # Conclusão geral sobre a Lei do Mar
-    print("\n5. Conclusão sobre a afirmação do artigo:")
-    print("   Com base nos dados analisados, podemos observar que:")
-    print("   - Mulheres tiveram prioridade clara sobre homens")
-    print("   - O status socioeconômico (classe) parece ter influenciado significativamente as chances de sobrevivência")
-    print("   - A hipótese de que 'a tripulação do Titanic seguiu a Lei do Mar' é parcialmente suportada,")
-    print("     mas com influência significativa de fatores socioeconômicos")
+    saida("\n5. Conclusão sobre a afirmação do artigo:")
+    saida("   Com base nos dados analisados, podemos observar que:")
+    saida("   - Mulheres tiveram prioridade clara sobre homens")
+    saida("   - O status socioeconômico (classe) parece ter influenciado significativamente as chances de sobrevivência")
+    saida("   - A hipótese de que 'a tripulação do Titanic seguiu a Lei do Mar' é parcialmente suportada,")
+    saida("     mas com influência significativa de fatores socioeconômicos")
+    
+    return para_json({
+        'taxa_mulheres': taxa_mulheres,
+        'taxa_homens': taxa_homens,
+        'razao_mulheres_homens': taxa_mulheres / taxa_homens,
+        'taxa_criancas': taxa_criancas,
+        'taxa_adultos': taxa_adultos,
+        'razao_criancas_adultos': taxa_criancas / taxa_adultos,
+        'taxas_por_classe': taxas_por_classe,
+        'mulheres_maior_taxa_todas_classes': mulheres_maior_taxa,
+        'criancas_maior_taxa': taxa_criancas > taxa_adultos,
+        'p_valores': {nome: teste['p_valor'] for nome, teste in (testes or {}).items()},
+    })
 
 if __name__ == "__main__":
-    # Executar a análise com o arquivo CSV do Titanic
-    analisar_dados_titanic("titanic3.csv") 
\ No newline at end of file
+    executar("Análise de sobrevivência do Titanic", 'analise_titanic', calcular_estatisticas, analisar_dados_titanic)
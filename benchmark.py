@@ -0,0 +1,332 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from entrada import abrir_manifesto
+from resultados import salvar_json
+
+# Cada etapa é medida em um processo novo, para que o pico de memória de uma
+# etapa não contamine as seguintes. 'preparar' monta as entradas (fora da
+# medição) e 'executar' é a parte cronometrada.
+
+
+def _preparar_nada(arquivo):
+    return None
+
+
+def _preparar_dataframe(arquivo):
+    from carregador import carregar_dados
+    return carregar_dados(arquivo, usar_cache=False)
+
+
+def _preparar_cache(arquivo):
+    # Garante que o cache colunar do arquivo exista antes da medição
+    from carregador import carregar_dados
+    carregar_dados(arquivo)
+
+
+def _preparar_tabelas_relatorio(arquivo):
+    # Argumentos comuns de paginas_lei_do_mar e secoes_html_lei_do_mar
+    from cubo_sobrevivencia import construir_cubo_em_blocos
+    from lei_do_mar_titanic import analise_lei_do_mar
+    cubo = construir_cubo_em_blocos(arquivo)
+    _, *tabelas = analise_lei_do_mar(cubo, plotar=False, exibir=False)
+    return (*tabelas, int(cubo.sobreviventes.sum()), cubo.total_registros)
+
+
+def _preparar_relatorio(arquivo):
+    from lei_do_mar_titanic import paginas_lei_do_mar
+    return paginas_lei_do_mar(*_preparar_tabelas_relatorio(arquivo))
+
+
+def _executar_carregar_dados(arquivo, _):
+    from carregador import carregar_dados
+    carregar_dados(arquivo, usar_cache=False)
+
+
+def _executar_carregar_dados_cache(arquivo, _):
+    from carregador import carregar_dados
+    carregar_dados(arquivo)
+
+
+def _executar_construir_cubo(arquivo, df):
+    from cubo_sobrevivencia import construir_cubo
+    construir_cubo(df)
+
+
+def _executar_cubo_em_blocos(arquivo, _):
+    from cubo_sobrevivencia import construir_cubo_em_blocos
+    construir_cubo_em_blocos(arquivo)
+
+
+def _executar_cubo_paralelo(arquivo, _):
+    from leitura_paralela import construir_cubo_paralelo
+    construir_cubo_paralelo(arquivo)
+
+
+def _executar_analisar_sobrevivencia(arquivo, df):
+    import analise_titanic
+    for analisar in [
+        analise_titanic.analisar_sobrevivencia_por_sexo,
+        analise_titanic.analisar_sobrevivencia_por_idade,
+        analise_titanic.analisar_sobrevivencia_por_classe,
+        analise_titanic.analisar_sobrevivencia_classe_sexo,
+        analise_titanic.analisar_sobrevivencia_classe_idade,
+    ]:
+        analisar(df, plotar=False, exibir=False)
+
+
+def _executar_analise_lei_do_mar(arquivo, df):
+    from lei_do_mar_titanic import analise_lei_do_mar
+    analise_lei_do_mar(df, plotar=False, exibir=False)
+
+
+def _executar_relatorio_pdf(arquivo, paginas):
+    from relatorio_pdf import gerar_relatorio
+    with tempfile.TemporaryDirectory() as diretorio:
+        nomes_png = [os.path.join(diretorio, f"pagina_{i}.png") for i in range(len(paginas))]
+        gerar_relatorio(paginas, os.path.join(diretorio, 'relatorio.pdf'), nomes_png)
+
+
+def _executar_relatorio_html(arquivo, argumentos):
+    from lei_do_mar_titanic import secoes_html_lei_do_mar
+    from relatorio_html import gerar_relatorio_html
+    with tempfile.TemporaryDirectory() as diretorio:
+        gerar_relatorio_html(
+            'Relatório', secoes_html_lei_do_mar(*argumentos), os.path.join(diretorio, 'relatorio.html'),
+            dados={'tabelas': argumentos[:4]}, output_json=os.path.join(diretorio, 'relatorio.json')
+        )
+
+
+# Partida a frio do modo --somente-estatisticas, com e sem a pilha de gráficos
+# importada antes; cada execução é um interpretador novo
+DIRETORIO_CODIGO = os.path.dirname(os.path.abspath(__file__))
+IMPORTAR_GRAFICOS = (
+    "import runpy, sys; import graficos, relatorio_pdf; "
+    "sys.argv = sys.argv[1:]; runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+
+def _partida_a_frio(arquivo, *prefixo):
+    script = os.path.join(DIRETORIO_CODIGO, 'analise_titanic.py')
+    subprocess.run(
+        [sys.executable, *prefixo, script, os.path.abspath(arquivo), '--somente-estatisticas'],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=DIRETORIO_CODIGO,
+    )
+
+
+def _preparar_partida(arquivo):
+    # O cache colunar já existe nas duas medições, então a diferença é o custo dos imports
+    _preparar_cache(arquivo)
+
+
+def _executar_partida_estatisticas(arquivo, _):
+    _partida_a_frio(arquivo)
+
+
+def _executar_partida_com_graficos(arquivo, _):
+    _partida_a_frio(arquivo, '-c', IMPORTAR_GRAFICOS)
+
+
+ETAPAS = {
+    'carregar_dados': (_preparar_nada, _executar_carregar_dados),
+    'carregar_dados_cache': (_preparar_cache, _executar_carregar_dados_cache),
+    'construir_cubo': (_preparar_dataframe, _executar_construir_cubo),
+    'cubo_em_blocos': (_preparar_nada, _executar_cubo_em_blocos),
+    'cubo_paralelo': (_preparar_nada, _executar_cubo_paralelo),
+    'analisar_sobrevivencia': (_preparar_dataframe, _executar_analisar_sobrevivencia),
+    'analise_lei_do_mar': (_preparar_dataframe, _executar_analise_lei_do_mar),
+    'relatorio_pdf': (_preparar_relatorio, _executar_relatorio_pdf),
+    'relatorio_html': (_preparar_tabelas_relatorio, _executar_relatorio_html),
+    'partida_estatisticas': (_preparar_partida, _executar_partida_estatisticas),
+    'partida_com_graficos': (_preparar_partida, _executar_partida_com_graficos),
+}
+
+
+def _pico_rss_mib():
+    """Maior RSS já atingido por este processo e pelos processos filhos (Linux: ru_maxrss em KiB).
+
+    Nas etapas de partida a frio, os filhos são os interpretadores medidos.
+    """
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(proprio, filhos) / 1024
+
+
+def _medir_etapa(etapa, arquivo):
+    preparar, executar = ETAPAS[etapa]
+    with contextlib.redirect_stdout(io.StringIO()):
+        entradas = preparar(arquivo)
+        rss_antes = _pico_rss_mib()
+        inicio = time.perf_counter()
+        executar(arquivo, entradas)
+        tempo = time.perf_counter() - inicio
+    pico = _pico_rss_mib()
+    return {'tempo_s': tempo, 'pico_rss_mib': pico, 'aumento_rss_mib': pico - rss_antes}
+
+
+def contar_linhas(arquivo, tamanho_bloco=1 << 20):
+    """Número de linhas de dados do manifesto (sem o cabeçalho), contadas em blocos de bytes descomprimidos."""
+    linhas = 0
+    with abrir_manifesto(arquivo) as f:
+        while bloco := f.read(tamanho_bloco):
+            linhas += bloco.count(b'\n')
+    # O fluxo sempre termina com quebra de linha (veja entrada.LeitorManifesto)
+    return linhas - 1
+
+
+def _versao_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_benchmark(arquivos, etapas=None, repeticoes=3):
+    """Mede cada etapa do pipeline sobre cada arquivo, em processos isolados.
+
+    Para cada (arquivo, etapa) guarda a mediana do tempo de parede entre as
+    repetições, a vazão em linhas por segundo e o pico de RSS (incluindo os
+    processos de renderização do PDF). `aumento_rss_mib` é quanto o pico subiu
+    durante a etapa, descontada a preparação das entradas. Quando as duas
+    etapas de partida a frio são medidas, `partida_a_frio` guarda, por arquivo,
+    a razão entre o tempo do modo --somente-estatisticas e o da mesma execução
+    com a pilha de gráficos importada.
+    """
+    etapas = list(ETAPAS) if etapas is None else list(etapas)
+    contexto = multiprocessing.get_context('spawn')
+
+    resultados = []
+    for arquivo in arquivos:
+        linhas = contar_linhas(arquivo)
+        for etapa in etapas:
+            medicoes = []
+            for _ in range(repeticoes):
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                    medicoes.append(executor.submit(_medir_etapa, etapa, arquivo).result())
+
+            tempo = statistics.median(m['tempo_s'] for m in medicoes)
+            resultado = {
+                'arquivo': arquivo,
+                'linhas': linhas,
+                'bytes': os.path.getsize(arquivo),
+                'etapa': etapa,
+                'tempo_s': tempo,
+                'tempos_s': [m['tempo_s'] for m in medicoes],
+                'linhas_por_s': linhas / tempo if tempo > 0 else None,
+                'pico_rss_mib': max(m['pico_rss_mib'] for m in medicoes),
+                'aumento_rss_mib': max(m['aumento_rss_mib'] for m in medicoes),
+            }
+            resultados.append(resultado)
+            print(f"{os.path.basename(arquivo)} ({linhas} linhas) {etapa}: {tempo:.3f} s, "
+                  f"{resultado['linhas_por_s'] or 0:,.0f} linhas/s, pico {resultado['pico_rss_mib']:.0f} MiB")
+
+    partida_a_frio = razoes_partida_a_frio(resultados)
+    for r in partida_a_frio:
+        print(f"{os.path.basename(r['arquivo'])}: partida do modo somente-estatísticas em "
+              f"{r['razao']:.2f}x o tempo da execução com gráficos")
+
+    return {
+        'versao': _versao_codigo(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'repeticoes': repeticoes,
+        'resultados': resultados,
+        'partida_a_frio': partida_a_frio,
+    }
+
+
+def razoes_partida_a_frio(resultados):
+    """Razão, por arquivo, entre os tempos de partida sem e com a pilha de gráficos (< 1 = mais rápido)."""
+    tempos = {(r['arquivo'], r['etapa']): r['tempo_s'] for r in resultados}
+    razoes = []
+    for arquivo in dict.fromkeys(r['arquivo'] for r in resultados):
+        estatisticas = tempos.get((arquivo, 'partida_estatisticas'))
+        com_graficos = tempos.get((arquivo, 'partida_com_graficos'))
+        if estatisticas is not None and com_graficos:
+            razoes.append({
+                'arquivo': arquivo,
+                'tempo_estatisticas_s': estatisticas,
+                'tempo_com_graficos_s': com_graficos,
+                'razao': estatisticas / com_graficos,
+            })
+    return razoes
+
+
+def comparar(anterior, atual):
+    """Razão entre os tempos de cada (linhas, etapa) presente nos dois resultados (> 1 = mais lento)."""
+    tempos_anteriores = {(r['linhas'], r['etapa']): r['tempo_s'] for r in anterior['resultados']}
+    comparacao = []
+    for r in atual['resultados']:
+        chave = (r['linhas'], r['etapa'])
+        if chave in tempos_anteriores and tempos_anteriores[chave] > 0:
+            comparacao.append({
+                'linhas': r['linhas'],
+                'etapa': r['etapa'],
+                'tempo_anterior_s': tempos_anteriores[chave],
+                'tempo_atual_s': r['tempo_s'],
+                'razao': r['tempo_s'] / tempos_anteriores[chave],
+            })
+    return comparacao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das etapas da análise do Titanic")
+    parser.add_argument('arquivos', nargs='*', default=['titanic3.csv'],
+                        help="Manifestos a medir (ex.: gerados por gerar_manifesto.py)")
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=None,
+                        help="Etapas a medir (padrão: todas)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por etapa (vale a mediana)")
+    parser.add_argument('--saida', default='benchmark.json', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', default=None, metavar='JSON',
+                        help="Resultado anterior para comparar os tempos")
+    parser.add_argument('--razao-partida-maxima', type=float, default=None, metavar='RAZAO',
+                        help="Falha se a partida do modo somente-estatísticas levar mais que esta fração "
+                             "do tempo da execução com gráficos (ex.: 0.8)")
+    args = parser.parse_args()
+
+    resultado = executar_benchmark(args.arquivos, args.etapas, args.repeticoes)
+    salvar_json(resultado, args.saida)
+    print(f"\nResultados salvos em '{args.saida}'")
+
+    lentos = [r for r in resultado['partida_a_frio']
+              if args.razao_partida_maxima is not None and r['razao'] > args.razao_partida_maxima]
+    for r in lentos:
+        print(f"Partida a frio de {r['arquivo']}: razão {r['razao']:.2f} acima de {args.razao_partida_maxima}",
+              file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nComparação com {args.comparar} (versão {anterior.get('versao')}):")
+        for c in comparar(anterior, resultado):
+            sinal = "mais lento" if c['razao'] > 1 else "mais rápido"
+            print(f"   - {c['etapa']} ({c['linhas']} linhas): {c['tempo_anterior_s']:.3f} s -> "
+                  f"{c['tempo_atual_s']:.3f} s ({c['razao']:.2f}x, {sinal})")
+
+    if lentos:
+        sys.exit(1)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from carregador import BOTES
+from cubo_sobrevivencia import LADO_DO_BOTE, LADOS_BOTE, obter_cubo
+from instrumentacao import instrumentar
+
+
+class IndiceBotes:
+    """Índice invertido bote -> posições das linhas dos seus ocupantes.
+
+    As posições ficam em um único array ordenado por bote, e `inicios` marca
+    onde começa cada bote (formato CSR): consultar os ocupantes de um bote é um
+    fatiamento, sem percorrer nem filtrar o manifesto.
+    """
+
+    def __init__(self, codigos):
+        # codigos: posição de cada linha em BOTES, ou -1 para quem não estava em bote
+        codigos = np.asarray(codigos)
+        com_bote = np.flatnonzero(codigos >= 0)
+        # argsort estável de inteiros pequenos é uma ordenação por contagem (radix), em tempo linear
+        self.posicoes = com_bote[np.argsort(codigos[com_bote], kind='stable')]
+        self.inicios = np.concatenate([[0], np.cumsum(np.bincount(codigos[com_bote], minlength=len(BOTES)))])
+
+    @classmethod
+    def dos_dados(cls, dados):
+        """Índice a partir da coluna 'bote' do DataFrame limpo (ou das colunas mapeadas)."""
+        return cls(pd.Categorical(dados['bote'], categories=BOTES).codes)
+
+    def linhas(self, bote):
+        """Posições (em ordem crescente) das linhas dos ocupantes de `bote`."""
+        if bote not in BOTES:
+            raise ValueError(f"Bote desconhecido: {bote!r} (use {', '.join(BOTES)})")
+        i = BOTES.index(bote)
+        return self.posicoes[self.inicios[i]:self.inicios[i + 1]]
+
+    def ocupantes(self, dados, bote):
+        """Linhas de `dados` dos ocupantes de `bote`, como DataFrame."""
+        linhas = self.linhas(bote)
+        if hasattr(dados, 'selecionar_linhas'):
+            return dados.selecionar_linhas(linhas)
+        return dados.iloc[linhas]
+
+    def tamanhos(self):
+        """Número de ocupantes registrados em cada bote."""
+        return pd.Series(np.diff(self.inicios), index=pd.Index(BOTES, name='bote'))
+
+
+def _colunas_composicao(cubo, dimensao):
+    """Contagens de `dimensao` (bote ou lado_bote) por sexo, criança/adulto e classe, como colunas."""
+    _, por_sexo = cubo.contagens([dimensao, 'sex'])
+    _, por_idade = cubo.contagens([dimensao, 'is_child'])
+    sobreviventes, por_classe = cubo.contagens([dimensao, 'pclass'])
+    _, meninos = cubo.consultar({'sex': 'male', 'is_child': True}, agrupar=[dimensao])
+    pessoas = cubo.consultar(agrupar=[dimensao])[1]
+    colunas = {
+        'Pessoas': pessoas,
+        'Mulheres': por_sexo[:, 0],
+        'Homens': por_sexo[:, 1],
+        'Crianças': por_idade[:, 1],
+        'Adultos': por_idade[:, 0],
+        '1ª Classe': por_classe[:, 0],
+        '2ª Classe': por_classe[:, 1],
+        '3ª Classe': por_classe[:, 2],
+        'Sobreviventes': sobreviventes.sum(axis=1),
+    }
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Mulheres de qualquer idade e meninos (homens com menos de 18 anos)
+        colunas['Percentual Mulheres e Crianças'] = (por_sexo[:, 0] + meninos) / pessoas * 100
+    return colunas
+
+
+@instrumentar
+def composicao_botes(dados):
+    """Ocupantes de cada bote por sexo, criança/adulto e classe, com o bordo de lançamento.
+
+    Sai das contagens do cubo no eixo 'bote', então vale também para cubos
+    carregados de um índice ou agregados por outro motor. Passageiros sem sexo,
+    idade ou classe conhecidos contam em 'Pessoas', mas não nas colunas
+    correspondentes; botes sem nenhum ocupante registrado não aparecem.
+    """
+    cubo = obter_cubo(dados)
+    tabela = pd.DataFrame({
+        'Bote': BOTES,
+        'Bordo': [LADO_DO_BOTE[bote] for bote in BOTES],
+        **_colunas_composicao(cubo, 'bote'),
+    })
+    return tabela[tabela['Pessoas'] > 0].reset_index(drop=True)
+
+
+@instrumentar
+def composicao_bordos(dados):
+    """Ocupantes dos botes de cada bordo (estibordo e bombordo), como em composicao_botes."""
+    cubo = obter_cubo(dados)
+    _, por_bote = cubo.contagens(['bote'])
+    botes_usados = np.bincount([LADOS_BOTE.index(LADO_DO_BOTE[bote]) for bote in np.array(BOTES)[por_bote > 0]],
+                               minlength=len(LADOS_BOTE))
+    tabela = pd.DataFrame({'Bordo': LADOS_BOTE, 'Botes': botes_usados, **_colunas_composicao(cubo, 'lado_bote')})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabela['Pessoas por Bote'] = tabela['Pessoas'] / tabela['Botes']
+    return tabela
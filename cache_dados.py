@@ -0,0 +1,246 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from entrada import partes_do_manifesto
+
+# Diretório padrão do cache colunar (um subdiretório por chave)
+DIRETORIO_CACHE = '.cache_titanic'
+
+# Estatísticas de uso do cache durante o processo atual
+estatisticas = {'acertos': 0, 'falhas': 0, 'removidas': 0}
+
+# Origem e versão da limpeza de cada entrada, gravadas ao lado de colunas.json
+ARQUIVO_ORIGEM = 'origem.json'
+
+
+def hash_arquivo(arquivo, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do conteúdo do arquivo (ou das partes do manifesto, em ordem) lendo em blocos.
+
+    Arquivos comprimidos entram como estão em disco, sem descomprimir.
+    """
+    h = hashlib.sha256()
+    for parte in partes_do_manifesto(arquivo):
+        with open(parte, 'rb') as f:
+            for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+                h.update(bloco)
+    return h.hexdigest()
+
+
+def versao_limpeza(preprocessar, versao, dependencias=()):
+    """Hash da versão e do código-fonte de `preprocessar` e das `dependencias` (funções ou módulos inteiros)."""
+    h = hashlib.sha256()
+    h.update(str(versao).encode())
+    for objeto in (preprocessar, *dependencias):
+        h.update(os.path.basename(inspect.getsourcefile(objeto)).encode())
+        h.update(inspect.getsource(objeto).encode())
+    return h.hexdigest()
+
+
+def chave_cache(arquivo, preprocessar, versao, dependencias=()):
+    """Chave que muda quando o CSV, o código de limpeza ou a versão mudam."""
+    h = hashlib.sha256()
+    h.update(hash_arquivo(arquivo).encode())
+    h.update(versao_limpeza(preprocessar, versao, dependencias).encode())
+    return h.hexdigest()[:32]
+
+
+def salvar_colunas(df, diretorio, origem=None):
+    """Grava cada coluna como um .npy tipado, com texto codificado em dicionário.
+
+    `origem` (um dicionário) é gravado em ARQUIVO_ORIGEM, para que podar_cache
+    saiba de qual manifesto e versão da limpeza a entrada veio.
+    """
+    temporario = diretorio + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    colunas = []
+    for i, nome in enumerate(df.columns):
+        serie = df[nome]
+        meta = {'nome': nome, 'arquivo': f'{i}.npy', 'dtype': str(serie.dtype)}
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            meta['categorias'] = serie.cat.categories.tolist()
+            meta['ordenada'] = bool(serie.cat.ordered)
+            valores = serie.cat.codes.to_numpy()
+        elif isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'biuf':
+            valores = serie.to_numpy()
+        else:
+            # Texto e inteiros com ausentes: códigos inteiros + lista de valores distintos
+            codigos, categorias = pd.factorize(serie)
+            meta['categorias'] = categorias.tolist()
+            valores = codigos.astype(np.int32)
+        np.save(os.path.join(temporario, meta['arquivo']), valores, allow_pickle=False)
+        colunas.append(meta)
+
+    with open(os.path.join(temporario, 'colunas.json'), 'w', encoding='utf-8') as f:
+        json.dump(colunas, f, ensure_ascii=False)
+    if origem is not None:
+        with open(os.path.join(temporario, ARQUIVO_ORIGEM), 'w', encoding='utf-8') as f:
+            json.dump(origem, f, ensure_ascii=False)
+
+    # Troca atômica para que leitores nunca vejam um cache pela metade
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(temporario, diretorio)
+
+
+def _ler_metadados(diretorio):
+    with open(os.path.join(diretorio, 'colunas.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _decodificar(meta, valores):
+    """Converte o array gravado de uma coluna de volta para o dtype original."""
+    if meta['dtype'] == 'category':
+        # Sem validação, os códigos não são copiados (importante para arrays mapeados)
+        return pd.Categorical.from_codes(
+            valores, categories=meta['categorias'], ordered=meta['ordenada'], validate=False
+        )
+    if 'categorias' in meta:
+        serie = pd.Series(pd.Categorical.from_codes(valores, categories=meta['categorias'], validate=False))
+        return serie.astype(meta['dtype'])
+    return valores
+
+
+def ler_colunas(diretorio):
+    """Reconstrói o DataFrame a partir das colunas gravadas por `salvar_colunas`."""
+    dados = {}
+    for meta in _ler_metadados(diretorio):
+        valores = np.load(os.path.join(diretorio, meta['arquivo']), allow_pickle=False)
+        dados[meta['nome']] = _decodificar(meta, valores)
+    return pd.DataFrame(dados)
+
+
+class ColunasMapeadas:
+    """Visão somente leitura e sem cópia das colunas gravadas por `salvar_colunas`.
+
+    Os arrays são abertos com memória mapeada, então processos que abrem o mesmo
+    diretório compartilham uma única cópia física dos dados (o cache de páginas
+    do sistema). Ao ser enviado a outro processo só o caminho é serializado, e
+    as colunas são mapeadas de novo no destino. Oferece a parte da interface do
+    DataFrame usada pelas análises: `columns`, `len()`, `shape` e `obj[coluna]`.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._meta = {meta['nome']: meta for meta in _ler_metadados(diretorio)}
+        self._arrays = {
+            nome: np.load(os.path.join(diretorio, meta['arquivo']), mmap_mode='r', allow_pickle=False)
+            for nome, meta in self._meta.items()
+        }
+
+    def __getstate__(self):
+        return {'diretorio': self.diretorio}
+
+    def __setstate__(self, estado):
+        self.__init__(estado['diretorio'])
+
+    @property
+    def columns(self):
+        return pd.Index(list(self._meta))
+
+    def __len__(self):
+        return len(next(iter(self._arrays.values()))) if self._arrays else 0
+
+    @property
+    def shape(self):
+        return len(self), len(self._meta)
+
+    def __getitem__(self, nome):
+        """Coluna como Series; numéricas e categóricas apontam para o array mapeado."""
+        return pd.Series(_decodificar(self._meta[nome], self._arrays[nome]), name=nome, copy=False)
+
+    def selecionar_linhas(self, indices):
+        """DataFrame (em memória) só com as linhas em `indices`."""
+        return pd.DataFrame({
+            nome: _decodificar(meta, self._arrays[nome][indices]) for nome, meta in self._meta.items()
+        })
+
+    def para_dataframe(self):
+        """Cópia completa em memória, como a devolvida por `ler_colunas`."""
+        return ler_colunas(self.diretorio)
+
+
+def _origem(arquivo, preprocessar, versao, dependencias):
+    return {
+        'partes': [os.path.abspath(parte) for parte in partes_do_manifesto(arquivo)],
+        'limpeza': versao_limpeza(preprocessar, versao, dependencias),
+    }
+
+
+def podar_cache(origem, manter, diretorio_cache=DIRETORIO_CACHE):
+    """Remove as entradas que não podem mais ser usadas, exceto `manter`.
+
+    São obsoletas as entradas de outra versão da limpeza, as do mesmo manifesto
+    (`origem['partes']`) com outro conteúdo e as gravadas sem ARQUIVO_ORIGEM
+    (por versões anteriores do cache). Só diretórios com colunas.json são
+    considerados, então outros dados guardados em `diretorio_cache` (como as
+    etapas do pipeline) ficam intactos.
+    """
+    try:
+        nomes = os.listdir(diretorio_cache)
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        diretorio = os.path.join(diretorio_cache, nome)
+        if nome == manter or not os.path.exists(os.path.join(diretorio, 'colunas.json')):
+            continue
+        try:
+            with open(os.path.join(diretorio, ARQUIVO_ORIGEM), encoding='utf-8') as f:
+                outra = json.load(f)
+        except (OSError, ValueError):
+            outra = None
+        if outra is None or outra.get('limpeza') != origem['limpeza'] or outra.get('partes') == origem['partes']:
+            shutil.rmtree(diretorio, ignore_errors=True)
+            estatisticas['removidas'] += 1
+
+
+def _gravar_entrada(df, diretorio, arquivo, preprocessar, versao, diretorio_cache, dependencias):
+    origem = _origem(arquivo, preprocessar, versao, dependencias)
+    salvar_colunas(df, diretorio, origem)
+    podar_cache(origem, os.path.basename(diretorio), diretorio_cache)
+
+
+def diretorio_colunas(arquivo, preprocessar, versao, diretorio_cache=DIRETORIO_CACHE, dependencias=()):
+    """Diretório do cache colunar do arquivo, gerando-o com `preprocessar` se ainda não existir."""
+    chave = chave_cache(arquivo, preprocessar, versao, dependencias)
+    diretorio = os.path.join(diretorio_cache, chave)
+    if os.path.exists(os.path.join(diretorio, 'colunas.json')):
+        estatisticas['acertos'] += 1
+    else:
+        estatisticas['falhas'] += 1
+        _gravar_entrada(preprocessar(arquivo), diretorio, arquivo, preprocessar, versao, diretorio_cache, dependencias)
+    return diretorio
+
+
+def carregar_com_cache(arquivo, preprocessar, versao, diretorio_cache=DIRETORIO_CACHE, dependencias=()):
+    """Retorna o DataFrame limpo do cache ou executa `preprocessar(arquivo)` e o armazena.
+
+    `dependencias` lista outras funções ou módulos de limpeza usados por
+    `preprocessar`, cujo código também faz parte da chave do cache. Ao gravar
+    uma entrada nova, as que ficaram obsoletas são removidas (veja podar_cache).
+    """
+    chave = chave_cache(arquivo, preprocessar, versao, dependencias)
+    diretorio = os.path.join(diretorio_cache, chave)
+    if os.path.exists(os.path.join(diretorio, 'colunas.json')):
+        estatisticas['acertos'] += 1
+        print(f"Dados carregados do cache colunar ({diretorio}).")
+        return ler_colunas(diretorio)
+
+    estatisticas['falhas'] += 1
+    df = preprocessar(arquivo)
+    try:
+        _gravar_entrada(df, diretorio, arquivo, preprocessar, versao, diretorio_cache, dependencias)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache em {diretorio}: {e}")
+    return df
+
+
+def limpar_cache(diretorio_cache=DIRETORIO_CACHE):
+    """Remove todas as entradas do cache."""
+    shutil.rmtree(diretorio_cache, ignore_errors=True)
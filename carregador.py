@@ -0,0 +1,270 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cache_dados import DIRETORIO_CACHE, ColunasMapeadas, carregar_com_cache, diretorio_colunas
+import entrada
+from entrada import abrir_manifesto, entrada_simples
+import imputacao
+from imputacao import contar_idades, estimar_idades, extrair_titulos, medianas_idade, somar_contagens
+from instrumentacao import etapa
+
+# Versão das regras de leitura/limpeza; incrementar invalida o cache colunar
+VERSAO_ESQUEMA = 6
+
+# Esquema declarado das colunas do titanic3.csv. 'tipo' é o dtype compacto final;
+# 'valores' lista as categorias válidas e 'minimo' o menor valor numérico aceito
+ESQUEMA = {
+    'pclass': {'tipo': 'int8', 'valores': [1, 2, 3], 'obrigatoria': True},
+    'survived': {'tipo': 'bool'},
+    'name': {'tipo': 'str'},
+    'sex': {'tipo': 'category', 'valores': ['female', 'male']},
+    'age': {'tipo': 'float32', 'minimo': 0},
+    'sibsp': {'tipo': 'int8', 'minimo': 0},
+    'parch': {'tipo': 'int8', 'minimo': 0},
+    'ticket': {'tipo': 'str'},
+    'fare': {'tipo': 'float32', 'minimo': 0},
+    'cabin': {'tipo': 'str'},
+    'embarked': {'tipo': 'category', 'valores': ['C', 'Q', 'S']},
+    'boat': {'tipo': 'category'},
+    'body': {'tipo': 'float32'},
+    'home.dest': {'tipo': 'str'},
+}
+
+# Textos lidos como ausentes em qualquer coluna (os mesmos que o pandas reconhece
+# por padrão), declarados aqui para que todos os motores de leitura usem a mesma lista
+VALORES_AUSENTES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# Faixas etárias usadas na análise da Lei do Mar (limites superiores inclusivos)
+LIMITES_FAIXAS_ETARIAS = [0, 12, 18, 35, 50, 100]
+FAIXAS_ETARIAS = ['Criança (0-12)', 'Adolescente (13-18)', 'Adulto Jovem (19-35)', 'Adulto (36-50)', 'Idoso (50+)']
+
+# Tamanho da família a bordo (sibsp + parch), em faixas (limites superiores inclusivos)
+LIMITES_TAMANHO_FAMILIA = [-1, 0, 3, np.inf]
+TAMANHOS_FAMILIA = ['Sozinho (0)', 'Pequena (1-3)', 'Grande (4+)']
+
+# Botes salva-vidas: os numerados de 1 a 16 e os desmontáveis de A a D
+BOTES = [str(numero) for numero in range(1, 17)] + ['A', 'B', 'C', 'D']
+
+# Primeiro bote citado no código (registros como '13 15' ou 'C D' citam mais de um)
+REGEX_BOTE = r'\b(1[0-6]|[1-9]|[A-D])\b'
+
+
+def normalizar_botes(botes):
+    """Bote de cada registro de 'boat', normalizado para uma das categorias de BOTES.
+
+    Registros que citam mais de um bote ficam com o primeiro, e códigos sem
+    nenhum bote reconhecido ficam ausentes. A expressão regular é aplicada só às
+    categorias distintas da coluna, não a cada linha.
+    """
+    botes = botes.astype('category')
+    normalizadas = botes.cat.categories.astype(str).str.upper().str.extract(REGEX_BOTE, expand=False)
+    mapa = np.append(pd.Categorical(normalizadas, categories=BOTES).codes, -1)
+    return pd.Series(pd.Categorical.from_codes(mapa[botes.cat.codes], categories=BOTES), index=botes.index)
+
+
+def _tipo_leitura(tipo):
+    # Inteiros são lidos como nullable para tolerar linhas vazias antes da validação
+    return {'int8': 'Int8', 'bool': 'Int8'}.get(tipo, tipo)
+
+
+TIPOS_LEITURA = {nome: _tipo_leitura(coluna['tipo']) for nome, coluna in ESQUEMA.items()}
+
+
+def ler_csv(arquivo, **kwargs):
+    """Lê o CSV do manifesto já com vírgula decimal e os dtypes declarados no esquema.
+
+    Além de um caminho ou fluxo já aberto, aceita manifestos comprimidos (gzip,
+    bz2, xz ou zstd) e divididos em várias partes (lista de caminhos ou padrão
+    glob), descomprimidos em streaming direto para o parser (veja entrada.py).
+    """
+    opcoes = {'sep': ';', 'decimal': ',', 'dtype': TIPOS_LEITURA, 'na_values': VALORES_AUSENTES,
+              'keep_default_na': False, **kwargs}
+    if not isinstance(arquivo, (str, os.PathLike, list, tuple)) or entrada_simples(arquivo):
+        return pd.read_csv(arquivo, **opcoes)
+    fluxo = abrir_manifesto(arquivo, ESQUEMA)
+    if kwargs.get('chunksize'):
+        return _ler_blocos_do_fluxo(fluxo, opcoes)
+    with fluxo:
+        return pd.read_csv(fluxo, **opcoes)
+
+
+def _ler_blocos_do_fluxo(fluxo, opcoes):
+    # O fluxo (e a thread de descompressão) fica aberto até o último bloco ser lido
+    with fluxo, pd.read_csv(fluxo, **opcoes) as blocos:
+        yield from blocos
+
+
+def validar_e_converter(df, avisos=True):
+    """Valida cada coluna contra o esquema e converte para os dtypes compactos.
+
+    As regras são aplicadas linha a linha, então valem igualmente para o arquivo
+    inteiro e para cada bloco lido em modo streaming.
+    """
+    faltando = [nome for nome in ESQUEMA if nome not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no manifesto: {faltando}")
+
+    def avisar(mensagem):
+        if avisos:
+            print(f"Atenção: {mensagem}")
+
+    # Linhas sem nenhum valor (ex.: linha final só com separadores) não são passageiros
+    vazias = df[list(ESQUEMA)].isna().all(axis=1)
+    if vazias.any():
+        avisar(f"{vazias.sum()} linhas vazias descartadas.")
+        df = df[~vazias].reset_index(drop=True)
+
+    for nome, coluna in ESQUEMA.items():
+        serie = df[nome]
+        tipo = coluna['tipo']
+
+        if 'valores' in coluna and tipo == 'category':
+            invalidos = ~serie.isin(coluna['valores']) & serie.notna()
+            if invalidos.any():
+                avisar(f"{invalidos.sum()} valores inválidos em '{nome}' tratados como ausentes.")
+            serie = serie.cat.set_categories(coluna['valores'])
+        elif 'minimo' in coluna:
+            invalidos = serie < coluna['minimo']
+            if invalidos.any():
+                avisar(f"{invalidos.sum()} valores negativos em '{nome}' tratados como ausentes.")
+                serie = serie.mask(invalidos)
+
+        if nome == 'survived':
+            if serie.isna().any():
+                avisar(f"{serie.isna().sum()} valores nulos encontrados na coluna 'survived'. Preenchendo com 0.")
+            serie = serie.fillna(0).astype(bool)
+        elif tipo == 'int8':
+            if 'valores' in coluna:
+                serie = serie.where(serie.isin(coluna['valores']))
+            if serie.isna().any():
+                if coluna.get('obrigatoria'):
+                    raise ValueError(f"{serie.isna().sum()} linhas sem valor válido na coluna obrigatória '{nome}'")
+            else:
+                serie = serie.astype(np.int8)
+        df[nome] = serie
+
+    # Colunas derivadas usadas pelas análises
+    df['titulo'] = extrair_titulos(df['name'])
+    df['bote'] = normalizar_botes(df['boat'])
+    _derivar_colunas_idade(df)
+    familia = df['sibsp'].astype('float32') + df['parch'].astype('float32')
+    df['tamanho_familia'] = pd.cut(familia, bins=LIMITES_TAMANHO_FAMILIA, labels=TAMANHOS_FAMILIA)
+    return df
+
+
+def colunas_idade(idades):
+    """Colunas 'is_child' e 'categoria_idade' derivadas de uma coluna de idades ('age' ou 'age_imputada')."""
+    return {
+        'is_child': idades < 18,
+        'categoria_idade': pd.cut(idades, bins=LIMITES_FAIXAS_ETARIAS, labels=FAIXAS_ETARIAS),
+    }
+
+
+def _derivar_colunas_idade(df):
+    for nome, serie in colunas_idade(df['age']).items():
+        df[nome] = serie
+
+
+def imputar_idade(df, medianas=None):
+    """Estima as idades ausentes pelas medianas por (título, classe, sexo) e marca as linhas imputadas.
+
+    `medianas` (de imputacao.medianas_idade) permite aplicar a um bloco as
+    medianas do arquivo inteiro; sem elas, são calculadas a partir de `df`. As
+    colunas 'age', 'is_child' e 'categoria_idade' continuam só com as idades
+    observadas; 'age_imputada' traz a idade observada ou, na falta dela, a
+    estimada, e 'idade_imputada' diz quais linhas foram estimadas. Cada análise
+    escolhe a coluna que usa (veja colunas_idade), sem copiar o DataFrame.
+    """
+    if medianas is None:
+        medianas = medianas_idade(contar_idades(df))
+    df['age_imputada'], df['idade_imputada'] = estimar_idades(df, medianas)
+    return df
+
+
+def medianas_do_arquivo(arquivo, tamanho_bloco):
+    """Medianas de imputação do arquivo inteiro, lido em blocos (só as contagens por idade ficam em memória)."""
+    contagens = [contar_idades(bloco) for bloco in ler_em_blocos(arquivo, tamanho_bloco)]
+    return medianas_idade(somar_contagens(contagens))
+
+
+def ler_em_blocos(arquivo, tamanho_bloco, medianas=None):
+    """Gera blocos já validados e convertidos, sem carregar o arquivo inteiro.
+
+    Com `medianas`, as idades ausentes de cada bloco são imputadas (veja imputar_idade).
+    """
+    for bloco in ler_csv(arquivo, chunksize=tamanho_bloco):
+        bloco = validar_e_converter(bloco, avisos=False)
+        yield bloco if medianas is None else imputar_idade(bloco, medianas)
+
+
+def memoria_por_coluna(df):
+    """Memória ocupada por coluna, em bytes (inclui o conteúdo de textos)."""
+    return df.memory_usage(index=False, deep=True)
+
+
+def preprocessar_dados(arquivo):
+    """Lê e valida o CSV, exibindo um resumo dos dados e da memória ocupada."""
+    with etapa('ler_csv') as info:
+        df = ler_csv(arquivo)
+        info['linhas'] = len(df)
+
+    print("\nInformações do Dataset:")
+    print(f"Número de registros: {df.shape[0]}")
+    print(f"Número de colunas: {df.shape[1]}")
+
+    # Verificação de valores nulos
+    print("\nValores nulos por coluna:")
+    print(df.isnull().sum())
+
+    with etapa('validar_e_converter', len(df)):
+        df = validar_e_converter(df)
+
+    with etapa('imputar_idade', len(df)):
+        df = imputar_idade(df)
+    print(f"\nIdades ausentes estimadas pela mediana de (título, classe, sexo) em 'age_imputada': {df['idade_imputada'].sum()}")
+
+    memoria = memoria_por_coluna(df)
+    print("\nMemória por coluna (KiB):")
+    print((memoria / 1024).round(1).to_string())
+    print(f"Total: {memoria.sum() / 1024:.1f} KiB")
+    return df
+
+
+def _argumentos_cache():
+    # Versão e código de limpeza que fazem parte da chave do cache colunar: os módulos
+    # inteiros, para que constantes e funções auxiliares (normalizar_botes, medianas_idade,
+    # REGEX_TITULO, ...) também invalidem o cache
+    return (VERSAO_ESQUEMA, ESQUEMA), DIRETORIO_CACHE, [sys.modules[__name__], imputacao, entrada]
+
+
+def carregar_dados(arquivo, usar_cache=True):
+    """Carrega e pré-processa os dados do Titanic, usando o cache colunar quando possível."""
+    print(f"Carregando dados de {arquivo}...")
+    with etapa('carregar_dados') as info:
+        if not usar_cache:
+            df = preprocessar_dados(arquivo)
+        else:
+            df = carregar_com_cache(arquivo, preprocessar_dados, *_argumentos_cache())
+        info['linhas'] = len(df)
+    return df
+
+
+def carregar_colunas_mapeadas(arquivo):
+    """Colunas limpas do manifesto como arrays mapeados em memória, compartilháveis entre processos.
+
+    Usa o mesmo diretório do cache colunar de `carregar_dados` (gerando-o se
+    preciso). O resultado pode ser passado às funções de análise no lugar do
+    DataFrame e enviado a processos de trabalho sem copiar os dados.
+    """
+    print(f"Mapeando as colunas de {arquivo}...")
+    with etapa('carregar_colunas_mapeadas') as info:
+        colunas = ColunasMapeadas(diretorio_colunas(arquivo, preprocessar_dados, *_argumentos_cache()))
+        info['linhas'] = len(colunas)
+    return colunas
+
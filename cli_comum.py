@@ -0,0 +1,132 @@
+import argparse
+import contextlib
+import json
+import sys
+
+from carregador import carregar_colunas_mapeadas, carregar_dados
+from cubo_sobrevivencia import IDADES, construir_cubo, construir_cubo_em_blocos
+from incremental import atualizar_cubo
+from indice_cubo import EXTENSAO_INDICE, carregar_indice
+import instrumentacao
+from motores import MOTORES, construir_cubo_csv, escolher_motor
+from resultados import para_json
+
+
+def silencioso(*args, **kwargs):
+    """Descarta mensagens quando a saída no console está desativada."""
+
+
+def texto_ic(intervalo, **filtro):
+    """Intervalo de confiança formatado para as conclusões, ou texto vazio se não houver.
+
+    `intervalo` é um par (inferior, superior) ou uma tabela de resumo_intervalos,
+    da qual é usada a linha que atende a `filtro`.
+    """
+    if intervalo is None:
+        return ""
+    if hasattr(intervalo, 'columns'):
+        linha = intervalo
+        for coluna, valor in filtro.items():
+            linha = linha[linha[coluna] == valor]
+        if linha.empty:
+            return ""
+        intervalo = linha['ic_inferior'].values[0], linha['ic_superior'].values[0]
+    inferior, superior = intervalo
+    return f" (IC 95%: {inferior:.1f} a {superior:.1f})"
+
+
+def texto_p(testes, nome, separador=' '):
+    """p-valores do teste de permutação de uma hipótese, no manifesto inteiro e estratificado por classe."""
+    if not testes:
+        return ""
+    return (f"{separador}(teste de permutação: p = {testes[nome]['p_valor']:.2g}; "
+            f"estratificado por classe: p = {testes[f'{nome}_por_classe']['p_valor']:.2g})")
+
+
+def carregar_cubo(arquivo, tamanho_bloco=None, incremental=False, motor='auto', idades='observadas',
+                  colunas_mapeadas=False, verificacao_completa=False):
+    """Carrega o manifesto e agrega as contagens no cubo de sobrevivência.
+
+    Um índice gerado por indice_cubo.py é carregado diretamente. Com
+    `incremental`, só as linhas acrescentadas desde a última execução são lidas
+    (`verificacao_completa` confere antes todo o trecho já processado, veja
+    incremental.atualizar_cubo);
+    `motor` escolhe quem lê e agrega o CSV (veja motores.escolher_motor); com
+    `tamanho_bloco`, o CSV é lido em blocos e só as contagens ficam em memória;
+    com `colunas_mapeadas`, o cubo é agregado direto das colunas do cache
+    mapeadas em memória, sem montar uma cópia do DataFrame no processo. `idades`
+    escolhe entre só as idades observadas e também as imputadas (veja
+    CuboSobrevivencia.com_idades).
+    """
+    if arquivo.endswith(EXTENSAO_INDICE):
+        print(f"Carregando o índice de contagens {arquivo}...")
+        cubo = carregar_indice(arquivo)
+    elif incremental:
+        cubo = atualizar_cubo(arquivo, verificacao_completa=verificacao_completa)
+    elif escolher_motor(arquivo, motor) != 'pandas':
+        cubo = construir_cubo_csv(arquivo, motor)
+    elif tamanho_bloco:
+        print(f"Carregando dados de {arquivo} em blocos de {tamanho_bloco} linhas...")
+        cubo = construir_cubo_em_blocos(arquivo, tamanho_bloco)
+    else:
+        df = carregar_colunas_mapeadas(arquivo) if colunas_mapeadas else carregar_dados(arquivo)
+        # Agregar todas as contagens em uma única passagem sobre os dados
+        cubo = construir_cubo(df)
+    return cubo.com_idades(idades)
+
+
+def criar_parser(descricao):
+    """Argumentos de linha de comando comuns aos dois relatórios."""
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, padrão glob das partes "
+                             "ou índice .cubo.npz")
+    parser.add_argument('--tamanho-bloco', type=int, default=None,
+                        help="Lê o CSV em blocos com este número de linhas (para manifestos maiores que a memória)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Processa apenas as linhas acrescentadas desde a última execução")
+    parser.add_argument('--verificacao-completa', action='store_true',
+                        help="Com --incremental, confere o hash de todo o trecho já processado antes de acrescentar "
+                             "as linhas novas, detectando também edições antigas seguidas de acréscimos")
+    parser.add_argument('--motor', choices=['auto', *MOTORES], default='auto',
+                        help="Quem lê e agrega o CSV; 'auto' usa DuckDB ou Polars (se instalados) "
+                             "ou o motor paralelo em arquivos grandes e o pandas nos demais")
+    parser.add_argument('--idades', choices=IDADES, default='observadas',
+                        help="Faixas etárias só com as idades observadas ou também com as imputadas "
+                             "pela mediana de (título, classe, sexo)")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número de processos para renderizar as páginas do PDF (1 = sem paralelismo)")
+    parser.add_argument('--formato', choices=['pdf', 'html'], default='pdf',
+                        help="Relatório em PDF (matplotlib) ou em HTML com gráficos SVG e os dados em JSON")
+    parser.add_argument('--somente-estatisticas', action='store_true',
+                        help="Imprime tabelas e conclusões em JSON, sem importar bibliotecas de gráficos")
+    parser.add_argument('--instrumentar', action='store_true',
+                        help="Mede tempo, CPU e memória de cada etapa e grava em JSON e Chrome trace "
+                             f"(também ativado por {instrumentacao.VARIAVEL_AMBIENTE}=1)")
+    return parser
+
+
+def executar(descricao, nome, calcular_estatisticas, gerar_relatorio):
+    """Ponto de entrada dos scripts de relatório.
+
+    Lê os argumentos e imprime as estatísticas em JSON (`calcular_estatisticas`)
+    ou gera o relatório (`gerar_relatorio`); `nome` identifica os arquivos da
+    instrumentação.
+    """
+    args = criar_parser(descricao).parse_args()
+    if args.instrumentar:
+        instrumentacao.ativar()
+    opcoes_carga = {'tamanho_bloco': args.tamanho_bloco, 'incremental': args.incremental,
+                    'verificacao_completa': args.verificacao_completa, 'motor': args.motor, 'idades': args.idades}
+
+    if args.somente_estatisticas:
+        # Mensagens de progresso vão para stderr para não misturar com o JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            estatisticas = calcular_estatisticas(args.arquivo, **opcoes_carga)
+        print(json.dumps(para_json(estatisticas), ensure_ascii=False, indent=2))
+    else:
+        gerar_relatorio(args.arquivo, processos=args.processos, formato=args.formato, **opcoes_carga)
+
+    # O resumo vai para stderr para não misturar com o JSON do modo somente-estatísticas
+    with contextlib.redirect_stdout(sys.stderr):
+        instrumentacao.finalizar(nome)
@@ -0,0 +1,288 @@
+import numpy as np
+import pandas as pd
+
+from carregador import BOTES, FAIXAS_ETARIAS, TAMANHOS_FAMILIA, colunas_idade, ler_em_blocos, medianas_do_arquivo
+from instrumentacao import etapa, instrumentar
+
+# Dimensões do cubo e suas categorias conhecidas. Cada eixo ganha uma posição
+# extra no final para valores ausentes, para que as marginais de um eixo
+# continuem somando linhas que não têm valor em outro eixo (como faz o groupby)
+DIMENSOES = {
+    'pclass': [1, 2, 3],
+    'sex': ['female', 'male'],
+    'is_child': [False, True],
+    'categoria_idade': FAIXAS_ETARIAS,
+    'embarked': ['C', 'Q', 'S'],
+    'tamanho_familia': TAMANHOS_FAMILIA,
+    'bote': BOTES,
+    'idade_imputada': [False, True],
+}
+
+# Bordo de lançamento: os botes ímpares e os desmontáveis A e C saíram a estibordo,
+# os pares e B e D a bombordo
+LADOS_BOTE = ['Estibordo', 'Bombordo']
+LADO_DO_BOTE = {bote: 'Estibordo' if bote in ('A', 'C') or (bote.isdigit() and int(bote) % 2) else 'Bombordo'
+                for bote in BOTES}
+
+# Dimensões consultáveis que não são eixos do cubo, mas agrupamentos das posições
+# de outro eixo: origem, categorias e a posição (ou a de ausentes) de cada posição da origem
+DIMENSOES_DERIVADAS = {
+    'em_bote': ('bote', [False, True], [1] * len(BOTES) + [0]),
+    'lado_bote': ('bote', LADOS_BOTE, [LADOS_BOTE.index(LADO_DO_BOTE[b]) for b in BOTES] + [len(LADOS_BOTE)]),
+}
+
+# Como tratar as idades imputadas (veja CuboSobrevivencia.com_idades)
+IDADES = ('observadas', 'imputadas')
+
+# Dimensões derivadas da idade, que só têm valor para idades imputadas na visão 'imputadas'
+DIMENSOES_IDADE = ('is_child', 'categoria_idade')
+
+# Dimensões cujas categorias têm ordem própria (mantidas como Categorical ordenado)
+DIMENSOES_ORDENADAS = {'categoria_idade', 'tamanho_familia'}
+
+
+def categorias(dimensao):
+    """Categorias de uma dimensão do cubo ou derivada (veja DIMENSOES_DERIVADAS)."""
+    if dimensao in DIMENSOES_DERIVADAS:
+        return DIMENSOES_DERIVADAS[dimensao][1]
+    return DIMENSOES[dimensao]
+
+
+class CuboSobrevivencia:
+    """Contagens de sobreviventes e totais para cada combinação de dimensões."""
+
+    def __init__(self, dimensoes, sobreviventes, totais):
+        self.dimensoes = list(dimensoes)
+        self.sobreviventes = sobreviventes
+        self.totais = totais
+
+    @property
+    def total_registros(self):
+        return int(self.totais.sum())
+
+    def mesclar(self, outro):
+        """Soma as contagens de outro cubo com as mesmas dimensões (ex.: outro bloco do CSV)."""
+        if self.dimensoes != outro.dimensoes:
+            raise ValueError(f"Cubos com dimensões diferentes: {self.dimensoes} e {outro.dimensoes}")
+        return CuboSobrevivencia(
+            self.dimensoes, self.sobreviventes + outro.sobreviventes, self.totais + outro.totais
+        )
+
+    def com_idades(self, idades='observadas'):
+        """Cubo sem o eixo 'idade_imputada', com as idades imputadas usadas ou não.
+
+        Com 'observadas', as linhas de idade imputada voltam à posição de ausentes
+        dos eixos de idade, como se a imputação não tivesse sido feita; com
+        'imputadas', contam na faixa da idade estimada. As demais marginais são as
+        mesmas nas duas visões. O custo é proporcional ao número de células, e um
+        cubo que já não tem o eixo é devolvido como está.
+        """
+        if idades not in IDADES:
+            raise ValueError(f"Opção de idades desconhecida: {idades!r} (use {' ou '.join(IDADES)})")
+        if 'idade_imputada' not in self.dimensoes:
+            return self
+        eixo = self.dimensoes.index('idade_imputada')
+        dimensoes = [d for d in self.dimensoes if d != 'idade_imputada']
+
+        def resolver(contagens):
+            observadas = np.take(contagens, [0, 2], axis=eixo).sum(axis=eixo)
+            imputadas = np.take(contagens, 1, axis=eixo)
+            if idades == 'observadas':
+                for d in DIMENSOES_IDADE:
+                    if d in dimensoes:
+                        i = dimensoes.index(d)
+                        movidas = np.zeros_like(imputadas)
+                        ausentes = tuple(slice(-1, None) if j == i else slice(None) for j in range(imputadas.ndim))
+                        movidas[ausentes] = imputadas.sum(axis=i, keepdims=True)
+                        imputadas = movidas
+            return observadas + imputadas
+
+        return CuboSobrevivencia(dimensoes, resolver(self.sobreviventes), resolver(self.totais))
+
+    def com_derivadas(self, dimensoes):
+        """Cubo em que o eixo de origem de cada dimensão derivada em `dimensoes` é trocado por ela.
+
+        Ex.: 'lado_bote' soma as posições do eixo 'bote' de cada bordo, com custo
+        proporcional ao número de células. Sem dimensões derivadas (ou se o cubo
+        já tem o eixo pedido), devolve o próprio cubo.
+        """
+        cubo = self
+        for dimensao in dimensoes:
+            if dimensao in cubo.dimensoes or dimensao not in DIMENSOES_DERIVADAS:
+                continue
+            origem, categorias_derivadas, mapa = DIMENSOES_DERIVADAS[dimensao]
+            if origem not in cubo.dimensoes:
+                continue
+            if origem in dimensoes:
+                raise ValueError(f"'{dimensao}' é derivada de '{origem}' e não pode ser pedida junto com ela")
+            eixo = cubo.dimensoes.index(origem)
+            mapa = np.asarray(mapa)
+
+            def agrupar(contagens):
+                return np.stack([
+                    np.take(contagens, np.flatnonzero(mapa == posicao), axis=eixo).sum(axis=eixo)
+                    for posicao in range(len(categorias_derivadas) + 1)
+                ], axis=eixo)
+
+            dimensoes_novas = [dimensao if d == origem else d for d in cubo.dimensoes]
+            cubo = CuboSobrevivencia(dimensoes_novas, agrupar(cubo.sobreviventes), agrupar(cubo.totais))
+        return cubo
+
+    def contagens(self, dimensoes):
+        """Soma o cubo sobre os eixos que não estão em `dimensoes`, descartando ausentes."""
+        cubo = self.com_derivadas(dimensoes)
+        if cubo is not self:
+            return cubo.contagens(dimensoes)
+        eixos_somados = tuple(i for i, d in enumerate(self.dimensoes) if d not in dimensoes)
+        restantes = [d for d in self.dimensoes if d in dimensoes]
+        ordem = [restantes.index(d) for d in dimensoes]
+
+        sobreviventes = self.sobreviventes.sum(axis=eixos_somados).transpose(ordem)
+        totais = self.totais.sum(axis=eixos_somados).transpose(ordem)
+
+        # Remover a posição de valores ausentes dos eixos mantidos
+        sem_ausentes = tuple(slice(0, -1) for _ in dimensoes)
+        return sobreviventes[sem_ausentes], totais[sem_ausentes]
+
+    def consultar(self, filtros=None, agrupar=()):
+        """Sobreviventes e totais das células que atendem a `filtros`, somados fora de `agrupar`.
+
+        `filtros` mapeia dimensão -> categoria ou lista de categorias (None
+        seleciona os valores ausentes). Só usa índices e somas sobre o cubo, então o
+        custo é proporcional ao número de células, não ao de linhas. Os eixos de
+        `agrupar` saem na ordem pedida e sem a posição de ausentes.
+        """
+        filtros = filtros or {}
+        agrupar = list(agrupar)
+        cubo = self.com_derivadas([*filtros, *agrupar])
+        if cubo is not self:
+            return cubo.consultar(filtros, agrupar)
+        desconhecidas = [d for d in [*filtros, *agrupar] if d not in self.dimensoes]
+        if desconhecidas:
+            raise ValueError(f"Dimensões fora do cubo: {desconhecidas} (disponíveis: {self.dimensoes})")
+
+        seletores = []
+        for d in self.dimensoes:
+            categorias_d = categorias(d)
+            if d in filtros:
+                valores = filtros[d] if isinstance(filtros[d], (list, tuple, set)) else [filtros[d]]
+                invalidos = [v for v in valores if v is not None and v not in categorias_d]
+                if invalidos:
+                    raise ValueError(f"Categorias desconhecidas para '{d}': {invalidos}")
+                indices = sorted(len(categorias_d) if v is None else categorias_d.index(v) for v in valores)
+            elif d in agrupar:
+                indices = range(len(categorias_d))
+            else:
+                indices = range(len(categorias_d) + 1)
+            seletores.append(np.asarray(indices, dtype=np.intp))
+
+        selecao = np.ix_(*seletores)
+        eixos_somados = tuple(i for i, d in enumerate(self.dimensoes) if d not in agrupar)
+        restantes = [d for d in self.dimensoes if d in agrupar]
+        ordem = [restantes.index(d) for d in agrupar]
+        sobreviventes = self.sobreviventes[selecao].sum(axis=eixos_somados).transpose(ordem)
+        totais = self.totais[selecao].sum(axis=eixos_somados).transpose(ordem)
+        return sobreviventes, totais
+
+    def tabela(self, dimensoes):
+        """Tabela de sobrevivência no formato usado pelas análises, derivada do cubo."""
+        dimensoes = list(dimensoes)
+        sobreviventes, totais = self.contagens(dimensoes)
+
+        niveis = [
+            pd.CategoricalIndex(categorias(d), categories=categorias(d), ordered=True) if d in DIMENSOES_ORDENADAS else categorias(d)
+            for d in dimensoes
+        ]
+        indice = pd.MultiIndex.from_product(niveis, names=dimensoes)
+        tabela = indice.to_frame(index=False)
+        tabela['survived_count'] = sobreviventes.ravel()
+        tabela['total'] = totais.ravel()
+
+        # Assim como no groupby, combinações sem nenhum registro não aparecem
+        tabela = tabela[tabela['total'] > 0].reset_index(drop=True)
+        tabela.insert(len(dimensoes), 'survived', tabela['survived_count'] / tabela['total'])
+        tabela['taxa_sobrevivencia'] = tabela['survived'] * 100
+        return tabela
+
+
+def _valores_dimensao(df, dimensao):
+    if dimensao not in DIMENSOES_IDADE:
+        return df[dimensao]
+    if 'age_imputada' in df.columns:
+        # Os eixos de idade usam a idade estimada; o eixo 'idade_imputada' permite
+        # voltar às observadas (veja CuboSobrevivencia.com_idades)
+        idades = df['age_imputada']
+        valores = colunas_idade(idades)[dimensao]
+    else:
+        idades, valores = df['age'], df[dimensao]
+    if dimensao == 'is_child':
+        # Só é possível classificar como criança ou adulto quando a idade é conhecida
+        valores = valores.where(idades.notna())
+    return valores
+
+
+def _codificar(valores, categorias):
+    codigos = pd.Categorical(valores, categories=categorias).codes.astype(np.intp)
+    codigos[codigos < 0] = len(categorias)
+    return codigos
+
+
+def dimensoes_disponiveis(df):
+    """Dimensões do cubo que podem ser obtidas a partir das colunas do DataFrame."""
+    return [d for d in DIMENSOES if d in df.columns]
+
+
+@instrumentar
+def construir_cubo(df, dimensoes=None, pesos=None):
+    """Constrói o cubo de contagens em uma única passagem vetorizada sobre as linhas.
+
+    `pesos` dá o número de passageiros que cada linha representa, quando `df`
+    já é uma tabela de contagens (padrão: um por linha).
+    """
+    dimensoes = dimensoes_disponiveis(df) if dimensoes is None else list(dimensoes)
+    formato = tuple(len(DIMENSOES[d]) + 1 for d in dimensoes)
+
+    codigos = [_codificar(_valores_dimensao(df, d), DIMENSOES[d]) for d in dimensoes]
+    celulas = np.ravel_multi_index(codigos, formato)
+    sobreviveu = df['survived'].to_numpy() == 1
+
+    tamanho = int(np.prod(formato))
+    if pesos is None:
+        totais = np.bincount(celulas, minlength=tamanho)
+        sobreviventes = np.bincount(celulas[sobreviveu], minlength=tamanho)
+    else:
+        pesos = np.asarray(pesos)
+        totais = np.bincount(celulas, weights=pesos, minlength=tamanho).astype(np.int64)
+        sobreviventes = np.bincount(celulas[sobreviveu], weights=pesos[sobreviveu], minlength=tamanho).astype(np.int64)
+    return CuboSobrevivencia(dimensoes, sobreviventes.reshape(formato), totais.reshape(formato))
+
+
+def construir_cubo_em_blocos(arquivo, tamanho_bloco=100_000, dimensoes=None):
+    """Lê o CSV em blocos de tamanho limitado, acumulando as contagens de cada bloco.
+
+    Como as regras de limpeza do carregador são linha a linha, o cubo resultante
+    é idêntico ao construído a partir do arquivo inteiro. A imputação de idades
+    depende das medianas do arquivo todo, então o CSV é lido duas vezes: a
+    primeira passagem só conta as idades conhecidas de cada grupo.
+    """
+    cubo = None
+    with etapa('medianas_idade_em_blocos'):
+        medianas = medianas_do_arquivo(arquivo, tamanho_bloco)
+    with etapa('construir_cubo_em_blocos') as info:
+        for bloco in ler_em_blocos(arquivo, tamanho_bloco, medianas):
+            parcial = construir_cubo(bloco, dimensoes)
+            cubo = parcial if cubo is None else cubo.mesclar(parcial)
+        info['linhas'] = cubo.total_registros if cubo is not None else 0
+    return cubo
+
+
+def obter_cubo(dados, idades='observadas'):
+    """Aceita um cubo já construído ou um DataFrame, evitando reagregar as linhas.
+
+    Se o cubo ainda tiver o eixo 'idade_imputada', aplica `idades` (veja
+    CuboSobrevivencia.com_idades); para usar as idades imputadas em uma análise,
+    basta passar a ela `cubo.com_idades('imputadas')`.
+    """
+    if not isinstance(dados, CuboSobrevivencia):
+        dados = construir_cubo(dados)
+    return dados.com_idades(idades)
@@ -0,0 +1,206 @@
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+# Formatos de compressão reconhecidos pelos primeiros bytes do arquivo (não pela
+# extensão). zstd depende do pacote opcional zstandard
+ASSINATURAS = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\xfd7zXZ\x00': 'xz', b'\x28\xb5\x2f\xfd': 'zstd'}
+
+# Extensões retiradas do nome dos manifestos comprimidos (ex.: nomes de saída do lote)
+EXTENSOES_COMPRESSAO = ('.gz', '.bz2', '.xz', '.zst')
+
+# Bytes descomprimidos por leitura e quantos deles a thread de descompressão
+# pode deixar prontos à frente do parser (limita a memória a alguns MiB)
+TAMANHO_LEITURA = 1 << 20
+BLOCOS_EM_ESPERA = 8
+
+
+def partes_do_manifesto(arquivo):
+    """Arquivos que compõem o manifesto, em ordem: um caminho, um padrão glob ou uma lista deles."""
+    entradas = [arquivo] if isinstance(arquivo, (str, os.PathLike)) else list(arquivo)
+    partes = []
+    for entrada in map(os.fspath, entradas):
+        if glob.has_magic(entrada) and not os.path.exists(entrada):
+            encontrados = sorted(glob.glob(entrada, recursive=True))
+            if not encontrados:
+                raise FileNotFoundError(f"Nenhum arquivo corresponde a {entrada!r}")
+            partes.extend(encontrados)
+        else:
+            partes.append(entrada)
+    if not partes:
+        raise ValueError("Nenhum arquivo de manifesto informado")
+    return partes
+
+
+def compressao(caminho):
+    """Formato de compressão do arquivo ('gzip', 'bz2', 'xz' ou 'zstd'), ou None se for texto puro."""
+    with open(caminho, 'rb') as f:
+        inicio = f.read(6)
+    return next((formato for assinatura, formato in ASSINATURAS.items() if inicio.startswith(assinatura)), None)
+
+
+def entrada_simples(arquivo):
+    """Se o manifesto é um único CSV sem compressão, que pode ser lido por offsets de bytes."""
+    partes = partes_do_manifesto(arquivo)
+    return len(partes) == 1 and compressao(partes[0]) is None
+
+
+def tamanho_em_disco(arquivo):
+    """Soma dos tamanhos (comprimidos, se for o caso) das partes do manifesto, em bytes."""
+    return sum(os.path.getsize(parte) for parte in partes_do_manifesto(arquivo))
+
+
+def nome_sem_compressao(caminho):
+    """Caminho sem a extensão de compressão (ex.: 'viagem.csv.gz' -> 'viagem.csv')."""
+    base, extensao = os.path.splitext(caminho)
+    return base if extensao.lower() in EXTENSOES_COMPRESSAO else caminho
+
+
+def abrir_parte(caminho):
+    """Fluxo binário com o conteúdo descomprimido de uma parte, sem gravar cópias temporárias."""
+    formato = compressao(caminho)
+    if formato is None:
+        return open(caminho, 'rb')
+    if formato == 'gzip':
+        return gzip.open(caminho, 'rb')
+    if formato == 'bz2':
+        return bz2.open(caminho, 'rb')
+    if formato == 'xz':
+        return lzma.open(caminho, 'rb')
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f"{caminho} está comprimido com zstd (pip install zstandard)") from None
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(caminho, 'rb'), closefd=True))
+
+
+def _colunas(cabecalho):
+    return [nome.strip().strip('"') for nome in cabecalho.decode('utf-8-sig').rstrip('\r\n').split(';')]
+
+
+def verificar_cabecalhos(partes, colunas_obrigatorias=()):
+    """Confere se todas as partes têm o mesmo cabeçalho, com as colunas obrigatórias; devolve o da primeira.
+
+    Só a primeira linha de cada parte é descomprimida, então um manifesto com
+    uma parte incompatível falha antes de qualquer linha ser processada.
+    """
+    cabecalho = referencia = None
+    for parte in partes:
+        with abrir_parte(parte) as f:
+            linha = f.readline()
+        if not linha:
+            raise ValueError(f"A parte {parte} do manifesto está vazia (sem cabeçalho)")
+        if cabecalho is None:
+            cabecalho, referencia = linha, _colunas(linha)
+            faltando = [nome for nome in colunas_obrigatorias if nome not in referencia]
+            if faltando:
+                raise ValueError(f"Colunas ausentes no manifesto {parte}: {faltando}")
+        elif _colunas(linha) != referencia:
+            raise ValueError(f"O cabeçalho de {parte} difere do de {partes[0]}: {_colunas(linha)} != {referencia}")
+    return cabecalho if cabecalho.endswith(b'\n') else cabecalho + b'\n'
+
+
+class LeitorManifesto(io.RawIOBase):
+    """Fluxo binário com o cabeçalho e as linhas de todas as partes, como se fossem um único CSV.
+
+    As partes são descomprimidas em sequência e o cabeçalho de cada uma é
+    omitido. Com `segundo_plano`, uma thread descomprime até BLOCOS_EM_ESPERA
+    blocos à frente do parser; gzip, bz2, lzma e zstd liberam o GIL, então a
+    descompressão de um bloco se sobrepõe à conversão do anterior.
+    """
+
+    def __init__(self, partes, cabecalho, segundo_plano=True):
+        super().__init__()
+        self._blocos = self._gerar_blocos(partes, cabecalho)
+        self._atual = memoryview(b'')
+        self._fim = False
+        self._thread = None
+        if segundo_plano:
+            self._fila = queue.Queue(maxsize=BLOCOS_EM_ESPERA)
+            self._encerrar = threading.Event()
+            self._thread = threading.Thread(target=self._descomprimir, daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _gerar_blocos(partes, cabecalho):
+        yield cabecalho
+        for parte in partes:
+            with abrir_parte(parte) as f:
+                f.readline()
+                ultimo = b'\n'
+                for bloco in iter(lambda: f.read(TAMANHO_LEITURA), b''):
+                    yield bloco
+                    ultimo = bloco[-1:]
+            # Uma parte sem quebra de linha final não pode colar sua última linha na primeira da seguinte
+            if ultimo != b'\n':
+                yield b'\n'
+
+    def _entregar(self, item):
+        while not self._encerrar.is_set():
+            try:
+                self._fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _descomprimir(self):
+        try:
+            for bloco in self._blocos:
+                if not self._entregar(bloco):
+                    return
+            self._entregar(None)
+        except Exception as e:
+            # O erro é relançado na thread que está lendo
+            self._entregar(e)
+        finally:
+            self._blocos.close()
+
+    def _proximo_bloco(self):
+        if self._thread is None:
+            return next(self._blocos, None)
+        item = self._fila.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._atual:
+            if self._fim:
+                return 0
+            bloco = self._proximo_bloco()
+            if bloco is None:
+                self._fim = True
+                return 0
+            self._atual = memoryview(bloco)
+        n = min(len(destino), len(self._atual))
+        destino[:n] = self._atual[:n]
+        self._atual = self._atual[n:]
+        return n
+
+    def close(self):
+        if self._thread is not None:
+            self._encerrar.set()
+            self._thread.join()
+        else:
+            self._blocos.close()
+        super().close()
+
+
+def abrir_manifesto(arquivo, colunas_obrigatorias=(), segundo_plano=True):
+    """Abre um manifesto (comprimido ou não, em uma ou várias partes) como um único fluxo de CSV.
+
+    Aceita o mesmo que partes_do_manifesto. O resultado pode ser passado
+    diretamente ao pandas; feche-o (ou use `with`) ao terminar.
+    """
+    partes = partes_do_manifesto(arquivo)
+    cabecalho = verificar_cabecalhos(partes, colunas_obrigatorias)
+    return io.BufferedReader(LeitorManifesto(partes, cabecalho, segundo_plano), TAMANHO_LEITURA)
@@ -0,0 +1,331 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from carregador import ESQUEMA, carregar_dados, validar_e_converter
+from instrumentacao import instrumentar
+from leitura_paralela import blocos_da_fatia, fatias_do_manifesto
+from resultados import salvar_json
+
+# Colunas resumidas por quantis em cada (classe, sexo) e colunas com contagem de valores distintos
+COLUNAS_QUANTIS = ['age', 'fare']
+COLUNAS_DISTINTAS = ['ticket', 'cabin', 'home.dest']
+QUANTIS_PADRAO = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Parâmetro de acurácia do KLL: cada esboço guarda cerca de 3*k valores
+K_PADRAO = 200
+
+# Registradores do HyperLogLog: 2**precisao bytes por coluna
+PRECISAO_PADRAO = 14
+
+# Semente dos sorteios das compactações do KLL, para resultados reproduzíveis
+SEMENTE_PADRAO = 0
+
+# Linhas por bloco na leitura do CSV
+TAMANHO_BLOCO = 500_000
+
+CLASSES = ESQUEMA['pclass']['valores']
+SEXOS = ESQUEMA['sex']['valores']
+
+
+def erro_rank_kll(k):
+    """Erro de rank normalizado de um quantil do KLL com 99% de confiança (1,33% com k=200).
+
+    Ajuste empírico publicado com a implementação de referência do KLL
+    (Apache DataSketches); um quantil aproximado q fica entre os quantis exatos
+    q - erro e q + erro.
+    """
+    return 2.296 / k ** 0.9723
+
+
+def erro_padrao_hll(precisao):
+    """Erro relativo padrão da contagem de distintos do HyperLogLog (0,81% com precisão 14)."""
+    return 1.04 / np.sqrt(2 ** precisao)
+
+
+class EsbocoQuantis:
+    """Esboço KLL de quantis: memória limitada, uma passagem e combinável entre blocos ou processos.
+
+    Os valores ficam em níveis; cada valor do nível h representa 2**h valores
+    originais. Quando um nível passa da sua capacidade (k no nível mais alto,
+    2/3 disso em cada nível abaixo), ele é ordenado e metade dos valores,
+    alternados a partir de uma posição sorteada, sobe para o nível seguinte.
+    """
+
+    def __init__(self, k=K_PADRAO, semente=SEMENTE_PADRAO):
+        self.k = k
+        self.niveis = [np.empty(0)]
+        self.n = 0
+        self._sorteios = np.random.default_rng(semente)
+
+    def _capacidade(self, nivel):
+        profundidade = len(self.niveis) - 1 - nivel
+        return max(2, int(np.ceil(self.k * (2 / 3) ** profundidade)))
+
+    def _compactar(self):
+        while True:
+            cheios = [h for h, itens in enumerate(self.niveis) if len(itens) > self._capacidade(h)]
+            if not cheios:
+                return
+            h = cheios[0]
+            if h + 1 == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            itens = np.sort(self.niveis[h])
+            # Com um número ímpar de valores, o menor fica no nível para não alterar o peso total
+            impar = len(itens) % 2
+            promovidos = itens[impar + self._sorteios.integers(2)::2]
+            self.niveis[h] = itens[:impar]
+            self.niveis[h + 1] = np.concatenate([self.niveis[h + 1], promovidos])
+
+    def atualizar(self, valores):
+        """Acrescenta os valores (ausentes são ignorados)."""
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        self.n += len(valores)
+        self.niveis[0] = np.concatenate([self.niveis[0], valores])
+        self._compactar()
+        return self
+
+    def mesclar(self, outro):
+        """Combina dois esboços (de blocos ou fatias diferentes) no próprio esboço."""
+        if outro.k != self.k:
+            raise ValueError(f"Não é possível combinar esboços KLL com k diferentes ({self.k} e {outro.k})")
+        for h, itens in enumerate(outro.niveis):
+            if h == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            self.niveis[h] = np.concatenate([self.niveis[h], itens])
+        self.n += outro.n
+        self._compactar()
+        return self
+
+    def quantis(self, quantis):
+        """Valor aproximado de cada quantil (o menor valor cujo rank acumulado alcança q)."""
+        if not self.n:
+            return np.full(len(quantis), np.nan)
+        itens = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(len(v), 2 ** h) for h, v in enumerate(self.niveis)])
+        ordem = np.argsort(itens, kind='stable')
+        acumulado = np.cumsum(pesos[ordem])
+        posicoes = np.searchsorted(acumulado, np.asarray(quantis) * acumulado[-1], side='left')
+        return itens[ordem][np.minimum(posicoes, len(itens) - 1)]
+
+    def __len__(self):
+        return sum(len(itens) for itens in self.niveis)
+
+
+def _hash(valores):
+    return pd.util.hash_pandas_object(valores, index=False).to_numpy()
+
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos em 2**precisao bytes, combinável pelo máximo dos registradores.
+
+    Cada valor é reduzido a um hash de 64 bits: os `precisao` bits mais altos
+    escolhem o registrador e ele guarda a maior posição do primeiro bit 1 nos
+    bits restantes. Com poucos valores (registradores vazios) a estimativa usa
+    a contagem linear, praticamente exata.
+    """
+
+    def __init__(self, precisao=PRECISAO_PADRAO):
+        # A posição do primeiro bit é calculada em float64, exato para os 64 - precisao bits restantes
+        if not 11 <= precisao <= 18:
+            raise ValueError(f"Precisão do HyperLogLog deve estar entre 11 e 18: {precisao}")
+        self.precisao = precisao
+        self.registradores = np.zeros(2 ** precisao, dtype=np.uint8)
+
+    def atualizar(self, valores):
+        """Acrescenta os valores de uma Series (ausentes são ignorados)."""
+        hashes = _hash(valores.dropna())
+        bits_restantes = 64 - self.precisao
+        indices = (hashes >> np.uint64(bits_restantes)).astype(np.intp)
+        restos = hashes & np.uint64(2 ** bits_restantes - 1)
+        # frexp dá o expoente e com 2**(e-1) <= resto < 2**e (e = 0 para resto 0)
+        _, expoentes = np.frexp(restos.astype(np.float64))
+        np.maximum.at(self.registradores, indices, (bits_restantes + 1 - expoentes).astype(np.uint8))
+        return self
+
+    def mesclar(self, outro):
+        if outro.precisao != self.precisao:
+            raise ValueError(f"Não é possível combinar HyperLogLog com precisões diferentes "
+                             f"({self.precisao} e {outro.precisao})")
+        np.maximum(self.registradores, outro.registradores, out=self.registradores)
+        return self
+
+    def estimativa(self):
+        m = len(self.registradores)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        bruta = alfa * m * m / np.ldexp(1.0, -self.registradores.astype(np.int64)).sum()
+        vazios = int(np.count_nonzero(self.registradores == 0))
+        if bruta <= 2.5 * m and vazios:
+            return m * np.log(m / vazios)
+        return bruta
+
+
+class EsbocosManifesto:
+    """Esboços de quantis de idade e tarifa por (classe, sexo) e de distintos de bilhete, cabine e destino.
+
+    Só as idades observadas entram nos quantis: se os dados tiverem a coluna
+    'idade_imputada', as idades imputadas são ignoradas.
+    """
+
+    def __init__(self, k=K_PADRAO, precisao=PRECISAO_PADRAO, semente=SEMENTE_PADRAO):
+        sementes = np.random.SeedSequence(semente).spawn(len(CLASSES) * len(SEXOS) * len(COLUNAS_QUANTIS))
+        chaves = [(classe, sexo, coluna) for classe in CLASSES for sexo in SEXOS for coluna in COLUNAS_QUANTIS]
+        self.quantis = {chave: EsbocoQuantis(k, s) for chave, s in zip(chaves, sementes)}
+        self.distintos = {coluna: HyperLogLog(precisao) for coluna in COLUNAS_DISTINTAS}
+        self.linhas = 0
+
+    def atualizar(self, dados):
+        """Acrescenta as linhas de um DataFrame limpo ou bloco já validado."""
+        self.linhas += len(dados)
+        idades = dados['age']
+        if 'idade_imputada' in dados.columns:
+            idades = idades.where(~dados['idade_imputada'].to_numpy(dtype=bool))
+        colunas = pd.DataFrame({'pclass': dados['pclass'], 'sex': dados['sex'], 'age': idades,
+                                'fare': dados['fare']})
+        for (classe, sexo), grupo in colunas.groupby(['pclass', 'sex'], observed=True):
+            for coluna in COLUNAS_QUANTIS:
+                self.quantis[(classe, sexo, coluna)].atualizar(grupo[coluna])
+        for coluna, esboco in self.distintos.items():
+            esboco.atualizar(dados[coluna])
+        return self
+
+    def mesclar(self, outro):
+        for chave, esboco in self.quantis.items():
+            esboco.mesclar(outro.quantis[chave])
+        for coluna, esboco in self.distintos.items():
+            esboco.mesclar(outro.distintos[coluna])
+        self.linhas += outro.linhas
+        return self
+
+    def tabela_quantis(self, quantis=QUANTIS_PADRAO):
+        linhas = []
+        for (classe, sexo, coluna), esboco in self.quantis.items():
+            linha = {'Classe': classe, 'Sexo': sexo, 'Coluna': coluna, 'N': esboco.n}
+            linha.update({f'P{round(q * 100)}': valor for q, valor in zip(quantis, esboco.quantis(quantis))})
+            linhas.append(linha)
+        return pd.DataFrame(linhas).sort_values(['Coluna', 'Classe', 'Sexo'], ignore_index=True)
+
+    def tabela_distintos(self):
+        return pd.DataFrame({
+            'Coluna': COLUNAS_DISTINTAS,
+            'Distintos (estimativa)': [round(self.distintos[c].estimativa()) for c in COLUNAS_DISTINTAS],
+        })
+
+
+def _esbocos_da_fatia(fatia, indice, tamanho_bloco, opcoes):
+    # Cada fatia sorteia com uma semente própria, derivada da semente geral
+    opcoes = {**opcoes, 'semente': [opcoes.get('semente', SEMENTE_PADRAO), indice]}
+    esbocos = EsbocosManifesto(**opcoes)
+    for bloco in blocos_da_fatia(*fatia, tamanho_bloco):
+        esbocos.atualizar(validar_e_converter(bloco, avisos=False))
+    return esbocos
+
+
+@instrumentar
+def esbocos_do_arquivo(arquivo, processos=1, tamanho_bloco=TAMANHO_BLOCO, **opcoes):
+    """Esboços do manifesto em uma passagem pelo CSV, sem carregar o DataFrame.
+
+    O arquivo é dividido como no motor paralelo (leitura_paralela); com mais de
+    um processo, cada fatia é resumida em um processo e os esboços são
+    combinados no final. A memória dos esboços não depende do número de linhas.
+    """
+    fatias = fatias_do_manifesto(arquivo, processos)
+    argumentos = (fatias, range(len(fatias)), repeat(tamanho_bloco), repeat(opcoes))
+    esbocos = EsbocosManifesto(**opcoes)
+    if processos > 1 and len(fatias) > 1:
+        with ProcessPoolExecutor(max_workers=min(processos, len(fatias))) as executor:
+            for parcial in executor.map(_esbocos_da_fatia, *argumentos):
+                esbocos.mesclar(parcial)
+    else:
+        for parcial in map(_esbocos_da_fatia, *argumentos):
+            esbocos.mesclar(parcial)
+    return esbocos
+
+
+def comparar_com_exato(esbocos, dados, quantis=QUANTIS_PADRAO):
+    """Erros dos esboços em relação aos valores exatos calculados com o pandas sobre `dados`.
+
+    Para os quantis, o erro é de rank: a distância entre q e o intervalo de
+    ranks que o valor aproximado ocupa nos dados exatos (0 se o valor é um
+    quantil exato). Para os distintos, é o erro relativo da estimativa.
+    """
+    limite_rank = erro_rank_kll(next(iter(esbocos.quantis.values())).k)
+    linhas_quantis = []
+    for (classe, sexo, coluna), esboco in esbocos.quantis.items():
+        selecao = (dados['pclass'] == classe) & (dados['sex'] == sexo)
+        if coluna == 'age' and 'idade_imputada' in dados.columns:
+            selecao &= ~dados['idade_imputada']
+        exatos = np.sort(dados.loc[selecao, coluna].dropna().to_numpy(dtype=np.float64))
+        if not len(exatos):
+            continue
+        aproximados = esboco.quantis(quantis)
+        abaixo = np.searchsorted(exatos, aproximados, side='left') / len(exatos)
+        ate = np.searchsorted(exatos, aproximados, side='right') / len(exatos)
+        erros = np.maximum(0, np.maximum(abaixo - np.asarray(quantis), np.asarray(quantis) - ate))
+        linhas_quantis.append({'Classe': classe, 'Sexo': sexo, 'Coluna': coluna, 'N': len(exatos),
+                               'Erro de rank máximo (%)': erros.max() * 100})
+    tabela_quantis = pd.DataFrame(linhas_quantis)
+    tabela_quantis['Dentro do limite'] = tabela_quantis['Erro de rank máximo (%)'] <= limite_rank * 100
+
+    limite_distintos = 3 * erro_padrao_hll(next(iter(esbocos.distintos.values())).precisao)
+    exatos = [dados[c].dropna().nunique() for c in COLUNAS_DISTINTAS]
+    estimados = [esbocos.distintos[c].estimativa() for c in COLUNAS_DISTINTAS]
+    tabela_distintos = pd.DataFrame({
+        'Coluna': COLUNAS_DISTINTAS,
+        'Exato': exatos,
+        'Estimativa': np.round(estimados).astype(int),
+        'Erro relativo (%)': [abs(e - x) / x * 100 if x else 0.0 for e, x in zip(estimados, exatos)],
+    })
+    tabela_distintos['Dentro do limite'] = tabela_distintos['Erro relativo (%)'] <= limite_distintos * 100
+    return {'quantis': tabela_quantis, 'distintos': tabela_distintos,
+            'limites': {'erro_rank': limite_rank, 'erro_relativo_distintos': limite_distintos}}
+
+
+def exibir_esbocos(esbocos):
+    print(f"\nQuantis aproximados (KLL, k={next(iter(esbocos.quantis.values())).k}) de idade observada e "
+          f"tarifa por classe e sexo, {esbocos.linhas} passageiros:")
+    print(esbocos.tabela_quantis().to_string(index=False, float_format='%.2f'))
+    print("\nValores distintos (HyperLogLog):")
+    print(esbocos.tabela_distintos().to_string(index=False))
+
+
+def exibir_comparacao(comparacao):
+    limites = comparacao['limites']
+    print(f"\nErro dos quantis em relação ao pandas (limite com 99% de confiança: {limites['erro_rank'] * 100:.2f}%):")
+    print(comparacao['quantis'].to_string(index=False, float_format='%.2f'))
+    print(f"\nErro dos distintos em relação ao pandas (limite de 3 erros padrão: "
+          f"{limites['erro_relativo_distintos'] * 100:.2f}%):")
+    print(comparacao['distintos'].to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantis e contagens de distintos aproximados do manifesto do Titanic")
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, ou padrão glob das partes")
+    parser.add_argument('--processos', type=int, default=1, help="Processos que resumem as fatias do CSV")
+    parser.add_argument('-k', type=int, default=K_PADRAO, help="Parâmetro de acurácia dos esboços KLL")
+    parser.add_argument('--precisao', type=int, default=PRECISAO_PADRAO, help="Precisão do HyperLogLog (11 a 18)")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Compara os esboços com os valores exatos do pandas (carrega o manifesto inteiro)")
+    parser.add_argument('--json', default=None, help="Grava as tabelas também neste arquivo JSON")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    esbocos = esbocos_do_arquivo(args.arquivo, args.processos, k=args.k, precisao=args.precisao)
+    exibir_esbocos(esbocos)
+    resultado = {'quantis': esbocos.tabela_quantis(), 'distintos': esbocos.tabela_distintos()}
+    if args.verificar:
+        comparacao = comparar_com_exato(esbocos, carregar_dados(args.arquivo))
+        exibir_comparacao(comparacao)
+        resultado['comparacao'] = comparacao
+    if args.json:
+        salvar_json(resultado, args.json)
+    print(f"\nTempo total: {time.perf_counter() - inicio:.1f} s")
+    if args.verificar and not (comparacao['quantis']['Dentro do limite'].all()
+                               and comparacao['distintos']['Dentro do limite'].all()):
+        raise SystemExit(1)
@@ -0,0 +1,128 @@
+import argparse
+import os
+
+import numpy as np
+
+# Linhas geradas e gravadas por vez; limita a memória independentemente do tamanho final
+TAMANHO_BLOCO = 500_000
+
+# Tamanhos de referência usados nos benchmarks
+TAMANHOS_PADRAO = [10_000, 1_000_000, 10_000_000, 100_000_000]
+
+COLUNA_BILHETE = 'ticket'
+COLUNA_NOME = 'name'
+
+
+def _ler_linhas(origem):
+    """Lê o manifesto como linhas de bytes, mantendo o formato original de cada campo."""
+    with open(origem, 'rb') as f:
+        cabecalho = f.readline()
+        linhas = f.read().splitlines()
+
+    separadores = cabecalho.count(b';')
+    invalidas = [i for i, linha in enumerate(linhas) if linha.count(b';') != separadores]
+    if invalidas:
+        raise ValueError(f"Linhas com número de campos diferente do cabeçalho em {origem}: {invalidas[:5]}")
+
+    # Linhas só com separadores não são passageiros (o carregador também as descarta)
+    linhas = [linha for linha in linhas if linha.strip(b';')]
+    return cabecalho, linhas
+
+
+def _grupos_por_bilhete(cabecalho, linhas):
+    """Divide cada linha em três partes e agrupa as linhas por bilhete.
+
+    As partes são separadas pelo fim do sobrenome (a primeira vírgula do nome)
+    e pelo fim do bilhete, os dois pontos em que o número do sorteio é inserido.
+    """
+    colunas = cabecalho.rstrip(b'\r\n').decode().split(';')
+    posicao = colunas.index(COLUNA_BILHETE)
+    posicao_nome = colunas.index(COLUNA_NOME)
+    if posicao_nome > posicao:
+        raise ValueError(f"A coluna '{COLUNA_NOME}' deve vir antes de '{COLUNA_BILHETE}' no cabeçalho")
+
+    antes, meio, bilhetes, depois = [], [], [], []
+    for linha in linhas:
+        campos = linha.split(b';')
+        nome = campos[posicao_nome]
+        fim_sobrenome = nome.find(b',')
+        if fim_sobrenome < 0:
+            fim_sobrenome = len(nome)
+        antes.append(b''.join(campo + b';' for campo in campos[:posicao_nome]) + nome[:fim_sobrenome])
+        meio.append(nome[fim_sobrenome:] + b';' + b''.join(campo + b';' for campo in campos[posicao_nome + 1:posicao]))
+        bilhetes.append(campos[posicao])
+        depois.append(b';' + b';'.join(campos[posicao + 1:]) + b'\n')
+
+    # Passageiros sem bilhete formam um grupo cada
+    chaves = [bilhete or f"sem-bilhete-{i}".encode() for i, bilhete in enumerate(bilhetes)]
+    _, grupo_da_linha = np.unique(np.array(chaves, dtype=object), return_inverse=True)
+    ordem = np.argsort(grupo_da_linha, kind='stable')
+    tamanhos = np.bincount(grupo_da_linha)
+    return antes, meio, bilhetes, depois, ordem, tamanhos
+
+
+def gerar_manifesto(origem, destino, n_linhas, semente=0, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava um manifesto sintético com `n_linhas` passageiros no mesmo formato de `origem`.
+
+    Os passageiros são sorteados com reposição em grupos de mesmo bilhete
+    (famílias e grupos que viajaram juntos), então a distribuição conjunta de
+    classe, sexo, idade, sobrevivência e bote é a do manifesto original, e a
+    composição dos grupos também. Cada grupo sorteado recebe um bilhete único
+    (`<bilhete>/<número do sorteio>`) e o mesmo sufixo no sobrenome, para que
+    cópias de uma família em sorteios diferentes não sejam ligadas pelo
+    sobrenome (veja grupos_viagem.py). Os campos são copiados byte a byte,
+    preservando o separador ';' e a vírgula decimal.
+    """
+    cabecalho, linhas = _ler_linhas(origem)
+    antes, meio, bilhetes, depois, ordem, tamanhos = _grupos_por_bilhete(cabecalho, linhas)
+    inicios = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    tamanho_medio = tamanhos.mean()
+
+    rng = np.random.default_rng(semente)
+    gravadas = 0
+    sorteio = 0
+    temporario = f"{destino}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        while gravadas < n_linhas:
+            faltam = min(tamanho_bloco, n_linhas - gravadas)
+
+            # Sorteia grupos suficientes para o bloco e corta no número exato de linhas
+            grupos = rng.integers(0, len(tamanhos), size=int(faltam / tamanho_medio * 1.1) + 16)
+            acumulado = np.cumsum(tamanhos[grupos])
+            grupos = grupos[:np.searchsorted(acumulado, faltam) + 1]
+
+            repeticoes = tamanhos[grupos]
+            numero_sorteio = np.repeat(np.arange(sorteio, sorteio + len(grupos)), repeticoes)
+            deslocamento = np.arange(repeticoes.sum()) - np.repeat(np.cumsum(repeticoes) - repeticoes, repeticoes)
+            indices = ordem[np.repeat(inicios[grupos], repeticoes) + deslocamento][:faltam]
+            sorteio += len(grupos)
+
+            f.write(b''.join(
+                antes[i] + sufixo + meio[i] + bilhetes[i] + sufixo + depois[i]
+                for i, sufixo in zip(indices.tolist(), (b'/%d' % n for n in numero_sorteio[:faltam].tolist()))
+            ))
+            gravadas += len(indices)
+    os.replace(temporario, destino)
+    return gravadas
+
+
+def nome_padrao(origem, n_linhas):
+    base, extensao = os.path.splitext(origem)
+    return f"{base}_sintetico_{n_linhas}{extensao}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera manifestos sintéticos a partir do titanic3.csv")
+    parser.add_argument('origem', nargs='?', default='titanic3.csv', help="CSV do manifesto original (separado por ';')")
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="Número de passageiros de cada manifesto gerado")
+    parser.add_argument('--semente', type=int, default=0, help="Semente do sorteio (reprodutível)")
+    parser.add_argument('--diretorio', default='.', help="Diretório onde os manifestos são gravados")
+    args = parser.parse_args()
+
+    os.makedirs(args.diretorio, exist_ok=True)
+    for n_linhas in args.linhas:
+        destino = os.path.join(args.diretorio, os.path.basename(nome_padrao(args.origem, n_linhas)))
+        gerar_manifesto(args.origem, destino, n_linhas, semente=args.semente)
+        print(f"{destino}: {n_linhas} linhas")
@@ -0,0 +1,9 @@
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+# Configurando estilo de plots (aplicado apenas quando algum gráfico é gerado)
+plt.style.use('seaborn-v0_8-darkgrid')
+sns.set(font_scale=1.2)
+plt.rcParams['figure.figsize'] = (12, 8)
+plt.rcParams['axes.facecolor'] = '#f0f0f0'
+plt.rcParams['figure.titlesize'] = 16
@@ -0,0 +1,272 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from carregador import ESQUEMA, carregar_dados, ler_em_blocos
+from instrumentacao import etapa, instrumentar
+from resultados import salvar_json
+
+# Sobrenome no nome, que segue o formato "Sobrenome, Título. Prenomes"
+REGEX_SOBRENOME = r'^\s*([^,]+),'
+
+# Tamanho do grupo de viagem (incluindo o próprio passageiro), em faixas (limites superiores inclusivos)
+LIMITES_TAMANHO_GRUPO = [0, 1, 4, np.inf]
+TAMANHOS_GRUPO = ['Sozinho (1)', 'Pequeno (2-4)', 'Grande (5+)']
+
+# Desfecho de cada grupo com mais de um passageiro
+DESFECHOS = ['Todos sobreviveram', 'Parte sobreviveu', 'Nenhum sobreviveu']
+
+# Linhas lidas por bloco quando o manifesto é agrupado direto do CSV
+TAMANHO_BLOCO = 500_000
+
+CLASSES = ESQUEMA['pclass']['valores']
+SEXOS = ESQUEMA['sex']['valores']
+
+
+def sobrenomes(nomes):
+    """Sobrenome de cada nome, em uma única passagem vetorizada da expressão regular."""
+    return nomes.str.extract(REGEX_SOBRENOME, expand=False).str.strip()
+
+
+def _hash(dados):
+    return pd.util.hash_pandas_object(dados, index=False).to_numpy()
+
+
+def colunas_de_ligacao(dados):
+    """Arrays compactos por passageiro usados no agrupamento, sem nenhuma coluna de texto.
+
+    As chaves de ligação viram hashes de 64 bits (0 = sem chave): 'bilhete'
+    liga quem viajou com o mesmo bilhete, e 'familia' liga quem tem o mesmo
+    sobrenome e o mesmo destino ('home.dest') e declarou parentes a bordo
+    (sibsp + parch > 0), o que evita juntar homônimos que viajavam sozinhos.
+    Com chaves de 64 bits, a chance de uma colisão entre 100 milhões de chaves
+    distintas é da ordem de 1 em 3.700. `dados` pode ser o DataFrame limpo,
+    colunas mapeadas ou um bloco de `ler_em_blocos`.
+    """
+    bilhetes = dados['ticket']
+    bilhete = np.where(bilhetes.notna().to_numpy(), _hash(bilhetes), 0)
+
+    chave_familia = pd.DataFrame({'sobrenome': sobrenomes(dados['name']), 'destino': dados['home.dest']})
+    parentes = (dados['sibsp'].astype('float32') + dados['parch'].astype('float32')) > 0
+    com_familia = (chave_familia.notna().all(axis=1) & parentes).to_numpy()
+    familia = np.where(com_familia, _hash(chave_familia), 0)
+
+    return {
+        'bilhete': bilhete.astype(np.uint64),
+        'familia': familia.astype(np.uint64),
+        'pclass': dados['pclass'].to_numpy(dtype=np.int8),
+        'sex': pd.Categorical(dados['sex'], categories=SEXOS).codes.astype(np.int8),
+        'survived': dados['survived'].to_numpy(dtype=bool),
+    }
+
+
+def concatenar_colunas(partes):
+    """Junta as colunas de ligação de vários blocos (na ordem das linhas do arquivo)."""
+    return {nome: np.concatenate([parte[nome] for parte in partes]) for nome in partes[0]}
+
+
+def colunas_do_arquivo(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Colunas de ligação do CSV lido em blocos: só ~19 bytes por passageiro ficam em memória."""
+    partes = [colunas_de_ligacao(bloco) for bloco in ler_em_blocos(arquivo, tamanho_bloco)]
+    if not partes:
+        raise ValueError(f"Nenhum passageiro em {arquivo}")
+    return concatenar_colunas(partes)
+
+
+def _tipo_indice(n):
+    # Índices de 32 bits cortam pela metade a memória das arestas em manifestos de até 2 bilhões de linhas
+    return np.int32 if n < 2**31 else np.int64
+
+
+def arestas_por_chave(chaves):
+    """Liga cada linha com chave (≠ 0) à primeira linha com a mesma chave.
+
+    As arestas formam uma estrela por chave, então uma chave com k linhas gera
+    k - 1 arestas em vez de k². Retorna (origens, destinos).
+    """
+    tipo = _tipo_indice(len(chaves))
+    linhas = np.flatnonzero(chaves).astype(tipo)
+    # factorize numera as chaves na ordem da primeira ocorrência, então uma linha é a
+    # primeira da sua chave quando o código supera todos os anteriores
+    codigos = pd.factorize(chaves[linhas])[0]
+    maximo_anterior = np.maximum.accumulate(np.concatenate([[-1], codigos[:-1]]))
+    primeiras = linhas[codigos > maximo_anterior]
+    repetidas = codigos <= maximo_anterior
+    return linhas[repetidas], primeiras[codigos[repetidas]]
+
+
+def componentes_conexas(n, origens, destinos):
+    """Union-find vetorizado: a raiz (menor índice) da componente de cada uma das `n` linhas.
+
+    O vetor de pais é um único array. A cada rodada, toda aresta cujas pontas
+    estão em componentes diferentes pendura a raiz maior na menor
+    (np.minimum.at resolve os conflitos) e os caminhos são comprimidos por
+    saltos de ponteiro (pai = pai[pai]) até cada linha apontar para a sua raiz.
+    As arestas já resolvidas saem da rodada seguinte; em grafos de grupos
+    pequenos bastam poucas rodadas, com tempo quase linear.
+    """
+    pai = np.arange(n, dtype=_tipo_indice(n))
+    while len(origens):
+        raiz_origem, raiz_destino = pai[origens], pai[destinos]
+        pendentes = raiz_origem != raiz_destino
+        origens, destinos = origens[pendentes], destinos[pendentes]
+        raiz_origem, raiz_destino = raiz_origem[pendentes], raiz_destino[pendentes]
+        if not len(origens):
+            break
+        np.minimum.at(pai, np.maximum(raiz_origem, raiz_destino), np.minimum(raiz_origem, raiz_destino))
+        while True:
+            avo = pai[pai]
+            if np.array_equal(avo, pai):
+                break
+            pai = avo
+    return pai
+
+
+@instrumentar
+def agrupar_passageiros(colunas):
+    """Número do grupo de viagem de cada passageiro (0, 1, ... na ordem da primeira linha de cada grupo).
+
+    Os grupos são as componentes conexas das ligações por bilhete e por
+    sobrenome + destino (veja colunas_de_ligacao): dois passageiros ficam no
+    mesmo grupo se houver uma cadeia de bilhetes ou famílias compartilhados
+    entre eles.
+    """
+    n = len(colunas['bilhete'])
+    arestas = [arestas_por_chave(colunas[chave]) for chave in ('bilhete', 'familia')]
+    origens = np.concatenate([origem for origem, _ in arestas])
+    destinos = np.concatenate([destino for _, destino in arestas])
+    raizes = componentes_conexas(n, origens, destinos)
+    # A raiz é a primeira linha do grupo, então numerar as raízes em ordem preserva a ordem do arquivo
+    return np.cumsum(raizes == np.arange(n))[raizes] - 1
+
+
+def _taxas(sobreviventes, totais):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sobreviventes / totais * 100
+
+
+@instrumentar
+def analisar_grupos(colunas, grupos=None):
+    """Tabelas de sobrevivência por grupo de viagem.
+
+    - 'tamanho_grupo': taxa de sobrevivência dos passageiros por classe e
+      tamanho do grupo;
+    - 'desfechos': grupos com mais de um passageiro em que todos, parte ou
+      nenhum sobreviveu, por classe do grupo (a melhor classe entre os
+      membros), com o número esperado se cada membro sobrevivesse de forma
+      independente, com a taxa da sua classe e sexo;
+    - 'resumo': números gerais, incluindo a fração de grupos com desfecho
+      "tudo ou nada" observada e esperada.
+
+    Tudo é calculado com bincount sobre os números dos grupos, em tempo linear.
+    """
+    grupos = agrupar_passageiros(colunas) if grupos is None else grupos
+    n_grupos = int(grupos.max()) + 1 if len(grupos) else 0
+    pclass, sexo, sobreviveu = colunas['pclass'], colunas['sex'], colunas['survived']
+
+    tamanho = np.bincount(grupos, minlength=n_grupos)
+    sobreviventes_grupo = np.bincount(grupos, weights=sobreviveu, minlength=n_grupos).astype(np.int64)
+    classe_grupo = np.full(n_grupos, np.iinfo(np.int8).max, dtype=np.int8)
+    np.minimum.at(classe_grupo, grupos, pclass)
+
+    # Passageiros por classe e faixa de tamanho do grupo
+    faixa = np.searchsorted(LIMITES_TAMANHO_GRUPO, tamanho[grupos], side='left') - 1
+    celula = (pclass.astype(np.int64) - 1) * len(TAMANHOS_GRUPO) + faixa
+    formato = len(CLASSES) * len(TAMANHOS_GRUPO)
+    totais = np.bincount(celula, minlength=formato)
+    sobreviventes = np.bincount(celula, weights=sobreviveu, minlength=formato).astype(np.int64)
+    tabela_tamanho = pd.DataFrame({
+        'pclass': np.repeat(CLASSES, len(TAMANHOS_GRUPO)),
+        'tamanho_grupo': pd.Categorical(np.tile(TAMANHOS_GRUPO, len(CLASSES)), categories=TAMANHOS_GRUPO,
+                                        ordered=True),
+        'sobreviventes': sobreviventes,
+        'total': totais,
+        'taxa_sobrevivencia': _taxas(sobreviventes, totais),
+    })
+    tabela_tamanho = tabela_tamanho[tabela_tamanho['total'] > 0].reset_index(drop=True)
+
+    # Probabilidade de cada desfecho se os membros sobrevivessem de forma independente,
+    # com a taxa da classe e sexo de cada um (ou só da classe, se o sexo faltar)
+    estrato = (pclass.astype(np.int64) - 1) * (len(SEXOS) + 1) + sexo + 1
+    n_estratos = len(CLASSES) * (len(SEXOS) + 1)
+    taxa_estrato = np.bincount(estrato, weights=sobreviveu, minlength=n_estratos) \
+        / np.maximum(np.bincount(estrato, minlength=n_estratos), 1)
+    taxa_classe = np.bincount(pclass - 1, weights=sobreviveu, minlength=len(CLASSES)) \
+        / np.maximum(np.bincount(pclass - 1, minlength=len(CLASSES)), 1)
+    p = np.where(sexo >= 0, taxa_estrato[estrato], taxa_classe[pclass - 1])
+    with np.errstate(divide='ignore'):
+        p_todos = np.exp(np.bincount(grupos, weights=np.log(p), minlength=n_grupos))
+        p_nenhum = np.exp(np.bincount(grupos, weights=np.log1p(-p), minlength=n_grupos))
+
+    multiplos = tamanho > 1
+    desfecho = np.where(sobreviventes_grupo == tamanho, 0, np.where(sobreviventes_grupo == 0, 2, 1))
+    esperado = np.stack([p_todos, 1 - p_todos - p_nenhum, p_nenhum], axis=1)
+    linhas = []
+    for classe in CLASSES:
+        da_classe = multiplos & (classe_grupo == classe)
+        observados = np.bincount(desfecho[da_classe], minlength=len(DESFECHOS))
+        esperados = esperado[da_classe].sum(axis=0)
+        for i, nome in enumerate(DESFECHOS):
+            linhas.append({
+                'pclass': classe,
+                'desfecho': nome,
+                'grupos': int(observados[i]),
+                'percentual': float(_taxas(observados[i], da_classe.sum())),
+                'esperado_independencia': float(esperados[i]),
+            })
+    tabela_desfechos = pd.DataFrame(linhas)
+    tabela_desfechos['desfecho'] = pd.Categorical(tabela_desfechos['desfecho'], categories=DESFECHOS, ordered=True)
+
+    n_multiplos = int(multiplos.sum())
+    tudo_ou_nada = int((multiplos & (desfecho != 1)).sum())
+    resumo = {
+        'passageiros': len(grupos),
+        'grupos': n_grupos,
+        'grupos_com_mais_de_um': n_multiplos,
+        'passageiros_em_grupos': int(tamanho[multiplos].sum()),
+        'maior_grupo': int(tamanho.max()) if n_grupos else 0,
+        'tudo_ou_nada': float(_taxas(tudo_ou_nada, n_multiplos)),
+        'tudo_ou_nada_esperado': float(_taxas((p_todos + p_nenhum)[multiplos].sum(), n_multiplos)),
+    }
+    return {'tamanho_grupo': tabela_tamanho, 'desfechos': tabela_desfechos, 'resumo': resumo}
+
+
+def exibir_grupos(resultado):
+    resumo = resultado['resumo']
+    print(f"\nGrupos de viagem (bilhete ou sobrenome + destino): {resumo['grupos']} grupos, "
+          f"{resumo['passageiros']} passageiros")
+    print(f"Grupos com mais de um passageiro: {resumo['grupos_com_mais_de_um']} "
+          f"({resumo['passageiros_em_grupos']} passageiros; o maior tem {resumo['maior_grupo']})")
+
+    print("\nTaxa de sobrevivência por classe e tamanho do grupo:")
+    print(resultado['tamanho_grupo'].to_string(index=False, float_format='%.1f'))
+
+    print("\nDesfecho dos grupos com mais de um passageiro, por classe:")
+    print(resultado['desfechos'].to_string(index=False, float_format='%.1f'))
+
+    print(f"\nGrupos em que todos ou nenhum sobreviveram: {resumo['tudo_ou_nada']:.1f}% "
+          f"(esperado se cada membro sobrevivesse de forma independente: {resumo['tudo_ou_nada_esperado']:.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agrupa os passageiros em grupos de viagem e analisa a sobrevivência por grupo")
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, ou padrão glob das partes")
+    parser.add_argument('--tamanho-bloco', type=int, default=None,
+                        help="Lê o CSV em blocos com este número de linhas, sem carregar o DataFrame inteiro")
+    parser.add_argument('--json', default=None, help="Grava as tabelas também neste arquivo JSON")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with etapa('colunas_de_ligacao'):
+        if args.tamanho_bloco:
+            colunas = colunas_do_arquivo(args.arquivo, args.tamanho_bloco)
+        else:
+            colunas = colunas_de_ligacao(carregar_dados(args.arquivo))
+    resultado = analisar_grupos(colunas)
+    exibir_grupos(resultado)
+    if args.json:
+        salvar_json(resultado, args.json)
+    print(f"\nTempo total: {time.perf_counter() - inicio:.1f} s")
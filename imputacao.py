@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Título (pronome de tratamento) no nome, que segue o formato "Sobrenome, Título. Prenomes"
+REGEX_TITULO = r',\s*([^.,]+)\.'
+TITULOS = ['Mr', 'Mrs', 'Miss', 'Master', 'Outro']
+
+# Grafias equivalentes; os demais títulos (Dr, Rev, Col, Lady, ...) são agrupados em 'Outro'
+EQUIVALENCIAS_TITULOS = {'Mlle': 'Miss', 'Ms': 'Miss', 'Mme': 'Mrs'}
+
+# Grupos cujas medianas preenchem as idades ausentes, do mais específico ao mais
+# geral: quem não tem nenhuma idade conhecida no seu grupo (ou não tem um dos
+# valores que o definem) recebe a mediana do nível seguinte
+NIVEIS_IMPUTACAO = [('titulo', 'pclass', 'sex'), ('titulo',), ('pclass', 'sex')]
+COLUNAS_GRUPO = ['titulo', 'pclass', 'sex']
+
+
+def extrair_titulos(nomes):
+    """Título de cada nome, em uma única passagem vetorizada da expressão regular."""
+    brutos = nomes.str.extract(REGEX_TITULO, expand=False).replace(EQUIVALENCIAS_TITULOS)
+    # Títulos fora de TITULOS viram 'Outro' antes da conversão; nomes sem título continuam ausentes
+    titulos = brutos.where(brutos.isin(TITULOS) | brutos.isna(), 'Outro')
+    return pd.Series(pd.Categorical(titulos, categories=TITULOS), index=nomes.index)
+
+
+def contar_idades(df):
+    """Número de passageiros com idade conhecida por (título, classe, sexo, idade).
+
+    Contagens de blocos diferentes podem ser somadas com somar_contagens, então
+    as medianas exatas do arquivo saem de uma passagem em modo streaming; a
+    memória depende do número de idades distintas, não do de linhas.
+    """
+    conhecidas = df.loc[df['age'].notna(), [*COLUNAS_GRUPO, 'age']]
+    return conhecidas.groupby([*COLUNAS_GRUPO, 'age'], observed=True, dropna=False).size()
+
+
+def somar_contagens(contagens):
+    """Soma contagens de contar_idades (ex.: de vários blocos do CSV)."""
+    if not contagens:
+        vazio = pd.MultiIndex.from_arrays([[]] * (len(COLUNAS_GRUPO) + 1), names=[*COLUNAS_GRUPO, 'age'])
+        return pd.Series([], index=vazio, dtype='int64')
+    return pd.concat(contagens).groupby(level=[*COLUNAS_GRUPO, 'age'], observed=True, dropna=False).sum()
+
+
+def medianas_idade(contagens):
+    """Mediana da idade em cada grupo de NIVEIS_IMPUTACAO, a partir das contagens por idade.
+
+    Retorna um dicionário nível -> Series indexada pelas colunas do nível. A
+    mediana é a mesma do groupby().median(): a média das duas idades centrais
+    quando o grupo tem um número par de passageiros.
+    """
+    tabela = contagens.rename('n').reset_index()
+    tabela['age'] = tabela['age'].astype('float64')
+    medianas = {}
+    for nivel in NIVEIS_IMPUTACAO:
+        chaves = list(nivel)
+        grupos = tabela.dropna(subset=chaves).groupby([*chaves, 'age'], observed=True)['n'].sum().reset_index()
+        por_grupo = grupos.groupby(chaves, observed=True, sort=False)['n']
+        acumulado, total = por_grupo.cumsum(), por_grupo.transform('sum')
+        # Idades nas posições centrais (contadas a partir de 0) de cada grupo ordenado
+        centrais = pd.DataFrame({
+            'inferior': grupos['age'].where(acumulado > (total - 1) // 2),
+            'superior': grupos['age'].where(acumulado > total // 2),
+        }).groupby([grupos[c] for c in chaves], observed=True).first()
+        medianas[nivel] = (centrais['inferior'] + centrais['superior']) / 2
+    return medianas
+
+
+def estimar_idades(df, medianas):
+    """Idades com as ausentes preenchidas pela mediana do grupo mais específico disponível.
+
+    Só as linhas sem idade são consultadas nas tabelas de medianas, em tempo
+    linear. Retorna (idades em float32, máscara das linhas imputadas); linhas sem
+    nenhuma mediana aplicável continuam ausentes e não são marcadas.
+    """
+    idades = df['age'].to_numpy(dtype='float64', na_value=np.nan)
+    estimadas = np.full(len(df), np.nan)
+    ausentes = np.isnan(idades)
+    for nivel, mediana in medianas.items():
+        pendentes = ausentes & np.isnan(estimadas)
+        if not pendentes.any():
+            break
+        chaves = df.loc[pendentes, list(nivel)]
+        indice = pd.MultiIndex.from_frame(chaves) if len(nivel) > 1 else pd.Index(chaves[nivel[0]])
+        estimadas[pendentes] = mediana.reindex(indice).to_numpy(dtype='float64', na_value=np.nan)
+    imputadas = ausentes & ~np.isnan(estimadas)
+    return np.where(imputadas, estimadas, idades).astype(np.float32), imputadas
@@ -0,0 +1,290 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from carregador import ESQUEMA, VERSAO_ESQUEMA, ler_csv, validar_e_converter
+from cubo_sobrevivencia import DIMENSOES, CuboSobrevivencia
+from entrada import entrada_simples
+from imputacao import COLUNAS_GRUPO, TITULOS, medianas_idade, somar_contagens
+from instrumentacao import instrumentar
+from leitura_paralela import COLUNAS_PENDENTES, agregar_blocos, cubo_dos_pendentes, somar_pendentes
+
+# Quantos bytes antes do último offset são conferidos para detectar edições
+TAMANHO_JANELA = 64 * 1024
+
+# Linhas por bloco ao agregar o trecho novo do arquivo
+TAMANHO_BLOCO = 100_000
+
+# Bytes lidos do arquivo por vez ao percorrer o trecho
+TAMANHO_LEITURA = 1 << 20
+
+
+def diretorio_estado_padrao(arquivo):
+    return f"{arquivo}.estado"
+
+
+def _hash(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _ler_cabecalho(f):
+    f.seek(0)
+    return f.readline()
+
+
+def _janela(f, fim, inicio_minimo):
+    """Bytes imediatamente anteriores a `fim`, usados como impressão digital do que já foi lido."""
+    inicio = max(inicio_minimo, fim - TAMANHO_JANELA)
+    f.seek(inicio)
+    return f.read(fim - inicio)
+
+
+def _fim_das_linhas_completas(f, inicio, fim):
+    """Offset logo após a última quebra de linha entre `inicio` e `fim` (ou `inicio`, se não houver).
+
+    É até onde o estado salvo avança: uma última linha sem quebra final (ainda
+    sendo escrita, ou simplesmente o fim do arquivo) é contada no cubo devolvido,
+    mas relida na próxima execução. O arquivo é percorrido de trás para frente,
+    em blocos.
+    """
+    posicao = fim
+    while posicao > inicio:
+        bloco_inicio = max(inicio, posicao - TAMANHO_LEITURA)
+        f.seek(bloco_inicio)
+        ultimo = f.read(posicao - bloco_inicio).rfind(b'\n')
+        if ultimo >= 0:
+            return bloco_inicio + ultimo + 1
+        posicao = bloco_inicio
+    return inicio
+
+
+class _LeitorTrecho(io.RawIOBase):
+    """Fluxo com o cabeçalho seguido dos bytes entre `inicio` e `fim` do arquivo, lidos sob demanda.
+
+    Passado ao parser em blocos, mantém em memória só o bloco em conversão,
+    mesmo quando o trecho é o arquivo inteiro (reconstrução do cubo).
+    """
+
+    def __init__(self, f, cabecalho, inicio, fim):
+        super().__init__()
+        self._f = f
+        self._cabecalho = memoryview(cabecalho)
+        self._posicao = inicio
+        self._fim = fim
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        if self._cabecalho:
+            n = min(len(destino), len(self._cabecalho))
+            destino[:n] = self._cabecalho[:n]
+            self._cabecalho = self._cabecalho[n:]
+            return n
+        n = min(len(destino), self._fim - self._posicao)
+        if n <= 0:
+            return 0
+        self._f.seek(self._posicao)
+        n = self._f.readinto(memoryview(destino)[:n])
+        self._posicao += n
+        return n
+
+
+def _blocos(f, cabecalho, inicio, fim):
+    if fim <= inicio:
+        return
+    fluxo = io.BufferedReader(_LeitorTrecho(f, cabecalho, inicio, fim), TAMANHO_LEITURA)
+    for bloco in ler_csv(fluxo, chunksize=TAMANHO_BLOCO):
+        yield validar_e_converter(bloco, avisos=False)
+
+
+def _agregar_trecho(f, cabecalho, inicio, fim):
+    """Contagens das linhas entre `inicio` e `fim`, como em leitura_paralela.agregar_blocos."""
+    return agregar_blocos(_blocos(f, cabecalho, inicio, fim))
+
+
+def _contagens_para_json(contagens):
+    tabela = contagens.rename('n').reset_index()
+    return tabela.astype(object).where(tabela.notna(), None).values.tolist()
+
+
+def _contagens_do_json(linhas):
+    tabela = pd.DataFrame(linhas, columns=[*COLUNAS_GRUPO, 'age', 'n'])
+    tabela['titulo'] = pd.Categorical(tabela['titulo'], categories=TITULOS)
+    tabela['pclass'] = tabela['pclass'].astype(np.int8)
+    tabela['sex'] = pd.Categorical(tabela['sex'], categories=ESQUEMA['sex']['valores'])
+    tabela['age'] = tabela['age'].astype(np.float32)
+    return tabela.set_index([*COLUNAS_GRUPO, 'age'])['n']
+
+
+def _pendentes_do_json(linhas):
+    if not linhas:
+        return None
+    tabela = pd.DataFrame(linhas, columns=[*COLUNAS_PENDENTES, 'n'])
+    for coluna in COLUNAS_PENDENTES:
+        if coluna == 'pclass':
+            tabela[coluna] = tabela[coluna].astype(np.int8)
+        elif coluna == 'survived':
+            tabela[coluna] = tabela[coluna].astype(bool)
+        else:
+            categorias = TITULOS if coluna == 'titulo' else DIMENSOES[coluna]
+            tabela[coluna] = pd.Categorical(tabela[coluna], categories=categorias)
+    return tabela.set_index(COLUNAS_PENDENTES)['n']
+
+
+def _salvar_estado(diretorio, estado, cubo):
+    os.makedirs(diretorio, exist_ok=True)
+    np.savez(os.path.join(diretorio, 'cubo.npz'), sobreviventes=cubo.sobreviventes, totais=cubo.totais)
+    with open(os.path.join(diretorio, 'estado.json'), 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+
+
+def _ler_estado(diretorio):
+    try:
+        with open(os.path.join(diretorio, 'estado.json'), encoding='utf-8') as f:
+            estado = json.load(f)
+        with np.load(os.path.join(diretorio, 'cubo.npz')) as arrays:
+            cubo = CuboSobrevivencia(estado['dimensoes'], arrays['sobreviventes'], arrays['totais'])
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return estado, cubo
+
+
+def _hash_encadeado(f, anterior, inicio, fim):
+    """Hash dos bytes entre `inicio` e `fim`, encadeado ao hash do trecho anterior."""
+    h = hashlib.sha256(anterior.encode())
+    f.seek(inicio)
+    restante = fim - inicio
+    while restante > 0:
+        bloco = f.read(min(TAMANHO_LEITURA, restante))
+        if not bloco:
+            break
+        h.update(bloco)
+        restante -= len(bloco)
+    return h.hexdigest()
+
+
+def _hash_prefixo(f, segmentos):
+    """Hash de todo o trecho já processado, refeito segmento a segmento (um por execução com linhas novas)."""
+    h, inicio = '', 0
+    for fim in segmentos:
+        h, inicio = _hash_encadeado(f, h, inicio, fim), fim
+    return h
+
+
+def _identificacao(info):
+    return {'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns, 'inode': info.st_ino,
+            'dispositivo': info.st_dev}
+
+
+def _explicado_por_acrescimo(anterior, info):
+    """Se a mudança do arquivo desde a última execução pode ter sido só um acréscimo de linhas.
+
+    Outro inode (o arquivo foi substituído) ou a data de modificação alterada
+    sem o tamanho crescer indicam uma edição.
+    """
+    if (anterior['inode'], anterior['dispositivo']) != (info.st_ino, info.st_dev):
+        return False
+    if info.st_size == anterior['tamanho']:
+        return info.st_mtime_ns == anterior['mtime_ns']
+    return info.st_size > anterior['tamanho']
+
+
+def _motivo_reconstrucao(estado, f, cabecalho, info, verificacao_completa):
+    """Retorna por que o estado salvo não serve para uma atualização incremental (ou None)."""
+    if estado is None:
+        return "nenhum estado salvo"
+    if estado.get('versao_esquema') != VERSAO_ESQUEMA or estado.get('dimensoes') != list(DIMENSOES):
+        return "regras de limpeza ou dimensões do cubo mudaram"
+    if not {'contagens_idade', 'pendentes', 'segmentos', 'hash_prefixo', 'arquivo'} <= set(estado):
+        return "o estado salvo foi gravado por uma versão anterior"
+    if info.st_size < estado['offset']:
+        return "o arquivo ficou menor que o trecho já processado"
+    if _hash(cabecalho) != estado['hash_cabecalho']:
+        return "o cabeçalho do arquivo mudou"
+    if _hash(_janela(f, estado['offset'], len(cabecalho))) != estado['hash_janela']:
+        return "o conteúdo já processado foi alterado"
+    if verificacao_completa or not _explicado_por_acrescimo(estado['arquivo'], info):
+        if _hash_prefixo(f, estado['segmentos']) != estado['hash_prefixo']:
+            return "o conteúdo já processado foi alterado"
+    return None
+
+
+@instrumentar
+def atualizar_cubo(arquivo, diretorio_estado=None, verificacao_completa=False):
+    """Atualiza o cubo persistido processando apenas as linhas acrescentadas ao manifesto.
+
+    O estado guarda o offset em bytes, o número de linhas, o cubo das linhas com
+    idade conhecida, as contagens de idades conhecidas por grupo (de onde saem
+    as medianas da imputação) e as linhas sem idade agrupadas por
+    COLUNAS_PENDENTES. Linhas novas que mudam alguma mediana só reposicionam
+    esses grupos no cubo, sem reler o arquivo, então o custo continua
+    proporcional às linhas acrescentadas.
+
+    Se o cabeçalho, o tamanho ou os últimos TAMANHO_JANELA bytes antes do
+    offset não conferirem (edição que não foi só um acréscimo), o cubo é
+    reconstruído do zero. Quando o tamanho, a data de modificação e o inode
+    guardados não são explicados por um acréscimo (ex.: o arquivo foi
+    substituído ou regravado com o mesmo tamanho), também é conferido o hash
+    de todo o trecho já processado, ainda bem mais barato que reprocessar o
+    CSV; o hash é mantido encadeado por segmento, então atualizá-lo custa só a
+    leitura das linhas novas. Uma edição antiga seguida de um acréscimo só é
+    detectada com `verificacao_completa=True`, que confere o hash sempre.
+
+    Uma última linha sem quebra final entra no cubo devolvido, como na leitura
+    completa do arquivo, mas não no estado: se ela for completada por um
+    acréscimo, é lida de novo inteira na próxima execução.
+    """
+    if not entrada_simples(arquivo):
+        raise ValueError("A atualização incremental só aceita um único CSV sem compressão")
+    diretorio_estado = diretorio_estado or diretorio_estado_padrao(arquivo)
+    estado, conhecidas = _ler_estado(diretorio_estado)
+
+    with open(arquivo, 'rb') as f:
+        cabecalho = _ler_cabecalho(f)
+        info = os.fstat(f.fileno())
+        tamanho = info.st_size
+
+        motivo = _motivo_reconstrucao(estado, f, cabecalho, info, verificacao_completa)
+        if motivo:
+            print(f"Reconstruindo o cubo de {arquivo} ({motivo})...")
+            offset = _fim_das_linhas_completas(f, len(cabecalho), tamanho)
+            conhecidas, contagens, pendentes, linhas = _agregar_trecho(f, cabecalho, len(cabecalho), offset)
+            segmentos, hash_prefixo = [offset], _hash_encadeado(f, '', 0, offset)
+        else:
+            offset = _fim_das_linhas_completas(f, estado['offset'], tamanho)
+            delta, contagens, pendentes, linhas = _agregar_trecho(f, cabecalho, estado['offset'], offset)
+            print(f"Atualização incremental de {arquivo}: {linhas} linhas novas "
+                  f"({offset - estado['offset']} bytes).")
+            conhecidas = conhecidas.mesclar(delta)
+            contagens = somar_contagens([_contagens_do_json(estado['contagens_idade']), contagens])
+            pendentes = somar_pendentes([_pendentes_do_json(estado['pendentes']), pendentes])
+            linhas += estado['linhas']
+            segmentos, hash_prefixo = estado['segmentos'], estado['hash_prefixo']
+            if offset > estado['offset']:
+                segmentos = [*segmentos, offset]
+                hash_prefixo = _hash_encadeado(f, hash_prefixo, estado['offset'], offset)
+
+        novo_estado = {
+            'offset': offset,
+            'linhas': linhas,
+            'versao_esquema': VERSAO_ESQUEMA,
+            'dimensoes': conhecidas.dimensoes,
+            'hash_cabecalho': _hash(cabecalho),
+            'hash_janela': _hash(_janela(f, offset, len(cabecalho))),
+            'segmentos': segmentos,
+            'hash_prefixo': hash_prefixo,
+            'arquivo': _identificacao(info),
+            'contagens_idade': _contagens_para_json(contagens),
+            'pendentes': _contagens_para_json(pendentes) if pendentes is not None else [],
+        }
+        final, contagens_final, pendentes_final, _ = _agregar_trecho(f, cabecalho, offset, tamanho)
+
+    _salvar_estado(diretorio_estado, novo_estado, conhecidas)
+    # As linhas sem idade entram no cubo imputadas com as medianas de todas as linhas lidas até aqui
+    medianas = medianas_idade(somar_contagens([contagens, contagens_final]))
+    return conhecidas.mesclar(final).mesclar(cubo_dos_pendentes([pendentes, pendentes_final], medianas))
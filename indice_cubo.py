@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from cache_dados import hash_arquivo
+from carregador import VERSAO_ESQUEMA
+from cubo_sobrevivencia import DIMENSOES, CuboSobrevivencia, construir_cubo_em_blocos
+from entrada import nome_sem_compressao, partes_do_manifesto, tamanho_em_disco
+
+# Extensão dos índices; os scripts de análise aceitam um arquivo com ela no lugar do CSV
+EXTENSAO_INDICE = '.cubo.npz'
+
+TAMANHO_BLOCO = 500_000
+
+
+def caminho_padrao(arquivo):
+    partes = partes_do_manifesto(arquivo)
+    if len(partes) > 1:
+        raise ValueError("Manifesto em várias partes: informe o arquivo do índice (--saida)")
+    return f"{os.path.splitext(nome_sem_compressao(partes[0]))[0]}{EXTENSAO_INDICE}"
+
+
+def _tamanho_atual(arquivo):
+    # None se alguma parte do manifesto de origem não existir mais
+    try:
+        return tamanho_em_disco(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _tipo_compacto(maximo):
+    for tipo in (np.uint8, np.uint16, np.uint32):
+        if maximo <= np.iinfo(tipo).max:
+            return tipo
+    return np.uint64
+
+
+def salvar_indice(cubo, caminho, origem=None):
+    """Grava as contagens do cubo com o menor tipo inteiro que as comporta e os metadados."""
+    metadados = {
+        'versao_esquema': VERSAO_ESQUEMA,
+        'dimensoes': cubo.dimensoes,
+        'categorias': {d: DIMENSOES[d] for d in cubo.dimensoes},
+        'linhas': cubo.total_registros,
+        'origem': origem,
+    }
+    tipo = _tipo_compacto(int(cubo.totais.max(initial=0)))
+    temporario = f"{caminho}.tmp.npz"
+    # A maior parte das células é zero, então a compressão reduz o arquivo a poucos KiB
+    np.savez_compressed(
+        temporario,
+        sobreviventes=cubo.sobreviventes.astype(tipo),
+        totais=cubo.totais.astype(tipo),
+        metadados=np.array(json.dumps(metadados, ensure_ascii=False)),
+    )
+    os.replace(temporario, caminho)
+    return metadados
+
+
+def carregar_indice(caminho):
+    """Lê um índice gravado por salvar_indice, conferindo se as dimensões ainda são as atuais."""
+    with np.load(caminho) as arrays:
+        metadados = json.loads(arrays['metadados'].item())
+        sobreviventes = arrays['sobreviventes'].astype(np.int64)
+        totais = arrays['totais'].astype(np.int64)
+
+    atuais = json.loads(json.dumps({d: DIMENSOES[d] for d in metadados['dimensoes'] if d in DIMENSOES}))
+    if metadados.get('versao_esquema') != VERSAO_ESQUEMA or metadados['categorias'] != atuais:
+        raise ValueError(f"O índice {caminho} foi gerado com outras regras ou dimensões; reconstrua-o")
+
+    origem = metadados.get('origem') or {}
+    if origem.get('arquivo') and _tamanho_atual(origem['arquivo']) not in (None, origem.get('bytes')):
+        print(f"Atenção: {origem['arquivo']} mudou desde que o índice {caminho} foi gerado.")
+    return CuboSobrevivencia(metadados['dimensoes'], sobreviventes, totais)
+
+
+def construir_indice(arquivo, caminho=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê o CSV em blocos e materializa as contagens de todas as combinações de dimensões."""
+    caminho = caminho or caminho_padrao(arquivo)
+    cubo = construir_cubo_em_blocos(arquivo, tamanho_bloco)
+    origem = {'arquivo': arquivo, 'bytes': tamanho_em_disco(arquivo), 'sha256': hash_arquivo(arquivo)}
+    salvar_indice(cubo, caminho, origem)
+    return caminho, cubo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o índice de contagens (cubo) de um manifesto")
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, ou padrão glob das partes")
+    parser.add_argument('-o', '--saida', default=None, help=f"Arquivo do índice (padrão: <arquivo>{EXTENSAO_INDICE})")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO, help="Linhas lidas por bloco")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    caminho, cubo = construir_indice(args.arquivo, args.saida, args.tamanho_bloco)
+    print(f"Índice salvo em '{caminho}': {cubo.total_registros} linhas, {cubo.totais.size} células, "
+          f"{os.path.getsize(caminho) / 1024:.1f} KiB ({time.perf_counter() - inicio:.1f} s)")
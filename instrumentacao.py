@@ -0,0 +1,169 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Variável de ambiente que liga a instrumentação; também é herdada pelos
+# processos de renderização, que assim registram as próprias etapas
+VARIAVEL_AMBIENTE = 'TITANIC_INSTRUMENTACAO'
+
+_ativa = os.environ.get(VARIAVEL_AMBIENTE, '') not in ('', '0')
+
+# Etapas concluídas, na ordem em que terminaram
+registros = []
+
+# Pilha das etapas abertas (por thread), usada para aninhar etapas e combinar picos de memória
+_local = threading.local()
+
+
+def ativa():
+    return _ativa
+
+
+def ativar():
+    """Liga a instrumentação neste processo e nos processos filhos criados depois."""
+    global _ativa
+    _ativa = True
+    os.environ[VARIAVEL_AMBIENTE] = '1'
+
+
+def _pilha():
+    if not hasattr(_local, 'pilha'):
+        _local.pilha = []
+    return _local.pilha
+
+
+def contar_linhas(dados):
+    """Número de registros de um DataFrame ou cubo de sobrevivência (ou None)."""
+    if hasattr(dados, 'total_registros'):
+        return dados.total_registros
+    if hasattr(dados, 'shape'):
+        return dados.shape[0]
+    return None
+
+
+@contextlib.contextmanager
+def _medir(nome, linhas):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    pilha = _pilha()
+    memoria_inicio, pico_anterior = tracemalloc.get_traced_memory()
+    if pilha:
+        # O pico da etapa pai até aqui seria perdido com o reset abaixo
+        pilha[-1]['pico_filhos'] = max(pilha[-1]['pico_filhos'], pico_anterior)
+    tracemalloc.reset_peak()
+
+    info = {'linhas': linhas}
+    quadro = {'pico_filhos': 0}
+    pilha.append(quadro)
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        yield info
+    finally:
+        duracao = time.perf_counter() - inicio
+        duracao_cpu = time.process_time() - inicio_cpu
+        pilha.pop()
+        pico = max(tracemalloc.get_traced_memory()[1], quadro['pico_filhos'])
+        if pilha:
+            pilha[-1]['pico_filhos'] = max(pilha[-1]['pico_filhos'], pico)
+
+        registros.append({
+            'etapa': nome,
+            'inicio_s': inicio,
+            'tempo_s': duracao,
+            'cpu_s': duracao_cpu,
+            'pico_alocado_mib': (pico - memoria_inicio) / 2**20,
+            'linhas': info.get('linhas'),
+            'nivel': len(pilha),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+
+
+def etapa(nome, linhas=None):
+    """Mede tempo de parede, tempo de CPU e pico de alocação (tracemalloc) do bloco `with`.
+
+    O dicionário devolvido aceita `linhas` quando o número de registros só é
+    conhecido no fim da etapa. Desligada, custa uma verificação de flag.
+    """
+    if not _ativa:
+        return contextlib.nullcontext({})
+    return _medir(nome, linhas)
+
+
+def instrumentar(funcao=None, nome=None):
+    """Decorador que mede cada chamada da função como uma etapa.
+
+    O número de linhas é obtido do primeiro argumento quando ele é um
+    DataFrame ou um cubo de sobrevivência.
+    """
+    if funcao is None:
+        return functools.partial(instrumentar, nome=nome)
+    nome = nome or funcao.__name__
+
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        if not _ativa:
+            return funcao(*args, **kwargs)
+        with _medir(nome, contar_linhas(args[0]) if args else None):
+            return funcao(*args, **kwargs)
+
+    return envoltorio
+
+
+def coletar(inicio=0):
+    """Registros a partir da posição `inicio` (usado para devolvê-los de um processo filho)."""
+    return registros[inicio:]
+
+
+def incorporar(novos):
+    """Acrescenta registros vindos de outro processo."""
+    registros.extend(novos)
+
+
+def exportar_json(caminho):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(registros, f, ensure_ascii=False, indent=2)
+
+
+def exportar_chrome_trace(caminho):
+    """Grava os registros no formato Trace Event (chrome://tracing, Perfetto)."""
+    eventos = [
+        {
+            'name': r['etapa'],
+            'ph': 'X',
+            'ts': r['inicio_s'] * 1e6,
+            'dur': r['tempo_s'] * 1e6,
+            'pid': r['pid'],
+            'tid': r['tid'],
+            'args': {
+                'cpu_s': r['cpu_s'],
+                'pico_alocado_mib': r['pico_alocado_mib'],
+                'linhas': r['linhas'],
+            },
+        }
+        for r in registros
+    ]
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+def finalizar(prefixo):
+    """Exporta `<prefixo>_instrumentacao.json` e `<prefixo>_trace.json` e imprime um resumo."""
+    if not _ativa:
+        return
+    exportar_json(f"{prefixo}_instrumentacao.json")
+    exportar_chrome_trace(f"{prefixo}_trace.json")
+
+    print("\nInstrumentação (etapas de primeiro nível deste processo):")
+    for r in registros:
+        if r['nivel'] == 0 and r['pid'] == os.getpid():
+            linhas = f", {r['linhas']} linhas" if r['linhas'] is not None else ""
+            print(f"   - {r['etapa']}: {r['tempo_s']:.3f} s (CPU {r['cpu_s']:.3f} s), "
+                  f"pico {r['pico_alocado_mib']:.1f} MiB{linhas}")
+    print(f"Registros salvos em '{prefixo}_instrumentacao.json' e '{prefixo}_trace.json'")
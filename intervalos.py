@@ -0,0 +1,179 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cubo_sobrevivencia import obter_cubo
+from instrumentacao import instrumentar
+
+N_REAMOSTRAS_PADRAO = 100_000
+CONFIANCA_PADRAO = 0.95
+
+# Semente fixa por padrão para que os relatórios sejam reproduzíveis (também usada
+# pelos testes de permutação)
+SEMENTE_PADRAO = 0
+
+
+def gerador_aleatorio(semente):
+    """Gerador do NumPy para a `semente`; um gerador já criado é usado como está, continuando a sequência."""
+    if isinstance(semente, np.random.Generator):
+        return semente
+    return np.random.default_rng(semente)
+
+
+def limites_intervalo(amostras, confianca):
+    """Limites inferior e superior do intervalo percentil com a `confianca` dada, por coluna de `amostras`."""
+    alfa = (1 - confianca) / 2
+    return np.nanquantile(amostras, [alfa, 1 - alfa], axis=0)
+
+
+def reamostrar_taxas(dados, dimensoes, n_reamostras=N_REAMOSTRAS_PADRAO, semente=SEMENTE_PADRAO):
+    """Bootstrap das taxas de sobrevivência de uma tabela do cubo, sem tocar nas linhas.
+
+    Reamostrar N linhas com reposição equivale a sortear as contagens de
+    (célula, sobreviveu) de uma multinomial com as proporções observadas. Cada
+    reamostra custa O(células) em vez de O(linhas).
+
+    Retorna a tabela do cubo e uma matriz (n_reamostras, linhas da tabela) de taxas em %.
+    """
+    cubo = obter_cubo(dados)
+    tabela = cubo.tabela(dimensoes)
+    sobreviventes = tabela['survived_count'].to_numpy()
+    totais = tabela['total'].to_numpy()
+    n = int(totais.sum())
+
+    # Categorias da multinomial: [sobreviventes de cada célula, mortos de cada célula]
+    proporcoes = np.concatenate([sobreviventes, totais - sobreviventes]) / n
+    contagens = gerador_aleatorio(semente).multinomial(n, proporcoes, size=n_reamostras)
+
+    k = len(tabela)
+    sobrev_amostra = contagens[:, :k]
+    total_amostra = sobrev_amostra + contagens[:, k:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxas = sobrev_amostra / total_amostra * 100
+    return tabela, taxas
+
+
+def _taxas_com_limites(tabela, taxas, confianca):
+    tabela = tabela.copy()
+    tabela['ic_inferior'], tabela['ic_superior'] = limites_intervalo(taxas, confianca)
+    return tabela
+
+
+def _razoes_com_limites(tabela, taxas, comparar, numerador, denominador, confianca):
+    grupos = [d for d in tabela.columns[:tabela.columns.get_loc('survived')] if d != comparar]
+
+    linhas = []
+    chaves = tabela[grupos].drop_duplicates() if grupos else pd.DataFrame(index=[0])
+    for _, chave in chaves.iterrows():
+        filtro = np.ones(len(tabela), dtype=bool)
+        for d in grupos:
+            filtro &= (tabela[d] == chave[d]).to_numpy()
+        i_num = np.flatnonzero(filtro & (tabela[comparar] == numerador).to_numpy())
+        i_den = np.flatnonzero(filtro & (tabela[comparar] == denominador).to_numpy())
+        if len(i_num) == 0 or len(i_den) == 0:
+            continue
+
+        i_num, i_den = i_num[0], i_den[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            razoes = taxas[:, i_num] / taxas[:, i_den]
+        razoes[~np.isfinite(razoes)] = np.nan
+        inferior, superior = limites_intervalo(razoes, confianca)
+        linha = {d: chave[d] for d in grupos}
+        linha.update({
+            'razao': tabela['taxa_sobrevivencia'].iloc[i_num] / tabela['taxa_sobrevivencia'].iloc[i_den],
+            'ic_inferior': inferior,
+            'ic_superior': superior,
+        })
+        linhas.append(linha)
+    return pd.DataFrame(linhas)
+
+
+def intervalos_taxas(dados, dimensoes, n_reamostras=N_REAMOSTRAS_PADRAO,
+                     confianca=CONFIANCA_PADRAO, semente=SEMENTE_PADRAO):
+    """Tabela do cubo com intervalos de confiança bootstrap (percentil) para cada taxa."""
+    tabela, taxas = reamostrar_taxas(dados, dimensoes, n_reamostras, semente)
+    return _taxas_com_limites(tabela, taxas, confianca)
+
+
+def intervalos_razoes(dados, dimensoes, comparar, numerador, denominador,
+                      n_reamostras=N_REAMOSTRAS_PADRAO, confianca=CONFIANCA_PADRAO,
+                      semente=SEMENTE_PADRAO):
+    """Razão entre taxas (ex.: mulheres / homens) com intervalo de confiança.
+
+    `dimensoes` deve incluir `comparar`; a razão é calculada para cada combinação
+    das demais dimensões (ou uma única razão global, se não houver outras).
+    """
+    tabela, taxas = reamostrar_taxas(dados, dimensoes, n_reamostras, semente)
+    return _razoes_com_limites(tabela, taxas, comparar, numerador, denominador, confianca)
+
+
+@instrumentar
+def resumo_intervalos(dados, n_reamostras=N_REAMOSTRAS_PADRAO, confianca=CONFIANCA_PADRAO,
+                      semente=SEMENTE_PADRAO):
+    """Intervalos para todas as taxas e razões das tabelas de sexo, idade, classe×sexo e classe×idade.
+
+    Cada tabela é reamostrada uma única vez; taxas e razões usam as mesmas reamostras.
+    """
+    cubo = obter_cubo(dados)
+    rng = gerador_aleatorio(semente)
+    amostras = {
+        nome: reamostrar_taxas(cubo, dimensoes, n_reamostras, rng)
+        for nome, dimensoes in [
+            ('sexo', ['sex']),
+            ('idade', ['is_child']),
+            ('faixa_etaria', ['categoria_idade']),
+            ('classe_sexo', ['pclass', 'sex']),
+            ('classe_idade', ['pclass', 'is_child']),
+        ]
+        if all(d in cubo.dimensoes for d in dimensoes)
+    }
+
+    def razoes(nome, comparar, numerador, denominador):
+        return _razoes_com_limites(*amostras[nome], comparar, numerador, denominador, confianca)
+
+    return {
+        'taxas': {nome: _taxas_com_limites(*amostra, confianca) for nome, amostra in amostras.items()},
+        'razoes': {
+            'mulheres_homens': razoes('sexo', 'sex', 'female', 'male'),
+            'criancas_adultos': razoes('idade', 'is_child', True, False),
+            'mulheres_homens_por_classe': razoes('classe_sexo', 'sex', 'female', 'male'),
+            'criancas_adultos_por_classe': razoes('classe_idade', 'is_child', True, False),
+        },
+    }
+
+
+def _bootstrap_linhas_parcial(df, estatistica, n_reamostras, semente):
+    rng = np.random.default_rng(semente)
+    n = len(df)
+    # ColunasMapeadas monta só as linhas sorteadas a partir dos arrays compartilhados
+    selecionar = df.selecionar_linhas if hasattr(df, 'selecionar_linhas') else df.iloc.__getitem__
+    return np.array([
+        estatistica(selecionar(rng.integers(0, n, size=n))) for _ in range(n_reamostras)
+    ])
+
+
+def bootstrap_linhas(df, estatistica, n_reamostras=1_000, processos=None, semente=SEMENTE_PADRAO):
+    """Bootstrap clássico sobre as linhas, dividido entre processos.
+
+    Útil para estatísticas que não podem ser obtidas do cubo de contagens. A
+    `estatistica` recebe um DataFrame reamostrado e deve ser uma função de nível
+    de módulo (para poder ser enviada aos processos). Cada processo recebe uma
+    semente independente derivada de `semente`. Com `df` vindo de
+    carregar_colunas_mapeadas, os processos compartilham os dados em vez de
+    receber uma cópia serializada cada.
+    """
+    processos = max(1, min(processos or os.cpu_count() or 1, n_reamostras))
+    partes = np.array_split(np.arange(n_reamostras), processos)
+    sementes = np.random.SeedSequence(semente).spawn(processos)
+
+    if processos == 1:
+        return _bootstrap_linhas_parcial(df, estatistica, n_reamostras, sementes[0])
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultados = executor.map(
+            _bootstrap_linhas_parcial,
+            [df] * processos, [estatistica] * processos, [len(p) for p in partes], sementes,
+        )
+        return np.concatenate(list(resultados))
@@ -1,65 +1,40 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.backends.backend_pdf import PdfPages
 import os
+import io
+import contextlib
 
-# Configurando estilo de plots
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set(font_scale=1.2)
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['axes.facecolor'] = '#f0f0f0'
-plt.rcParams['figure.titlesize'] = 16
+from botes import composicao_bordos, composicao_botes
+from cli_comum import carregar_cubo, executar, silencioso, texto_ic, texto_p
+from cubo_sobrevivencia import DIMENSOES, LADOS_BOTE, obter_cubo
+from instrumentacao import instrumentar
+from intervalos import CONFIANCA_PADRAO, limites_intervalo, reamostrar_taxas
+from modelo_sobrevivencia import ajustar_modelo_sobrevivencia, razao_chances
+from permutacoes import teste_permutacao
+from resultados import para_json
+
+# matplotlib e seaborn são importados apenas dentro das funções de plotagem
+# (módulo graficos), para que o modo somente-estatísticas inicie rápido
 
 # Definindo paleta de cores para gráficos
 cores = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6']
 
-def carregar_dados(arquivo):
-    """Carrega e pré-processa os dados do Titanic."""
-    print(f"Carregando dados de {arquivo}...")
-    df = pd.read_csv(arquivo, sep=';')
-    
-    # Verificação de valores nulos
-    print("\nValores nulos por coluna:")
-    print(df.isnull().sum())
-    
-    # Conversão de tipos - tratar valores nulos antes da conversão para int
-    # Primeiro, vamos garantir que não haja valores nulos em 'survived'
-    if df['survived'].isnull().any():
-        print(f"Atenção: {df['survived'].isnull().sum()} valores nulos encontrados na coluna 'survived'. Preenchendo com 0.")
-        df['survived'] = df['survived'].fillna(0)
-    
-    # Agora podemos converter com segurança
-    df['survived'] = df['survived'].astype(int)
-    
-    # Tratamento da coluna de idade
-    df['age'] = pd.to_numeric(df['age'], errors='coerce')
-    
-    # Tratamento da coluna fare - primeiro substituir vírgulas por pontos, depois converter
-    df['fare'] = df['fare'].str.replace(',', '.').astype(float)
-    
-    # Criando categorias de idade
-    df['categoria_idade'] = pd.cut(
-        df['age'],
-        bins=[0, 12, 18, 35, 50, 100],
-        labels=['Criança (0-12)', 'Adolescente (13-18)', 'Adulto Jovem (19-35)', 'Adulto (36-50)', 'Idoso (50+)']
-    )
-    
-    # Identificando crianças (menos de 18 anos)
-    df['is_child'] = df['age'] < 18
+@instrumentar
+def analise_lei_do_mar(dados, plotar=True, exibir=True):
+    """Análise específica da aplicação da Lei do Mar no desastre do Titanic.
     
-    return df
-
-def analise_lei_do_mar(df):
-    """Análise específica da aplicação da Lei do Mar no desastre do Titanic."""
+    `dados` pode ser o DataFrame limpo ou um cubo de sobrevivência já agregado.
+    Com `plotar=False` apenas as tabelas são calculadas e a lista de figuras fica vazia;
+    com `exibir=False` nada é impresso no console.
+    """
+    saida = print if exibir else silencioso
+    cubo = obter_cubo(dados)
     
     # 1. Análise por sexo e classe
-    sobrevivencia_sexo_classe = df.pivot_table(
-        values='survived',
+    sobrevivencia_sexo_classe = cubo.tabela(['pclass', 'sex']).pivot(
         index='pclass',
         columns='sex',
-        aggfunc='mean'
+        values='survived'
     ).reset_index()
     
     sobrevivencia_sexo_classe.columns.name = None
@@ -77,51 +52,84 @@ def analise_lei_do_mar(df):
     sobrevivencia_sexo_classe['Taxa Homens'] *= 100
     sobrevivencia_sexo_classe['Diferença (M-H)'] *= 100
     
-    print("\n1. Taxas de sobrevivência por sexo e classe:")
-    print(sobrevivencia_sexo_classe.round(1))
+    saida("\n1. Taxas de sobrevivência por sexo e classe:")
+    saida(sobrevivencia_sexo_classe.round(1))
     
     # 2. Análise por faixa etária
-    sobrevivencia_idade = df.groupby('categoria_idade')['survived'].agg(['mean', 'count']).reset_index()
+    sobrevivencia_idade = cubo.tabela(['categoria_idade'])[['categoria_idade', 'survived', 'total']]
     sobrevivencia_idade.columns = ['Faixa Etária', 'Taxa Sobrevivência', 'Total']
     sobrevivencia_idade['Taxa Sobrevivência'] *= 100
     
-    print("\n2. Taxas de sobrevivência por faixa etária:")
-    print(sobrevivencia_idade.sort_values('Taxa Sobrevivência', ascending=False).round(1))
+    saida("\n2. Taxas de sobrevivência por faixa etária:")
+    saida(sobrevivencia_idade.sort_values('Taxa Sobrevivência', ascending=False).round(1))
     
     # 3. Análise por faixa etária e sexo
-    sobrevivencia_idade_sexo = df.groupby(['categoria_idade', 'sex'])['survived'].agg(['mean', 'count']).reset_index()
+    sobrevivencia_idade_sexo = cubo.tabela(['categoria_idade', 'sex'])[['categoria_idade', 'sex', 'survived', 'total']]
     sobrevivencia_idade_sexo.columns = ['Faixa Etária', 'Sexo', 'Taxa Sobrevivência', 'Total']
     sobrevivencia_idade_sexo['Taxa Sobrevivência'] *= 100
     
-    print("\n3. Taxas de sobrevivência por faixa etária e sexo:")
-    print(sobrevivencia_idade_sexo.sort_values(['Faixa Etária', 'Taxa Sobrevivência'], ascending=[True, False]).round(1))
+    saida("\n3. Taxas de sobrevivência por faixa etária e sexo:")
+    saida(sobrevivencia_idade_sexo.sort_values(['Faixa Etária', 'Taxa Sobrevivência'], ascending=[True, False]).round(1))
     
     # 4. Botes salva-vidas (quando disponível)
-    df_botes = df.dropna(subset=['boat'])
-    
-    # Contagem de pessoas em botes por sexo
-    pessoas_botes = df_botes.groupby('sex').size().reset_index(name='Total em Botes')
-    total_por_sexo = df.groupby('sex').size().reset_index(name='Total no Navio')
-    
-    pessoas_botes = pd.merge(pessoas_botes, total_por_sexo, on='sex')
+    # Contagem de pessoas em botes por sexo (em_bote, derivado do eixo bote do cubo)
+    _, totais_sexo_bote = cubo.contagens(['sex', 'em_bote'])
+    pessoas_botes = pd.DataFrame({
+        'sex': DIMENSOES['sex'],
+        'Total em Botes': totais_sexo_bote[:, 1],
+        'Total no Navio': totais_sexo_bote.sum(axis=1),
+    })
+    pessoas_botes = pessoas_botes[pessoas_botes['Total em Botes'] > 0].reset_index(drop=True)
     pessoas_botes['Percentual em Botes'] = pessoas_botes['Total em Botes'] / pessoas_botes['Total no Navio'] * 100
     
-    print("\n4. Distribuição de pessoas em botes salva-vidas por sexo:")
-    print(pessoas_botes.round(1))
+    saida("\n4. Distribuição de pessoas em botes salva-vidas por sexo:")
+    saida(pessoas_botes.round(1))
     
     # 5. Capacidade dos botes vs. número de passageiros
-    total_passageiros = len(df)
-    total_sobreviventes = df['survived'].sum()
+    total_passageiros = cubo.total_registros
+    total_sobreviventes = int(cubo.sobreviventes.sum())
     
-    print(f"\n5. Capacidade de resgate:")
-    print(f"   Total de passageiros: {total_passageiros}")
-    print(f"   Total de sobreviventes: {total_sobreviventes}")
-    print(f"   Percentual de resgate: {total_sobreviventes/total_passageiros*100:.1f}%")
+    saida(f"\n5. Capacidade de resgate:")
+    saida(f"   Total de passageiros: {total_passageiros}")
+    saida(f"   Total de sobreviventes: {total_sobreviventes}")
+    saida(f"   Percentual de resgate: {total_sobreviventes/total_passageiros*100:.1f}%")
+    
+    # 6. Composição de cada bote e de cada bordo de lançamento (eixo bote do cubo)
+    ocupacao_botes = composicao_botes(cubo)
+    ocupacao_bordos = composicao_bordos(cubo)
+    
+    saida("\n6. Ocupantes de cada bote salva-vidas:")
+    saida(ocupacao_botes.round(1).to_string(index=False))
+    
+    saida("\n7. Ocupantes dos botes por bordo de lançamento:")
+    saida(ocupacao_bordos.round(1).to_string(index=False))
     
     # Criar visualizações
-    figuras = []
+    paginas = paginas_lei_do_mar(
+        sobrevivencia_sexo_classe, sobrevivencia_idade, sobrevivencia_idade_sexo,
+        pessoas_botes, total_sobreviventes, total_passageiros, ocupacao_botes, ocupacao_bordos
+    )
+    figuras = [funcao(*argumentos) for funcao, argumentos in paginas] if plotar else []
     
-    # Figura 1: Sobrevivência por sexo e classe
+    return (figuras, sobrevivencia_sexo_classe, sobrevivencia_idade, sobrevivencia_idade_sexo, pessoas_botes,
+            ocupacao_botes, ocupacao_bordos)
+
+def paginas_lei_do_mar(sobrevivencia_sexo_classe, sobrevivencia_idade, sobrevivencia_idade_sexo,
+                       pessoas_botes, total_sobreviventes, total_passageiros, ocupacao_botes, ocupacao_bordos):
+    """Páginas do relatório como pares (função, argumentos), na ordem do PDF."""
+    return [
+        (plotar_sexo_classe, (sobrevivencia_sexo_classe,)),
+        (plotar_faixa_etaria, (sobrevivencia_idade,)),
+        (plotar_faixa_etaria_sexo, (sobrevivencia_idade_sexo,)),
+        (plotar_botes_sexo, (pessoas_botes,)),
+        (plotar_proporcao_sobreviventes, (total_sobreviventes, total_passageiros)),
+        (plotar_composicao_botes, (ocupacao_botes,)),
+        (plotar_bordos, (ocupacao_bordos,)),
+    ]
+
+def plotar_sexo_classe(sobrevivencia_sexo_classe):
+    """Figura 1: Sobrevivência por sexo e classe."""
+    from graficos import plt, sns
     fig1, ax1 = plt.subplots()
     df_plot = pd.melt(
         sobrevivencia_sexo_classe, 
@@ -141,9 +149,11 @@ def analise_lei_do_mar(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=10, color='black')
     
-    figuras.append(fig1)
-    
-    # Figura 2: Sobrevivência por faixa etária
+    return fig1
+
+def plotar_faixa_etaria(sobrevivencia_idade):
+    """Figura 2: Sobrevivência por faixa etária."""
+    from graficos import plt, sns
     fig2, ax2 = plt.subplots()
     sobrevivencia_idade_ordenada = sobrevivencia_idade.sort_values('Faixa Etária')
     sns.barplot(x='Faixa Etária', y='Taxa Sobrevivência', data=sobrevivencia_idade_ordenada, palette=cores, ax=ax2)
@@ -158,9 +168,11 @@ def analise_lei_do_mar(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=10, color='black')
     
-    figuras.append(fig2)
-    
-    # Figura 3: Sobrevivência por faixa etária e sexo
+    return fig2
+
+def plotar_faixa_etaria_sexo(sobrevivencia_idade_sexo):
+    """Figura 3: Sobrevivência por faixa etária e sexo."""
+    from graficos import plt, sns
     fig3, ax3 = plt.subplots()
     df_plot = sobrevivencia_idade_sexo.copy()
     df_plot['Sexo'] = df_plot['Sexo'].map({'male': 'Homens', 'female': 'Mulheres'})
@@ -171,12 +183,15 @@ def analise_lei_do_mar(df):
     plt.xticks(rotation=45)
     plt.legend(title='Sexo')
     
-    figuras.append(fig3)
-    
-    # Figura 4: Percentual de pessoas em botes por sexo
+    return fig3
+
+def plotar_botes_sexo(pessoas_botes):
+    """Figura 4: Percentual de pessoas em botes por sexo."""
+    from graficos import plt, sns
     fig4, ax4 = plt.subplots()
-    pessoas_botes['Sexo'] = pessoas_botes['sex'].map({'male': 'Homens', 'female': 'Mulheres'})
-    sns.barplot(x='Sexo', y='Percentual em Botes', data=pessoas_botes, palette=[cores[0], cores[1]], ax=ax4)
+    df_plot = pessoas_botes.copy()
+    df_plot['Sexo'] = df_plot['sex'].map({'male': 'Homens', 'female': 'Mulheres'})
+    sns.barplot(x='Sexo', y='Percentual em Botes', data=df_plot, palette=[cores[0], cores[1]], ax=ax4)
     ax4.set_title('Percentual de Pessoas em Botes Salva-vidas por Sexo')
     ax4.set_xlabel('Sexo')
     ax4.set_ylabel('Percentual em Botes (%)')
@@ -187,9 +202,11 @@ def analise_lei_do_mar(df):
                    (p.get_x() + p.get_width() / 2., p.get_height()), 
                    ha='center', va='bottom', fontsize=10, color='black')
     
-    figuras.append(fig4)
-    
-    # Figura 5: Análise de capacidade de resgate
+    return fig4
+
+def plotar_proporcao_sobreviventes(total_sobreviventes, total_passageiros):
+    """Figura 5: Análise de capacidade de resgate."""
+    from graficos import plt
     fig5, ax5 = plt.subplots()
     labels = ['Sobreviventes', 'Não Sobreviventes']
     sizes = [total_sobreviventes, total_passageiros - total_sobreviventes]
@@ -198,29 +215,134 @@ def analise_lei_do_mar(df):
     ax5.set_title('Proporção de Sobreviventes no Titanic')
     ax5.axis('equal')
     
-    figuras.append(fig5)
-    
-    return figuras, sobrevivencia_sexo_classe, sobrevivencia_idade, sobrevivencia_idade_sexo, pessoas_botes
+    return fig5
+
+def plotar_composicao_botes(ocupacao_botes):
+    """Figura 6: Percentual de mulheres e crianças em cada bote, por bordo de lançamento."""
+    from graficos import plt, sns
+    fig6, ax6 = plt.subplots()
+    sns.barplot(x='Bote', y='Percentual Mulheres e Crianças', hue='Bordo', data=ocupacao_botes,
+                hue_order=LADOS_BOTE, palette=[cores[0], cores[1]], dodge=False, ax=ax6)
+    ax6.set_title('Mulheres e Crianças entre os Ocupantes de Cada Bote')
+    ax6.set_xlabel('Bote')
+    ax6.set_ylabel('Mulheres e Crianças (%)')
+    plt.legend(title='Bordo')
+    
+    return fig6
 
-def conclusoes_lei_do_mar(sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes):
-    """Gera conclusões específicas sobre a aplicação da Lei do Mar no Titanic."""
+def plotar_bordos(ocupacao_bordos):
+    """Figura 7: Composição dos ocupantes dos botes de cada bordo."""
+    from graficos import plt, sns
+    fig7, ax7 = plt.subplots()
+    df_plot = pd.melt(
+        ocupacao_bordos.assign(**{
+            'Mulheres e Crianças': ocupacao_bordos['Percentual Mulheres e Crianças'],
+            'Demais Homens': 100 - ocupacao_bordos['Percentual Mulheres e Crianças'],
+        }),
+        id_vars=['Bordo'],
+        value_vars=['Mulheres e Crianças', 'Demais Homens'],
+        var_name='Ocupantes',
+        value_name='Percentual (%)'
+    )
+    sns.barplot(x='Bordo', y='Percentual (%)', hue='Ocupantes', data=df_plot, palette=[cores[1], cores[0]], ax=ax7)
+    ax7.set_title('Ocupantes dos Botes por Bordo de Lançamento')
+    ax7.set_xlabel('Bordo')
+    ax7.set_ylabel('Percentual dos Ocupantes (%)')
     
-    print("\n=== CONCLUSÕES SOBRE A LEI DO MAR NO TITANIC ===")
+    # Adicionar rótulos de porcentagem
+    for i, p in enumerate(ax7.patches):
+        ax7.annotate(f'{p.get_height():.1f}%', 
+                   (p.get_x() + p.get_width() / 2., p.get_height()), 
+                   ha='center', va='bottom', fontsize=10, color='black')
+    
+    return fig7
+
+@instrumentar
+def intervalos_lei_do_mar(dados, confianca=CONFIANCA_PADRAO, **opcoes_bootstrap):
+    """Intervalos de confiança bootstrap das médias usadas nas conclusões da Lei do Mar.
+    
+    As médias entre classes e entre faixas etárias são recalculadas em cada
+    reamostra das contagens do cubo. Retorna um dicionário nome -> (inferior, superior).
+    """
+    cubo = obter_cubo(dados)
+    
+    tabela, taxas = reamostrar_taxas(cubo, ['pclass', 'sex'], **opcoes_bootstrap)
+    mulheres = (tabela['sex'] == 'female').to_numpy()
+    classe1 = (tabela['pclass'] == 1).to_numpy()
+    classe3 = (tabela['pclass'] == 3).to_numpy()
+    medias = {
+        'taxa_mulheres': taxas[:, mulheres].mean(axis=1),
+        'taxa_homens': taxas[:, ~mulheres].mean(axis=1),
+        'diferenca_classes': taxas[:, classe1].mean(axis=1) - taxas[:, classe3].mean(axis=1),
+    }
+    
+    tabela, taxas = reamostrar_taxas(cubo, ['categoria_idade'], **opcoes_bootstrap)
+    criancas = tabela['categoria_idade'].isin(['Criança (0-12)', 'Adolescente (13-18)']).to_numpy()
+    medias['taxa_criancas'] = taxas[:, criancas].mean(axis=1)
+    medias['taxa_adultos'] = taxas[:, ~criancas].mean(axis=1)
+    
+    return {nome: tuple(limites_intervalo(valores, confianca)) for nome, valores in medias.items()}
+
+@instrumentar
+def testes_lei_do_mar(dados, **opcoes_teste):
+    """Testes de permutação unilaterais das prioridades avaliadas nas conclusões.
+    
+    Crianças aqui são as faixas etárias de 0 a 18 anos, como nas médias das
+    conclusões. Cada hipótese é testada no manifesto inteiro e estratificada por classe.
+    """
+    cubo = obter_cubo(dados)
+    criancas = ['Criança (0-12)', 'Adolescente (13-18)']
+    return {
+        'mulheres': teste_permutacao(cubo, 'sex', 'female', **opcoes_teste),
+        'mulheres_por_classe': teste_permutacao(cubo, 'sex', 'female', ['pclass'], **opcoes_teste),
+        'criancas': teste_permutacao(cubo, 'categoria_idade', criancas, **opcoes_teste),
+        'criancas_por_classe': teste_permutacao(cubo, 'categoria_idade', criancas, ['pclass'], **opcoes_teste),
+    }
+
+def _texto_rc(modelo, termo):
+    rc = razao_chances(modelo, termo)
+    if rc is None:
+        return "indisponível"
+    return (f"{rc['razao_chances']:.2f} (IC 95%: {rc['ic_inferior']:.2f} a {rc['ic_superior']:.2f}; "
+            f"p = {rc['p_valor']:.2g})")
+
+@instrumentar
+def conclusoes_lei_do_mar(sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes,
+                          intervalos=None, testes=None, modelo=None, bordos=None, exibir=True):
+    """Gera conclusões específicas sobre a aplicação da Lei do Mar no Titanic.
+    
+    Além de imprimir (quando `exibir=True`), retorna os valores e decisões em um dicionário.
+    Com `intervalos` (de intervalos_lei_do_mar), as médias são exibidas com seus
+    intervalos de confiança e a decisão sobre o impacto da classe também é
+    avaliada pelo limite inferior do intervalo. Com `testes` (de testes_lei_do_mar),
+    as prioridades são acompanhadas dos p-valores dos testes de permutação.
+    Com `modelo` (de modelo_sobrevivencia.ajustar_modelo_sobrevivencia), cada
+    comparação cita também a razão de chances ajustada pelas demais covariáveis,
+    já que as médias brutas misturam os efeitos de sexo, idade e classe. Com
+    `bordos` (de botes.composicao_bordos), o acesso aos botes é comparado entre
+    os bordos de lançamento.
+    """
+    saida = print if exibir else silencioso
+    intervalos = intervalos or {}
+    
+    saida("\n=== CONCLUSÕES SOBRE A LEI DO MAR NO TITANIC ===")
     
     # 1. Análise da prioridade por sexo
     taxa_mulheres = sobrev_sex_classe['Taxa Mulheres'].mean()
     taxa_homens = sobrev_sex_classe['Taxa Homens'].mean()
     
-    print(f"\n1. Prioridade para mulheres:")
-    print(f"   - Taxa média de sobrevivência de mulheres: {taxa_mulheres:.1f}%")
-    print(f"   - Taxa média de sobrevivência de homens: {taxa_homens:.1f}%")
+    saida(f"\n1. Prioridade para mulheres:")
+    saida(f"   - Taxa média de sobrevivência de mulheres: {taxa_mulheres:.1f}%{texto_ic(intervalos.get('taxa_mulheres'))}")
+    saida(f"   - Taxa média de sobrevivência de homens: {taxa_homens:.1f}%{texto_ic(intervalos.get('taxa_homens'))}")
     
     if taxa_mulheres > taxa_homens:
         diferenca = taxa_mulheres / taxa_homens
-        print(f"   - Mulheres tiveram {diferenca:.1f}x mais chances de sobreviver que homens")
-        print("   - Há evidência clara de prioridade para mulheres")
+        saida(f"   - Mulheres tiveram {diferenca:.1f}x mais chances de sobreviver que homens")
+        saida(f"   - Há evidência clara de prioridade para mulheres{texto_p(testes, 'mulheres')}")
     else:
-        print("   - Não há evidência de prioridade para mulheres")
+        saida("   - Não há evidência de prioridade para mulheres")
+    if modelo:
+        saida(f"   - Razão de chances ajustada (mulheres vs. homens): {_texto_rc(modelo, 'sex=female')}")
     
     # 2. Análise da prioridade por idade
     criancas = sobrev_idade[sobrev_idade['Faixa Etária'].isin(['Criança (0-12)', 'Adolescente (13-18)'])]
@@ -229,81 +351,250 @@ def conclusoes_lei_do_mar(sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pe
     adultos = sobrev_idade[~sobrev_idade['Faixa Etária'].isin(['Criança (0-12)', 'Adolescente (13-18)'])]
     taxa_adultos = adultos['Taxa Sobrevivência'].mean()
     
-    print(f"\n2. Prioridade para crianças:")
-    print(f"   - Taxa média de sobrevivência de crianças/adolescentes: {taxa_criancas:.1f}%")
-    print(f"   - Taxa média de sobrevivência de adultos: {taxa_adultos:.1f}%")
+    saida(f"\n2. Prioridade para crianças:")
+    saida(f"   - Taxa média de sobrevivência de crianças/adolescentes: {taxa_criancas:.1f}%{texto_ic(intervalos.get('taxa_criancas'))}")
+    saida(f"   - Taxa média de sobrevivência de adultos: {taxa_adultos:.1f}%{texto_ic(intervalos.get('taxa_adultos'))}")
     
     if taxa_criancas > taxa_adultos:
         diferenca = taxa_criancas / taxa_adultos
-        print(f"   - Crianças tiveram {diferenca:.1f}x mais chances de sobreviver que adultos")
-        print("   - Há evidência de prioridade para crianças")
+        saida(f"   - Crianças tiveram {diferenca:.1f}x mais chances de sobreviver que adultos")
+        saida(f"   - Há evidência de prioridade para crianças{texto_p(testes, 'criancas')}")
     else:
-        print("   - Não há evidência consistente de prioridade para crianças")
+        saida("   - Não há evidência consistente de prioridade para crianças")
+    if modelo:
+        saida(f"   - Razão de chances ajustada (0-12 anos vs. 19-35 anos): "
+              f"{_texto_rc(modelo, 'categoria_idade=Criança (0-12)')}")
+        saida(f"   - Razão de chances ajustada (13-18 anos vs. 19-35 anos): "
+              f"{_texto_rc(modelo, 'categoria_idade=Adolescente (13-18)')}")
     
     # 3. Verificação de consistência entre classes
-    print("\n3. Consistência entre classes socioeconômicas:")
+    saida("\n3. Consistência entre classes socioeconômicas:")
     for pclass in [1, 2, 3]:
         tx_mulheres = sobrev_sex_classe[sobrev_sex_classe['pclass'] == pclass]['Taxa Mulheres'].values[0]
         tx_homens = sobrev_sex_classe[sobrev_sex_classe['pclass'] == pclass]['Taxa Homens'].values[0]
         diferenca = sobrev_sex_classe[sobrev_sex_classe['pclass'] == pclass]['Diferença (M-H)'].values[0]
         
-        print(f"   - Classe {pclass}:")
-        print(f"     * Mulheres: {tx_mulheres:.1f}%, Homens: {tx_homens:.1f}%")
-        print(f"     * Diferença: {diferenca:.1f} pontos percentuais")
+        saida(f"   - Classe {pclass}:")
+        saida(f"     * Mulheres: {tx_mulheres:.1f}%, Homens: {tx_homens:.1f}%")
+        saida(f"     * Diferença: {diferenca:.1f} pontos percentuais")
     
     # 4. Análise das pessoas em botes
     tx_mulheres_botes = pessoas_botes[pessoas_botes['sex'] == 'female']['Percentual em Botes'].values[0]
     tx_homens_botes = pessoas_botes[pessoas_botes['sex'] == 'male']['Percentual em Botes'].values[0]
     
-    print(f"\n4. Acesso aos botes salva-vidas:")
-    print(f"   - Percentual de mulheres que acessaram botes: {tx_mulheres_botes:.1f}%")
-    print(f"   - Percentual de homens que acessaram botes: {tx_homens_botes:.1f}%")
+    saida(f"\n4. Acesso aos botes salva-vidas:")
+    saida(f"   - Percentual de mulheres que acessaram botes: {tx_mulheres_botes:.1f}%")
+    saida(f"   - Percentual de homens que acessaram botes: {tx_homens_botes:.1f}%")
+    mulheres_criancas_bordo = {}
+    if bordos is not None:
+        mulheres_criancas_bordo = dict(zip(bordos['Bordo'], bordos['Percentual Mulheres e Crianças']))
+        for bordo, percentual in mulheres_criancas_bordo.items():
+            saida(f"   - Mulheres e crianças entre os ocupantes dos botes a {bordo.lower()}: {percentual:.1f}%")
     
     # 5. Conclusão final sobre a Lei do Mar
-    print("\n5. Conclusão sobre a afirmação do artigo:")
-    print("   Com base na análise dos dados, podemos concluir que:")
+    saida("\n5. Conclusão sobre a afirmação do artigo:")
+    saida("   Com base na análise dos dados, podemos concluir que:")
     
-    if taxa_mulheres > taxa_homens and all(sobrev_sex_classe['Taxa Mulheres'] > sobrev_sex_classe['Taxa Homens']):
-        print("   - A tripulação do Titanic priorizou o resgate de mulheres em todas as classes")
+    mulheres_todas_classes = bool(all(sobrev_sex_classe['Taxa Mulheres'] > sobrev_sex_classe['Taxa Homens']))
+    if taxa_mulheres > taxa_homens and mulheres_todas_classes:
+        saida("   - A tripulação do Titanic priorizou o resgate de mulheres em todas as classes")
     else:
-        print("   - A prioridade para mulheres não foi consistente em todas as classes")
+        saida("   - A prioridade para mulheres não foi consistente em todas as classes")
     
     if taxa_criancas > taxa_adultos:
-        print("   - Há evidência de que crianças tiveram prioridade sobre adultos")
+        saida("   - Há evidência de que crianças tiveram prioridade sobre adultos")
     else:
-        print("   - Não há evidência consistente de prioridade para crianças")
+        saida("   - Não há evidência consistente de prioridade para crianças")
     
     # Verificar se classe social teve impacto significativo
     classe1 = sobrev_sex_classe[sobrev_sex_classe['pclass'] == 1][['Taxa Mulheres', 'Taxa Homens']].mean().mean()
     classe3 = sobrev_sex_classe[sobrev_sex_classe['pclass'] == 3][['Taxa Mulheres', 'Taxa Homens']].mean().mean()
     diferenca_classes = classe1 - classe3
     
-    if diferenca_classes > 20:  # diferença de 20 pontos percentuais ou mais
-        print(f"   - A classe social teve impacto significativo na sobrevivência (diferença de {diferenca_classes:.1f} pontos percentuais)")
-        print("   - A 'Lei do Mar' parece ter sido aplicada de forma desigual entre as classes sociais")
-        print("   - O status socioeconômico influenciou significativamente nas chances de sobrevivência")
+    # Com intervalos, o limiar também é conferido contra o limite inferior da diferença
+    impacto_classe_robusto = None
+    if intervalos and 'diferenca_classes' in intervalos:
+        impacto_classe_robusto = bool(intervalos['diferenca_classes'][0] > 20)
     
-    print("\n   CONCLUSÃO FINAL:")
+    if diferenca_classes > 20:  # diferença de 20 pontos percentuais ou mais
+        saida(f"   - A classe social teve impacto significativo na sobrevivência (diferença de {diferenca_classes:.1f} pontos percentuais)"
+              f"{texto_ic(intervalos.get('diferenca_classes'))}")
+        if impacto_classe_robusto is False:
+            saida("     (o limite inferior do intervalo de confiança fica abaixo de 20 pontos percentuais)")
+        saida("   - A 'Lei do Mar' parece ter sido aplicada de forma desigual entre as classes sociais")
+        saida("   - O status socioeconômico influenciou significativamente nas chances de sobrevivência")
+    if modelo:
+        # A diferença bruta entre classes mistura a composição por sexo e idade de cada classe
+        saida(f"   - Razão de chances ajustada por sexo, idade, porto e família (3ª vs. 1ª classe): "
+              f"{_texto_rc(modelo, 'pclass=3')}")
+    
+    saida("\n   CONCLUSÃO FINAL:")
     if taxa_mulheres > taxa_homens and taxa_criancas > taxa_adultos:
-        print("   A afirmação de que 'A tripulação do Titanic seguiu a Lei do Mar' é parcialmente verdadeira,")
-        print("   pois mulheres e crianças tiveram maior probabilidade de sobrevivência.")
+        saida("   A afirmação de que 'A tripulação do Titanic seguiu a Lei do Mar' é parcialmente verdadeira,")
+        saida("   pois mulheres e crianças tiveram maior probabilidade de sobrevivência.")
     else:
-        print("   A afirmação de que 'A tripulação do Titanic seguiu a Lei do Mar' não é inteiramente precisa,")
+        saida("   A afirmação de que 'A tripulação do Titanic seguiu a Lei do Mar' não é inteiramente precisa,")
     
     if diferenca_classes > 20:
-        print("   pois a aplicação dessa prioridade foi significativamente influenciada pela classe socioeconômica.")
+        saida("   pois a aplicação dessa prioridade foi significativamente influenciada pela classe socioeconômica.")
     else:
-        print("   pois não houve aplicação consistente da prioridade para crianças em todas as circunstâncias.")
+        saida("   pois não houve aplicação consistente da prioridade para crianças em todas as circunstâncias.")
+    
+    return para_json({
+        'taxa_mulheres': taxa_mulheres,
+        'taxa_homens': taxa_homens,
+        'taxa_criancas': taxa_criancas,
+        'taxa_adultos': taxa_adultos,
+        'percentual_mulheres_botes': tx_mulheres_botes,
+        'percentual_homens_botes': tx_homens_botes,
+        'percentual_mulheres_criancas_bordo': mulheres_criancas_bordo,
+        'diferenca_classes': diferenca_classes,
+        'prioridade_mulheres': taxa_mulheres > taxa_homens,
+        'prioridade_mulheres_todas_classes': mulheres_todas_classes,
+        'prioridade_criancas': taxa_criancas > taxa_adultos,
+        'impacto_classe_significativo': diferenca_classes > 20,
+        'impacto_classe_robusto': impacto_classe_robusto,
+        'intervalos': intervalos,
+        'p_valores': {nome: teste['p_valor'] for nome, teste in (testes or {}).items()},
+        'razoes_chances_ajustadas': {
+            nome: razao_chances(modelo, termo) for nome, termo in [
+                ('mulheres', 'sex=female'),
+                ('criancas', 'categoria_idade=Criança (0-12)'),
+                ('adolescentes', 'categoria_idade=Adolescente (13-18)'),
+                ('segunda_classe', 'pclass=2'),
+                ('terceira_classe', 'pclass=3'),
+            ]
+        } if modelo else {},
+    })
 
-def main():
-    # Carregar dados
-    df = carregar_dados("titanic3.csv")
-    
-    # Realizar análise
-    figuras, sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes = analise_lei_do_mar(df)
-    
-    # Gerar conclusões
-    conclusoes_lei_do_mar(sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes)
+def calcular_estatisticas(arquivo, **opcoes_carga):
+    """Calcula as tabelas e conclusões da Lei do Mar sem gerar gráficos nem imprimir resultados."""
+    return estatisticas_do_cubo(carregar_cubo(arquivo, **opcoes_carga))
+
+def estatisticas_do_cubo(cubo):
+    """Tabelas, totais, intervalos, testes, modelo e conclusões da Lei do Mar a partir de um cubo já carregado."""
+    _, sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes, ocupacao_botes, ocupacao_bordos = \
+        analise_lei_do_mar(cubo, plotar=False, exibir=False)
+    intervalos = intervalos_lei_do_mar(cubo)
+    testes = testes_lei_do_mar(cubo)
+    modelo = ajustar_modelo_sobrevivencia(cubo)
+    conclusoes = conclusoes_lei_do_mar(
+        sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes,
+        intervalos=intervalos, testes=testes, modelo=modelo, bordos=ocupacao_bordos, exibir=False
+    )
+    return {
+        'tabelas': {
+            'sexo_classe': sobrev_sex_classe,
+            'faixa_etaria': sobrev_idade,
+            'faixa_etaria_sexo': sobrev_idade_sexo,
+            'botes_sexo': pessoas_botes,
+            'composicao_botes': ocupacao_botes,
+            'composicao_bordos': ocupacao_bordos,
+        },
+        'totais': {
+            'passageiros': cubo.total_registros,
+            'sobreviventes': int(cubo.sobreviventes.sum()),
+        },
+        'intervalos': intervalos,
+        'testes': testes,
+        'modelo': modelo,
+        'conclusoes': conclusoes,
+    }
+
+def secoes_html_lei_do_mar(sobrevivencia_sexo_classe, sobrevivencia_idade, sobrevivencia_idade_sexo,
+                           pessoas_botes, total_sobreviventes, total_passageiros, ocupacao_botes, ocupacao_bordos):
+    """Seções do relatório HTML como trios (título, gráfico SVG, tabela), na ordem do PDF."""
+    from relatorio_html import barras_da_tabela, grafico_barras, grafico_pizza
+    sexos = {'male': 'Homens', 'female': 'Mulheres'}
+    capacidade = pd.DataFrame({
+        'Passageiros': [total_passageiros],
+        'Sobreviventes': [total_sobreviventes],
+        'Percentual de Resgate': [total_sobreviventes / total_passageiros * 100],
+    })
+    return [
+        ('1. Sobrevivência por sexo e classe', grafico_barras(
+            'Taxa de Sobrevivência por Classe e Sexo', sobrevivencia_sexo_classe['pclass'].tolist(),
+            [('Taxa Mulheres', sobrevivencia_sexo_classe['Taxa Mulheres'].tolist(), cores[1]),
+             ('Taxa Homens', sobrevivencia_sexo_classe['Taxa Homens'].tolist(), cores[0])],
+            rotulo_x='Classe'
+        ), sobrevivencia_sexo_classe),
+        ('2. Sobrevivência por faixa etária', barras_da_tabela(
+            'Taxa de Sobrevivência por Faixa Etária', sobrevivencia_idade.sort_values('Faixa Etária'),
+            'Faixa Etária', 'Taxa Sobrevivência', cores, rotulo_x='Faixa Etária'
+        ), sobrevivencia_idade),
+        ('3. Sobrevivência por faixa etária e sexo', barras_da_tabela(
+            'Taxa de Sobrevivência por Faixa Etária e Sexo', sobrevivencia_idade_sexo,
+            'Faixa Etária', 'Taxa Sobrevivência', [cores[0], cores[1]], grupo='Sexo', nomes=sexos,
+            rotulo_x='Faixa Etária'
+        ), sobrevivencia_idade_sexo),
+        ('4. Pessoas em botes salva-vidas por sexo', barras_da_tabela(
+            'Percentual de Pessoas em Botes Salva-vidas por Sexo', pessoas_botes, 'sex', 'Percentual em Botes',
+            [cores[0], cores[1]], nomes=sexos, rotulo_x='Sexo', rotulo_y='Percentual em Botes (%)'
+        ), pessoas_botes),
+        ('5. Capacidade de resgate', grafico_pizza(
+            'Proporção de Sobreviventes no Titanic', ['Sobreviventes', 'Não Sobreviventes'],
+            [total_sobreviventes, total_passageiros - total_sobreviventes], [cores[2], cores[1]]
+        ), capacidade),
+        ('6. Ocupantes de cada bote salva-vidas', grafico_barras(
+            'Mulheres e Crianças entre os Ocupantes de Cada Bote', ocupacao_botes['Bote'].tolist(),
+            [('Mulheres e Crianças', ocupacao_botes['Percentual Mulheres e Crianças'].tolist(),
+              [cores[LADOS_BOTE.index(bordo)] for bordo in ocupacao_botes['Bordo']])],
+            rotulo_x='Bote (azul: estibordo; vermelho: bombordo)', rotulo_y='Mulheres e Crianças (%)'
+        ), ocupacao_botes),
+        ('7. Ocupantes dos botes por bordo de lançamento', grafico_barras(
+            'Ocupantes dos Botes por Bordo de Lançamento', ocupacao_bordos['Bordo'].tolist(),
+            [('Mulheres e Crianças', ocupacao_bordos['Percentual Mulheres e Crianças'].tolist(), cores[1]),
+             ('Demais Homens', (100 - ocupacao_bordos['Percentual Mulheres e Crianças']).tolist(), cores[0])],
+            rotulo_x='Bordo', rotulo_y='Percentual dos Ocupantes (%)'
+        ), ocupacao_bordos),
+    ]
+
+def main(arquivo="titanic3.csv", processos=None, formato='pdf', **opcoes_carga):
+    """Executa a análise e grava o relatório em PDF ou, com `formato='html'`, em HTML/SVG e JSON."""
+    cubo = carregar_cubo(arquivo, **opcoes_carga)
+    
+    # Realizar análise (as figuras são renderizadas depois, em processos separados)
+    _, sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes, ocupacao_botes, ocupacao_bordos = \
+        analise_lei_do_mar(cubo, plotar=False)
+    
+    # Gerar conclusões, com intervalos de confiança bootstrap, testes de permutação
+    # e as razões de chances do modelo logístico
+    modelo = ajustar_modelo_sobrevivencia(cubo)
+    texto_conclusoes = io.StringIO()
+    with contextlib.redirect_stdout(texto_conclusoes):
+        conclusoes = conclusoes_lei_do_mar(
+            sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes,
+            intervalos=intervalos_lei_do_mar(cubo), testes=testes_lei_do_mar(cubo), modelo=modelo,
+            bordos=ocupacao_bordos
+        )
+    print(texto_conclusoes.getvalue(), end='')
+    
+    total_sobreviventes = int(cubo.sobreviventes.sum())
+    if formato == 'html':
+        from relatorio_html import gerar_relatorio_html
+        secoes = secoes_html_lei_do_mar(
+            sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes,
+            total_sobreviventes, cubo.total_registros, ocupacao_botes, ocupacao_bordos
+        )
+        dados = {
+            'arquivo': arquivo,
+            'tabelas': {
+                'sexo_classe': sobrev_sex_classe,
+                'faixa_etaria': sobrev_idade,
+                'faixa_etaria_sexo': sobrev_idade_sexo,
+                'botes_sexo': pessoas_botes,
+                'composicao_botes': ocupacao_botes,
+                'composicao_bordos': ocupacao_bordos,
+            },
+            'totais': {'passageiros': cubo.total_registros, 'sobreviventes': total_sobreviventes},
+            'modelo': modelo,
+            'conclusoes': conclusoes,
+        }
+        gerar_relatorio_html(
+            'Análise da Lei do Mar no Titanic', secoes, 'lei_do_mar_titanic.html',
+            texto_conclusoes.getvalue(), dados, 'lei_do_mar_titanic.json'
+        )
+        return
     
     # Remover o arquivo PDF antigo se ele existir
     output_pdf = 'lei_do_mar_titanic.pdf'
@@ -314,30 +605,16 @@ def main():
         except Exception as e:
             print(f"Não foi possível remover o arquivo antigo: {e}")
     
-    # Salvar gráficos em PDF
-    try:
-        with PdfPages(output_pdf) as pdf:
-            for i, fig in enumerate(figuras):
-                pdf.savefig(fig)
-                
-        # Fechar todas as figuras para liberar memória
-        for fig in figuras:
-            plt.close(fig)
-            
-        print(f"\nAnálise concluída. Os resultados foram salvos em '{output_pdf}'")
-    except Exception as e:
-        print(f"\nErro ao salvar o PDF: {e}")
-        print("Tentando salvar as figuras individualmente como arquivos PNG...")
-        
-        # Plano B: Salvar figuras individuais como PNG se o PDF falhar
-        nomes_figuras = ['classe_sexo', 'faixa_etaria', 'faixa_etaria_sexo', 'botes_sexo', 'proporcao_sobreviventes']
-        for i, fig in enumerate(figuras):
-            nome_arquivo = f"lei_do_mar_{nomes_figuras[i] if i < len(nomes_figuras) else i}.png"
-            fig.savefig(nome_arquivo)
-            print(f"Figura salva como {nome_arquivo}")
-            plt.close(fig)
-        
-        print("Figuras salvas como arquivos PNG separados.")
+    # Salvar gráficos em PDF, renderizando cada página em um processo de trabalho
+    paginas = paginas_lei_do_mar(
+        sobrev_sex_classe, sobrev_idade, sobrev_idade_sexo, pessoas_botes,
+        total_sobreviventes, cubo.total_registros, ocupacao_botes, ocupacao_bordos
+    )
+    nomes_figuras = ['classe_sexo', 'faixa_etaria', 'faixa_etaria_sexo', 'botes_sexo', 'proporcao_sobreviventes',
+                     'composicao_botes', 'bordos']
+    nomes_png = [f"lei_do_mar_{nome}.png" for nome in nomes_figuras]
+    from relatorio_pdf import gerar_relatorio
+    gerar_relatorio(paginas, output_pdf, nomes_png, processos=processos)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    executar("Análise da Lei do Mar no Titanic", 'lei_do_mar_titanic', calcular_estatisticas, main)
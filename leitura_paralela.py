@@ -0,0 +1,163 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from carregador import ESQUEMA, imputar_idade, ler_csv, validar_e_converter
+from cubo_sobrevivencia import DIMENSOES, DIMENSOES_IDADE, CuboSobrevivencia, construir_cubo
+from entrada import compressao, partes_do_manifesto, tamanho_em_disco, verificar_cabecalhos
+from imputacao import COLUNAS_GRUPO, contar_idades, medianas_idade, somar_contagens
+from instrumentacao import etapa
+
+# Bytes de CSV por fatia: cada processo agrega uma fatia por vez, então a
+# memória de cada um fica limitada a uma fatia, independentemente do arquivo
+TAMANHO_FATIA = 32 * 2**20
+
+# Linhas por bloco ao converter uma fatia com o pandas
+TAMANHO_BLOCO = 100_000
+
+# Colunas que bastam para imputar a idade de uma linha e situá-la no cubo (as
+# dimensões de idade e 'idade_imputada' só são conhecidas depois da imputação)
+COLUNAS_PENDENTES = [*COLUNAS_GRUPO, 'survived', *[
+    d for d in DIMENSOES if d not in (*COLUNAS_GRUPO, *DIMENSOES_IDADE, 'idade_imputada')
+]]
+
+
+def dividir_em_fatias(arquivo, n_fatias):
+    """Cabeçalho do CSV e intervalos de bytes (início, fim) que começam e terminam em quebras de linha.
+
+    Cada fronteira é levada para o início da linha seguinte, então nenhuma linha
+    é partida entre duas fatias (o manifesto não tem quebras de linha dentro
+    de campos, como já supõe a leitura incremental).
+    """
+    with open(arquivo, 'rb') as f:
+        cabecalho = f.readline()
+        tamanho = os.fstat(f.fileno()).st_size
+        limites = [len(cabecalho)]
+        for i in range(1, n_fatias):
+            alvo = len(cabecalho) + (tamanho - len(cabecalho)) * i // n_fatias
+            if alvo <= limites[-1]:
+                continue
+            f.seek(alvo - 1)
+            f.readline()
+            if f.tell() >= tamanho:
+                break
+            limites.append(f.tell())
+    limites.append(tamanho)
+    return cabecalho, [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+
+def _cubo_vazio():
+    dimensoes = list(DIMENSOES)
+    formato = tuple(len(DIMENSOES[d]) + 1 for d in dimensoes)
+    return CuboSobrevivencia(dimensoes, np.zeros(formato, dtype=np.int64), np.zeros(formato, dtype=np.int64))
+
+
+def fatias_do_manifesto(arquivo, processos, tamanho_fatia=TAMANHO_FATIA):
+    """Fatias (parte, cabeçalho, início, fim) de um manifesto em uma ou várias partes.
+
+    Partes sem compressão são divididas em intervalos de bytes, em proporção ao
+    tamanho de cada uma (pelo menos um por processo no total). Um arquivo
+    comprimido não permite saltar para um offset, então cada parte comprimida é
+    uma fatia inteira, sem cabeçalho nem intervalo, descomprimida por um único
+    processo.
+    """
+    partes = partes_do_manifesto(arquivo)
+    verificar_cabecalhos(partes, ESQUEMA)
+    total = max(1, tamanho_em_disco(partes))
+    fatias = []
+    for parte in partes:
+        if compressao(parte) is not None:
+            fatias.append((parte, None, None, None))
+            continue
+        tamanho = os.path.getsize(parte)
+        n_fatias = max(1, -(-tamanho // tamanho_fatia), round(processos * tamanho / total))
+        cabecalho, intervalos = dividir_em_fatias(parte, n_fatias)
+        fatias.extend((parte, cabecalho, inicio, fim) for inicio, fim in intervalos)
+    return fatias
+
+
+def blocos_da_fatia(parte, cabecalho, inicio, fim, tamanho_bloco):
+    """Blocos brutos (ainda não validados) de uma fatia de fatias_do_manifesto."""
+    if cabecalho is None:
+        return ler_csv(parte, chunksize=tamanho_bloco)
+    with open(parte, 'rb') as f:
+        f.seek(inicio)
+        trecho = f.read(fim - inicio)
+    return ler_csv(io.BytesIO(cabecalho + trecho), chunksize=tamanho_bloco)
+
+
+def agregar_blocos(blocos):
+    """Contagens de blocos já validados, sem depender das medianas de imputação.
+
+    As linhas com idade conhecida já entram no cubo. As sem idade dependem das
+    medianas do arquivo inteiro, então voltam agrupadas por COLUNAS_PENDENTES,
+    para serem imputadas (cubo_dos_pendentes) depois que as contagens de idade
+    de todos os blocos forem somadas. Devolve (cubo, contagens de idade,
+    pendentes, linhas).
+    """
+    cubo, idades, pendentes, linhas = _cubo_vazio(), [], [], 0
+    for bloco in blocos:
+        linhas += len(bloco)
+        idades.append(contar_idades(bloco))
+        conhecida = bloco['age'].notna()
+        cubo = cubo.mesclar(construir_cubo(bloco[conhecida].assign(idade_imputada=False), list(DIMENSOES)))
+        pendentes.append(
+            bloco.loc[~conhecida, COLUNAS_PENDENTES].groupby(COLUNAS_PENDENTES, observed=True, dropna=False).size()
+        )
+    return cubo, somar_contagens(idades), somar_pendentes(pendentes), linhas
+
+
+def _agregar_fatia(fatia, tamanho_bloco):
+    """Lê e limpa uma fatia do CSV, devolvendo só contagens (veja agregar_blocos)."""
+    return agregar_blocos(validar_e_converter(bloco, avisos=False) for bloco in blocos_da_fatia(*fatia, tamanho_bloco))
+
+
+def somar_pendentes(pendentes):
+    """Soma as contagens de linhas sem idade de vários blocos ou fatias (None se não houver nenhuma)."""
+    pendentes = [p for p in pendentes if p is not None]
+    if not pendentes:
+        return None
+    return pd.concat(pendentes).groupby(level=COLUNAS_PENDENTES, observed=True, dropna=False).sum()
+
+
+def cubo_dos_pendentes(pendentes, medianas):
+    """Cubo das linhas sem idade, imputadas com as medianas do arquivo inteiro."""
+    grupos = somar_pendentes(pendentes)
+    if grupos is None:
+        return _cubo_vazio()
+    tabela = grupos.rename('n').reset_index()
+    tabela['age'] = np.float32(np.nan)
+    return construir_cubo(imputar_idade(tabela, medianas), list(DIMENSOES), pesos=tabela['n'].to_numpy())
+
+
+def construir_cubo_paralelo(arquivo, processos=None, tamanho_fatia=TAMANHO_FATIA, tamanho_bloco=TAMANHO_BLOCO):
+    """Constrói o cubo lendo e agregando fatias do CSV em vários processos.
+
+    O arquivo é dividido em intervalos de bytes alinhados às quebras de linha
+    (veja fatias_do_manifesto), e cada processo aplica às suas linhas as
+    mesmas regras de limpeza de carregar_dados. Só as contagens voltam ao
+    processo principal, que as soma; o resultado é idêntico ao do caminho serial
+    e o CSV é lido uma única vez.
+    """
+    processos = processos or os.cpu_count() or 1
+    fatias = fatias_do_manifesto(arquivo, processos, tamanho_fatia)
+
+    print(f"Agregando {arquivo} em {len(fatias)} fatias com {processos} processos...")
+    with etapa('construir_cubo_paralelo') as info:
+        cubo, idades, pendentes, linhas = _cubo_vazio(), [], [], 0
+        with ProcessPoolExecutor(max_workers=max(1, min(processos, len(fatias)))) as executor:
+            # map devolve os resultados na ordem das fatias e descarta cada um depois de entregue
+            parciais = executor.map(_agregar_fatia, fatias, repeat(tamanho_bloco))
+            for cubo_fatia, idades_fatia, pendentes_fatia, linhas_fatia in parciais:
+                cubo = cubo.mesclar(cubo_fatia)
+                idades.append(idades_fatia)
+                pendentes.append(pendentes_fatia)
+                linhas += linhas_fatia
+        medianas = medianas_idade(somar_contagens(idades))
+        cubo = cubo.mesclar(cubo_dos_pendentes(pendentes, medianas))
+        info['linhas'] = linhas
+    return cubo
@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from entrada import EXTENSOES_COMPRESSAO, nome_sem_compressao
+from resultados import salvar_json
+
+DIRETORIO_SAIDA_PADRAO = 'resultados_lote'
+
+
+def encontrar_manifestos(entradas):
+    """Expande diretórios (todos os .csv, comprimidos ou não) e padrões glob em uma lista ordenada de arquivos."""
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for extensao in ('', *EXTENSOES_COMPRESSAO):
+                arquivos.extend(glob.glob(os.path.join(entrada, f'*.csv{extensao}')))
+        elif glob.has_magic(entrada):
+            arquivos.extend(glob.glob(entrada, recursive=True))
+        else:
+            arquivos.append(entrada)
+    return sorted(dict.fromkeys(os.path.normpath(a) for a in arquivos))
+
+
+def _nomes_saida(arquivos):
+    """Nome base dos arquivos de saída de cada manifesto, sem colisões entre diretórios diferentes."""
+    nomes = {}
+    usados = set()
+    for arquivo in arquivos:
+        base = os.path.splitext(os.path.basename(nome_sem_compressao(arquivo)))[0]
+        nome, contador = base, 2
+        while nome in usados:
+            nome, contador = f"{base}_{contador}", contador + 1
+        usados.add(nome)
+        nomes[arquivo] = nome
+    return nomes
+
+
+def _inicializar_processo():
+    # Bibliotecas pesadas são importadas uma única vez por processo de trabalho
+    import analise_titanic  # noqa: F401
+    import graficos  # noqa: F401
+    import lei_do_mar_titanic  # noqa: F401
+    import relatorio_pdf  # noqa: F401
+
+
+def processar_manifesto(arquivo, diretorio_saida, nome, gerar_pdf=True, tamanho_bloco=None):
+    """Analisa um manifesto e grava `<nome>.json`, `<nome>.pdf` e `<nome>.log` em `diretorio_saida`.
+
+    Roda dentro de um processo de trabalho; as mensagens das análises vão para
+    o log do manifesto. Retorna a linha do manifesto na tabela comparativa.
+    """
+    import analise_titanic
+    import lei_do_mar_titanic
+    from cli_comum import carregar_cubo
+
+    inicio = time.perf_counter()
+    base = os.path.join(diretorio_saida, nome)
+    with open(f"{base}.log", 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        # As colunas limpas ficam no cache mapeadas em memória (páginas compartilhadas pelo sistema),
+        # em vez de cada processo de trabalho manter sua própria cópia do DataFrame
+        cubo = carregar_cubo(arquivo, tamanho_bloco=tamanho_bloco, colunas_mapeadas=True)
+        geral = analise_titanic.estatisticas_do_cubo(cubo)
+        lei_do_mar = lei_do_mar_titanic.estatisticas_do_cubo(cubo)
+        salvar_json({'arquivo': arquivo, 'analise_geral': geral, 'lei_do_mar': lei_do_mar}, f"{base}.json")
+
+        if gerar_pdf:
+            from relatorio_pdf import gerar_relatorio
+            t = geral['tabelas']
+            tl = lei_do_mar['tabelas']
+            paginas = analise_titanic.paginas_analise_titanic(
+                t['sexo'], t['idade'], t['classe'], t['classe_sexo'], t['classe_idade']
+            ) + lei_do_mar_titanic.paginas_lei_do_mar(
+                tl['sexo_classe'], tl['faixa_etaria'], tl['faixa_etaria_sexo'], tl['botes_sexo'],
+                lei_do_mar['totais']['sobreviventes'], lei_do_mar['totais']['passageiros'],
+                tl['composicao_botes'], tl['composicao_bordos'],
+            )
+            nomes_png = [f"{base}_pagina_{i + 1}.png" for i in range(len(paginas))]
+            # O paralelismo já está no nível dos manifestos
+            gerar_relatorio(paginas, f"{base}.pdf", nomes_png, processos=1)
+
+    conclusoes = geral['conclusoes']
+    totais = lei_do_mar['totais']
+    linha = {
+        'passageiros': totais['passageiros'],
+        'sobreviventes': totais['sobreviventes'],
+        'taxa_geral': totais['sobreviventes'] / totais['passageiros'] * 100,
+        'taxa_mulheres': conclusoes['taxa_mulheres'],
+        'taxa_homens': conclusoes['taxa_homens'],
+        'razao_mulheres_homens': conclusoes['razao_mulheres_homens'],
+        'taxa_criancas': conclusoes['taxa_criancas'],
+        'taxa_adultos': conclusoes['taxa_adultos'],
+    }
+    for _, classe in geral['tabelas']['classe'].iterrows():
+        linha[f"taxa_classe_{int(classe['pclass'])}"] = classe['taxa_sobrevivencia']
+    linha.update({
+        'diferenca_classes': lei_do_mar['conclusoes']['diferenca_classes'],
+        'p_mulheres_homens': conclusoes['p_valores'].get('mulheres_homens'),
+        'p_criancas_adultos': conclusoes['p_valores'].get('criancas_adultos'),
+        'tempo_s': time.perf_counter() - inicio,
+    })
+    return linha
+
+
+def executar_lote(arquivos, diretorio_saida=DIRETORIO_SAIDA_PADRAO, processos=None, gerar_pdf=True,
+                  tamanho_bloco=None):
+    """Processa os manifestos em um pool de processos e grava a tabela comparativa.
+
+    Uma falha em um manifesto (arquivo inválido, erro na análise ou até a queda
+    de um processo de trabalho) não interrompe os demais: o manifesto aparece
+    na tabela com status 'erro' e a mensagem correspondente.
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    nomes = _nomes_saida(arquivos)
+    processos = max(1, min(processos or os.cpu_count() or 1, len(arquivos) or 1))
+
+    linhas = {}
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_processo) as executor:
+        futuros = {
+            executor.submit(processar_manifesto, arquivo, diretorio_saida, nomes[arquivo], gerar_pdf, tamanho_bloco): arquivo
+            for arquivo in arquivos
+        }
+        for futuro in as_completed(futuros):
+            arquivo = futuros[futuro]
+            try:
+                linha = {'status': 'ok', 'erro': None, **futuro.result()}
+                print(f"[ok] {arquivo} ({linha['tempo_s']:.1f} s)")
+            except BrokenProcessPool as e:
+                linha = {'status': 'erro', 'erro': f"processo de trabalho encerrado: {e}"}
+                print(f"[erro] {arquivo}: {linha['erro']}", file=sys.stderr)
+            except Exception as e:
+                linha = {'status': 'erro', 'erro': f"{type(e).__name__}: {e}"}
+                print(f"[erro] {arquivo}: {linha['erro']}", file=sys.stderr)
+                with open(os.path.join(diretorio_saida, f"{nomes[arquivo]}.erro.txt"), 'w', encoding='utf-8') as f:
+                    f.write(''.join(traceback.format_exception(e)))
+            linhas[arquivo] = {'arquivo': arquivo, 'saida': nomes[arquivo], **linha}
+
+    # Ordem das entradas, independentemente da ordem de término
+    comparacao = pd.DataFrame([linhas[arquivo] for arquivo in arquivos])
+    contagens = [c for c in ['passageiros', 'sobreviventes'] if c in comparacao.columns]
+    comparacao = comparacao.astype({c: 'Int64' for c in contagens})
+    comparacao.to_csv(os.path.join(diretorio_saida, 'comparacao.csv'), sep=';', decimal=',', index=False)
+    salvar_json(comparacao, os.path.join(diretorio_saida, 'comparacao.json'))
+    return comparacao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analisa vários manifestos em paralelo")
+    parser.add_argument('entradas', nargs='+',
+                        help="Arquivos CSV (comprimidos ou não), diretórios ou padrões glob (ex.: 'viagens/*.csv.gz')")
+    parser.add_argument('--saida', default=DIRETORIO_SAIDA_PADRAO, help="Diretório dos relatórios e resumos")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número máximo de manifestos processados ao mesmo tempo (padrão: número de CPUs)")
+    parser.add_argument('--tamanho-bloco', type=int, default=None,
+                        help="Lê cada CSV em blocos com este número de linhas")
+    parser.add_argument('--sem-pdf', action='store_true', help="Grava apenas os resumos JSON e a tabela comparativa")
+    args = parser.parse_args()
+
+    arquivos = encontrar_manifestos(args.entradas)
+    if not arquivos:
+        parser.error("nenhum manifesto encontrado")
+
+    comparacao = executar_lote(arquivos, args.saida, args.processos, not args.sem_pdf, args.tamanho_bloco)
+    colunas = [c for c in ['saida', 'status', 'passageiros', 'taxa_geral', 'taxa_mulheres', 'taxa_homens',
+                           'taxa_criancas', 'taxa_adultos', 'diferenca_classes'] if c in comparacao.columns]
+    print("\nComparação entre manifestos:")
+    print(comparacao[colunas].round(1).to_string(index=False))
+    print(f"\nResultados salvos em '{args.saida}' (comparacao.csv e comparacao.json)")
+
+    falhas = int((comparacao['status'] != 'ok').sum())
+    if falhas:
+        print(f"\n{falhas} de {len(comparacao)} manifestos falharam; veja a coluna 'erro'.", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,156 @@
+import math
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from cubo_sobrevivencia import DIMENSOES, obter_cubo
+from instrumentacao import instrumentar
+from intervalos import CONFIANCA_PADRAO
+
+# Covariáveis do modelo logístico e a categoria de referência de cada uma
+COVARIAVEIS_PADRAO = {
+    'sex': 'male',
+    'pclass': 1,
+    'categoria_idade': 'Adulto Jovem (19-35)',
+    'embarked': 'S',
+    'tamanho_familia': 'Sozinho (0)',
+}
+
+MAX_ITERACOES_PADRAO = 50
+TOLERANCIA_PADRAO = 1e-10
+
+_NORMAL = statistics.NormalDist()
+
+
+def delineamento_agregado(dados, covariaveis=None):
+    """Matriz de delineamento com uma linha por combinação observada das covariáveis.
+
+    As contagens vêm do cubo marginalizado nas covariáveis, que já é a
+    estatística suficiente do modelo: o tamanho da matriz depende do número de
+    células, não do de passageiros. Passageiros sem valor em alguma covariável
+    ficam de fora (casos completos). Cada covariável entra como indicadoras das
+    categorias diferentes da referência; categorias sem nenhum passageiro são
+    descartadas. Retorna (X, sobreviventes, totais, termos).
+    """
+    covariaveis = COVARIAVEIS_PADRAO if covariaveis is None else covariaveis
+    sobreviventes, totais = obter_cubo(dados).contagens(list(covariaveis))
+    celulas = np.nonzero(totais)
+
+    colunas = [np.ones(len(celulas[0]))]
+    termos = ['intercepto']
+    for eixo, (dimensao, referencia) in enumerate(covariaveis.items()):
+        if referencia not in DIMENSOES[dimensao]:
+            raise ValueError(f"Referência desconhecida para '{dimensao}': {referencia!r}")
+        for codigo, categoria in enumerate(DIMENSOES[dimensao]):
+            indicadora = (celulas[eixo] == codigo).astype(float)
+            if categoria != referencia and indicadora.any():
+                colunas.append(indicadora)
+                termos.append(f"{dimensao}={categoria}")
+
+    return np.column_stack(colunas), sobreviventes[celulas].astype(float), totais[celulas].astype(float), termos
+
+
+def _probabilidades(eta):
+    # Logística estável para |eta| grande (equivale a 1 / (1 + exp(-eta)))
+    return 0.5 * (1 + np.tanh(eta / 2))
+
+
+def _desvio(sucessos, totais, esperados):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        termos = (np.where(sucessos > 0, sucessos * np.log(sucessos / esperados), 0)
+                  + np.where(totais > sucessos, (totais - sucessos) * np.log((totais - sucessos) / (totais - esperados)), 0))
+    return float(2 * termos.sum())
+
+
+def ajustar_logistica(X, sucessos, totais, max_iteracoes=MAX_ITERACOES_PADRAO, tolerancia=TOLERANCIA_PADRAO):
+    """Regressão logística binomial agrupada por IRLS (Newton-Raphson), vetorizada em NumPy.
+
+    Cada linha de `X` é um grupo com `totais` tentativas e `sucessos` sucessos;
+    o resultado é o mesmo do ajuste linha a linha. Cada iteração resolve o
+    sistema X'WX passo = X'(y - n·p), com custo O(grupos × termos²).
+    """
+    taxa = sucessos.sum() / totais.sum()
+    beta = np.zeros(X.shape[1])
+    beta[0] = np.log(taxa / (1 - taxa))
+
+    convergiu = False
+    for iteracao in range(1, max_iteracoes + 1):
+        p = _probabilidades(X @ beta)
+        pesos = totais * p * (1 - p)
+        informacao = (X * pesos[:, None]).T @ X
+        try:
+            passo = np.linalg.solve(informacao, X.T @ (sucessos - totais * p))
+        except np.linalg.LinAlgError:
+            raise ValueError("Matriz de informação singular: há termos sem variação ou colineares") from None
+        beta += passo
+        if np.max(np.abs(passo)) < tolerancia:
+            convergiu = True
+            break
+
+    p = _probabilidades(X @ beta)
+    informacao = (X * (totais * p * (1 - p))[:, None]).T @ X
+    covariancia = np.linalg.inv(informacao)
+    return {
+        'coeficientes': beta,
+        'erros_padrao': np.sqrt(np.diag(covariancia)),
+        'covariancia': covariancia,
+        'iteracoes': iteracao,
+        'convergiu': convergiu,
+        'desvio': _desvio(sucessos, totais, totais * p),
+    }
+
+
+@instrumentar
+def ajustar_modelo_sobrevivencia(dados, covariaveis=None, confianca=CONFIANCA_PADRAO,
+                                 max_iteracoes=MAX_ITERACOES_PADRAO, tolerancia=TOLERANCIA_PADRAO):
+    """Modelo logístico de sobrevivência por sexo, faixa etária, classe, porto e tamanho da família.
+
+    `dados` pode ser o DataFrame limpo ou um cubo de sobrevivência. As razões
+    de chances de cada termo são ajustadas pelas demais covariáveis (em relação
+    às categorias de referência de `covariaveis`), com intervalos de Wald e
+    p-valores bilaterais.
+    """
+    covariaveis = COVARIAVEIS_PADRAO if covariaveis is None else covariaveis
+    cubo = obter_cubo(dados)
+    X, sobreviventes, totais, termos = delineamento_agregado(cubo, covariaveis)
+    ajuste = ajustar_logistica(X, sobreviventes, totais, max_iteracoes, tolerancia)
+
+    beta, erros = ajuste['coeficientes'], ajuste['erros_padrao']
+    z = _NORMAL.inv_cdf(0.5 + confianca / 2)
+    coeficientes = pd.DataFrame({
+        'termo': termos,
+        'coeficiente': beta,
+        'erro_padrao': erros,
+        'razao_chances': np.exp(beta),
+        'ic_inferior': np.exp(beta - z * erros),
+        'ic_superior': np.exp(beta + z * erros),
+        # erfc evita o cancelamento de 1 - cdf nas caudas, onde os p-valores são minúsculos
+        'p_valor': [math.erfc(abs(b / e) / math.sqrt(2)) for b, e in zip(beta, erros)],
+    })
+    n_passageiros = int(totais.sum())
+    return {
+        'coeficientes': coeficientes,
+        'referencias': dict(covariaveis),
+        'passageiros': n_passageiros,
+        'excluidos': cubo.total_registros - n_passageiros,
+        'celulas': len(totais),
+        'iteracoes': ajuste['iteracoes'],
+        'convergiu': ajuste['convergiu'],
+        'desvio': ajuste['desvio'],
+        'graus_liberdade': len(totais) - len(termos),
+    }
+
+
+def razao_chances(modelo, termo):
+    """Linha do termo (ex.: 'sex=female') com razão de chances, intervalo e p-valor, como dicionário."""
+    linhas = modelo['coeficientes'][modelo['coeficientes']['termo'] == termo]
+    if linhas.empty:
+        return None
+    linha = linhas.iloc[0]
+    return {
+        'razao_chances': float(linha['razao_chances']),
+        'ic_inferior': float(linha['ic_inferior']),
+        'ic_superior': float(linha['ic_superior']),
+        'p_valor': float(linha['p_valor']),
+    }
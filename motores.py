@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import time
+
+import numpy as np
+
+from carregador import (
+    ESQUEMA, LIMITES_FAIXAS_ETARIAS, LIMITES_TAMANHO_FAMILIA, REGEX_BOTE, VALORES_AUSENTES, carregar_dados,
+)
+from cubo_sobrevivencia import DIMENSOES, CuboSobrevivencia, construir_cubo, construir_cubo_em_blocos
+from imputacao import EQUIVALENCIAS_TITULOS, NIVEIS_IMPUTACAO, REGEX_TITULO, TITULOS
+from entrada import entrada_simples, tamanho_em_disco
+from instrumentacao import etapa
+from leitura_paralela import TAMANHO_BLOCO, construir_cubo_paralelo
+
+# Motores capazes de construir o cubo de sobrevivência a partir do CSV.
+# 'paralelo' divide o CSV em fatias agregadas pelo pandas em vários processos;
+# DuckDB e Polars são opcionais: leem o CSV e agregam as linhas com várias threads
+MOTORES = ('pandas', 'paralelo', 'duckdb', 'polars')
+
+# Motores que dependem de pacotes opcionais
+MOTORES_OPCIONAIS = ('duckdb', 'polars')
+
+# Ordem de preferência dos motores multithread no modo automático
+PREFERENCIA_AUTOMATICA = ('duckdb', 'polars', 'paralelo')
+
+# A partir deste tamanho de arquivo o modo automático troca o pandas por um motor multithread
+LIMIAR_AUTOMATICO_BYTES = 256 * 2**20
+
+
+def motores_disponiveis():
+    """Motores instalados neste ambiente (o pandas e o paralelo sempre estão)."""
+    return ['pandas', 'paralelo', *[m for m in MOTORES_OPCIONAIS if importlib.util.find_spec(m) is not None]]
+
+
+def escolher_motor(arquivo, motor='auto'):
+    """Resolve `motor='auto'`: pandas para arquivos pequenos, senão o primeiro motor multithread instalado.
+
+    Com um único núcleo, o motor paralelo não tem o que dividir, e arquivos
+    grandes sem DuckDB nem Polars continuam com o pandas. DuckDB e Polars só
+    leem um único CSV sem compressão; manifestos comprimidos ou em várias
+    partes ficam com o pandas ou o motor paralelo.
+    """
+    simples = entrada_simples(arquivo)
+    if motor != 'auto':
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconhecido: {motor!r} (use auto, {', '.join(MOTORES)})")
+        if motor not in motores_disponiveis():
+            raise ImportError(f"O motor '{motor}' não está instalado (pip install {motor})")
+        if motor in MOTORES_OPCIONAIS and not simples:
+            raise ValueError(f"O motor '{motor}' só lê um único CSV sem compressão (use pandas ou paralelo)")
+        return motor
+    if tamanho_em_disco(arquivo) < LIMIAR_AUTOMATICO_BYTES:
+        return 'pandas'
+    disponiveis = motores_disponiveis() if simples else ['pandas', 'paralelo']
+    if (os.cpu_count() or 1) < 2:
+        disponiveis.remove('paralelo')
+    return next((m for m in PREFERENCIA_AUTOMATICA if m in disponiveis), 'pandas')
+
+
+# As regras abaixo reproduzem, para as colunas do cubo, as de validar_e_converter
+# e de _valores_dimensao: categorias fora do esquema e idades negativas viram
+# ausentes, 'survived' ausente conta como 0, linhas totalmente vazias são
+# descartadas e 'pclass' inválido em qualquer outra linha é um erro. A idade é
+# comparada em float32, como no DataFrame, para que os limites coincidam; o
+# tamanho da família fica ausente se 'sibsp' ou 'parch' faltar ou for negativo.
+# As idades ausentes são imputadas como em imputar_idade: medianas (calculadas
+# em float64) de janelas sobre os grupos de NIVEIS_IMPUTACAO, do mais
+# específico ao mais geral. O bote é o primeiro citado em 'boat' (REGEX_BOTE),
+# como em normalizar_botes.
+
+def _sql_literal(valor):
+    return str(valor) if isinstance(valor, (int, np.integer)) else "'" + str(valor).replace("'", "''") + "'"
+
+
+def _sql_codigos():
+    idade = "idade_estimada"
+    codigos = {}
+    for dimensao, categorias in DIMENSOES.items():
+        if dimensao == 'is_child':
+            codigos[dimensao] = f"CASE WHEN {idade} IS NULL THEN 2 WHEN {idade} < 18 THEN 1 ELSE 0 END"
+        elif dimensao == 'categoria_idade':
+            faixas = ' '.join(
+                f"WHEN {idade} > {inferior} AND {idade} <= {superior} THEN {i}"
+                for i, (inferior, superior) in enumerate(zip(LIMITES_FAIXAS_ETARIAS, LIMITES_FAIXAS_ETARIAS[1:]))
+            )
+            codigos[dimensao] = f"CASE {faixas} ELSE {len(categorias)} END"
+        elif dimensao == 'tamanho_familia':
+            faixas = ' '.join(
+                f"WHEN familia <= {superior} THEN {i}" for i, superior in enumerate(LIMITES_TAMANHO_FAMILIA[1:-1])
+            )
+            codigos[dimensao] = f"CASE WHEN familia IS NULL THEN {len(categorias)} {faixas} ELSE {len(categorias) - 1} END"
+        elif dimensao == 'idade_imputada':
+            codigos[dimensao] = "CASE WHEN idade IS NULL AND idade_estimada IS NOT NULL THEN 1 ELSE 0 END"
+        else:
+            coluna = "pclass_int" if dimensao == 'pclass' else f'"{dimensao}"'
+            casos = ' '.join(f"WHEN {_sql_literal(c)} THEN {i}" for i, c in enumerate(categorias))
+            codigos[dimensao] = f"CASE {coluna} {casos} ELSE {len(categorias)} END"
+    return codigos
+
+
+def _sql_titulo(bruto):
+    """Título normalizado a partir do texto extraído pela expressão regular (coluna `bruto`)."""
+    mapeamento = {**{t: t for t in TITULOS}, **EQUIVALENCIAS_TITULOS}
+    casos = ' '.join(f"WHEN {bruto} = {_sql_literal(a)} THEN {_sql_literal(b)}" for a, b in mapeamento.items())
+    return f"CASE WHEN {bruto} IS NULL THEN NULL {casos} ELSE 'Outro' END"
+
+
+def _sql_medianas_idade():
+    """CTEs com a mediana de cada nível de imputação e o LEFT JOIN que as associa às linhas."""
+    colunas = {'titulo': 'titulo', 'pclass': 'pclass_int', 'sex': 'sexo'}
+    tabelas, juncoes, medianas = [], [], []
+    for i, nivel in enumerate(NIVEIS_IMPUTACAO):
+        chaves = [colunas[c] for c in nivel]
+        tabelas.append(
+            f"mediana_{i} AS (SELECT {', '.join(chaves)}, median(CAST(idade AS DOUBLE)) AS mediana FROM linhas "
+            f"WHERE {' AND '.join(f'{c} IS NOT NULL' for c in chaves)} GROUP BY ALL)"
+        )
+        juncoes.append(f"LEFT JOIN mediana_{i} ON {' AND '.join(f'linhas.{c} = mediana_{i}.{c}' for c in chaves)}")
+        medianas.append(f"mediana_{i}.mediana")
+    return ',\n'.join(tabelas), '\n'.join(juncoes), f"CAST(COALESCE({', '.join(medianas)}) AS FLOAT)"
+
+
+def _contagens_duckdb(arquivo):
+    import duckdb
+
+    nao_vazia = ' OR '.join(f'"{nome}" IS NOT NULL' for nome in ESQUEMA)
+    sexos = ', '.join(map(_sql_literal, DIMENSOES['sex']))
+    codigos = _sql_codigos()
+    tabelas_medianas, juncoes_medianas, mediana = _sql_medianas_idade()
+    consulta = f"""
+        WITH brutas AS (
+            SELECT *, NULLIF(regexp_extract(name, {_sql_literal(REGEX_TITULO)}, 1), '') AS titulo_bruto
+            FROM read_csv(?, delim=';', header=true, all_varchar=true, nullstr=?)
+            WHERE {nao_vazia}
+        ),
+        linhas AS MATERIALIZED (
+            SELECT
+                TRY_CAST(pclass AS TINYINT) AS pclass_int,
+                COALESCE(TRY_CAST(survived AS TINYINT), 0) <> 0 AS sobreviveu,
+                CASE WHEN TRY_CAST(replace(age, ',', '.') AS FLOAT) >= 0
+                    THEN TRY_CAST(replace(age, ',', '.') AS FLOAT) END AS idade,
+                (CASE WHEN TRY_CAST(sibsp AS TINYINT) >= 0 THEN TRY_CAST(sibsp AS TINYINT) END)
+                    + (CASE WHEN TRY_CAST(parch AS TINYINT) >= 0 THEN TRY_CAST(parch AS TINYINT) END) AS familia,
+                CASE WHEN sex IN ({sexos}) THEN sex END AS sexo,
+                {_sql_titulo('titulo_bruto')} AS titulo,
+                NULLIF(regexp_extract(upper(boat), {_sql_literal(REGEX_BOTE)}, 1), '') AS bote,
+                sex, embarked
+            FROM brutas
+        ),
+        {tabelas_medianas},
+        imputadas AS (
+            SELECT linhas.*, COALESCE(idade, {mediana}) AS idade_estimada
+            FROM linhas
+            {juncoes_medianas}
+        )
+        SELECT
+            {', '.join(f'{expressao} AS "{dimensao}"' for dimensao, expressao in codigos.items())},
+            count(*) AS total,
+            count(*) FILTER (WHERE sobreviveu) AS sobreviventes,
+            count(*) FILTER (WHERE pclass_int IS NULL OR pclass_int NOT IN (1, 2, 3)) AS classe_invalida
+        FROM imputadas
+        GROUP BY ALL
+    """
+    with duckdb.connect() as conexao:
+        resultado = conexao.execute(consulta, [arquivo, VALORES_AUSENTES]).fetchnumpy()
+    return resultado
+
+
+def _contagens_polars(arquivo):
+    import polars as pl
+
+    idade_csv = pl.col('age').str.replace(',', '.', literal=True).cast(pl.Float32, strict=False)
+    pclass = pl.col('pclass').cast(pl.Int8, strict=False)
+    sibsp, parch = (pl.col(c).cast(pl.Int8, strict=False).cast(pl.Int32) for c in ('sibsp', 'parch'))
+    familia = pl.when((sibsp >= 0) & (parch >= 0)).then(sibsp + parch)
+
+    titulo = pl.col('name').str.extract(REGEX_TITULO, 1).replace(EQUIVALENCIAS_TITULOS)
+    titulo = pl.when(titulo.is_in(TITULOS)).then(titulo).when(titulo.is_not_null()).then(pl.lit('Outro'))
+    # A idade observada e as chaves da imputação viram colunas antes das medianas
+    # por grupo, para que o título não seja extraído de novo em cada janela
+    colunas_imputacao = [
+        pl.when(idade_csv >= 0).then(idade_csv).alias('idade_observada'),
+        titulo.alias('titulo'),
+        pclass.alias('pclass_int'),
+        pl.when(pl.col('sex').is_in(DIMENSOES['sex'])).then(pl.col('sex')).alias('sexo'),
+        pl.col('boat').str.to_uppercase().str.extract(REGEX_BOTE, 1).alias('bote'),
+    ]
+    chaves = {'titulo': 'titulo', 'pclass': 'pclass_int', 'sex': 'sexo'}
+    observada = pl.col('idade_observada')
+    mediana = pl.coalesce([
+        pl.when(pl.all_horizontal([pl.col(chaves[c]).is_not_null() for c in nivel]))
+        .then(observada.cast(pl.Float64).median().over([chaves[c] for c in nivel]))
+        for nivel in NIVEIS_IMPUTACAO
+    ])
+    idade_estimada = pl.coalesce([observada, mediana.cast(pl.Float32)]).alias('idade_estimada')
+    idade = pl.col('idade_estimada')
+
+    codigos = {}
+    for dimensao, categorias in DIMENSOES.items():
+        if dimensao == 'is_child':
+            expressao = pl.when(idade.is_null()).then(2).when(idade < 18).then(1).otherwise(0)
+        elif dimensao == 'categoria_idade':
+            expressao = pl.lit(len(categorias))
+            for i, (inferior, superior) in reversed(list(enumerate(zip(LIMITES_FAIXAS_ETARIAS, LIMITES_FAIXAS_ETARIAS[1:])))):
+                expressao = pl.when((idade > inferior) & (idade <= superior)).then(i).otherwise(expressao)
+        elif dimensao == 'tamanho_familia':
+            expressao = pl.lit(len(categorias) - 1)
+            for i, superior in reversed(list(enumerate(LIMITES_TAMANHO_FAMILIA[1:-1]))):
+                expressao = pl.when(familia <= superior).then(i).otherwise(expressao)
+            expressao = pl.when(familia.is_null()).then(len(categorias)).otherwise(expressao)
+        elif dimensao == 'idade_imputada':
+            expressao = (observada.is_null() & idade.is_not_null()).cast(pl.Int32)
+        else:
+            coluna = pclass if dimensao == 'pclass' else pl.col(dimensao)
+            expressao = pl.lit(len(categorias))
+            for i, categoria in reversed(list(enumerate(categorias))):
+                expressao = pl.when(coluna == categoria).then(i).otherwise(expressao)
+        codigos[dimensao] = expressao.cast(pl.Int32).alias(dimensao)
+
+    sobreviveu = pl.col('survived').cast(pl.Int8, strict=False).fill_null(0) != 0
+    resultado = (
+        pl.scan_csv(arquivo, separator=';', infer_schema=False, null_values=VALORES_AUSENTES)
+        .filter(pl.any_horizontal([pl.col(nome).is_not_null() for nome in ESQUEMA]))
+        .with_columns(colunas_imputacao)
+        .with_columns(idade_estimada)
+        .group_by(list(codigos.values()))
+        .agg(
+            pl.len().alias('total'),
+            sobreviveu.sum().alias('sobreviventes'),
+            (pclass.is_null() | ~pclass.is_in([1, 2, 3])).sum().alias('classe_invalida'),
+        )
+        .collect()
+    )
+    return {nome: resultado[nome].to_numpy() for nome in resultado.columns}
+
+
+def _cubo_das_contagens(contagens):
+    invalidas = int(contagens['classe_invalida'].sum())
+    if invalidas:
+        raise ValueError(f"{invalidas} linhas sem valor válido na coluna obrigatória 'pclass'")
+
+    dimensoes = list(DIMENSOES)
+    formato = tuple(len(DIMENSOES[d]) + 1 for d in dimensoes)
+    celulas = np.ravel_multi_index([contagens[d].astype(np.intp) for d in dimensoes], formato)
+    tamanho = int(np.prod(formato))
+    totais = np.bincount(celulas, weights=contagens['total'], minlength=tamanho)
+    sobreviventes = np.bincount(celulas, weights=contagens['sobreviventes'], minlength=tamanho)
+    return CuboSobrevivencia(
+        dimensoes, sobreviventes.astype(np.int64).reshape(formato), totais.astype(np.int64).reshape(formato)
+    )
+
+
+def construir_cubo_csv(arquivo, motor='auto', tamanho_bloco=None, processos=None):
+    """Constrói o cubo de sobrevivência do CSV com o motor escolhido.
+
+    O pandas (padrão para arquivos pequenos) usa carregar_dados, ou a leitura em
+    blocos com `tamanho_bloco`; o motor paralelo faz o mesmo em fatias do arquivo,
+    uma por processo (veja leitura_paralela). DuckDB e Polars leem o CSV (';' e
+    vírgula decimal) diretamente, em várias threads, e devolvem só as contagens
+    por célula, com o mesmo resultado do pandas.
+    """
+    motor = escolher_motor(arquivo, motor)
+    if motor == 'pandas':
+        if tamanho_bloco:
+            return construir_cubo_em_blocos(arquivo, tamanho_bloco)
+        return construir_cubo(carregar_dados(arquivo))
+    if motor == 'paralelo':
+        return construir_cubo_paralelo(arquivo, processos=processos, tamanho_bloco=tamanho_bloco or TAMANHO_BLOCO)
+
+    print(f"Agregando {arquivo} com {motor}...")
+    with etapa(f'construir_cubo_{motor}') as info:
+        contagens = _contagens_duckdb(arquivo) if motor == 'duckdb' else _contagens_polars(arquivo)
+        cubo = _cubo_das_contagens(contagens)
+        info['linhas'] = cubo.total_registros
+    return cubo
+
+
+def verificar_motores(arquivo, motores=None):
+    """Constrói o cubo com cada motor e compara as contagens com as do pandas.
+
+    Devolve, para cada motor, o tempo gasto e se o cubo é idêntico ao de referência.
+    """
+    if motores is None:
+        motores = motores_disponiveis() if entrada_simples(arquivo) else ['paralelo']
+    motores = [m for m in motores if m != 'pandas']
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        referencia = construir_cubo(carregar_dados(arquivo, usar_cache=False))
+    resultados = {'pandas': {'tempo_s': time.perf_counter() - inicio, 'identico': True}}
+    for motor in motores:
+        inicio = time.perf_counter()
+        cubo = construir_cubo_csv(arquivo, motor)
+        resultados[motor] = {
+            'tempo_s': time.perf_counter() - inicio,
+            'identico': (cubo.dimensoes == referencia.dimensoes
+                         and np.array_equal(cubo.totais, referencia.totais)
+                         and np.array_equal(cubo.sobreviventes, referencia.sobreviventes)),
+        }
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o cubo de sobrevivência construído por cada motor")
+    parser.add_argument('arquivos', nargs='*', default=['titanic3.csv'],
+                        help="CSVs do manifesto (separados por ';'), comprimidos ou não, ou padrões glob das partes")
+    parser.add_argument('--motores', nargs='+', choices=MOTORES[1:], default=None,
+                        help="Motores a comparar com o pandas (padrão: todos os instalados)")
+    args = parser.parse_args()
+
+    print(f"Motores instalados: {', '.join(motores_disponiveis())}")
+    divergentes = 0
+    for arquivo in args.arquivos:
+        for motor, resultado in verificar_motores(arquivo, args.motores).items():
+            situacao = "idêntico ao pandas" if resultado['identico'] else "DIFERENTE do pandas"
+            divergentes += not resultado['identico']
+            print(f"{arquivo} [{motor}]: {resultado['tempo_s']:.3f} s, {situacao}")
+    if divergentes:
+        raise SystemExit(1)
@@ -0,0 +1,116 @@
+import numpy as np
+
+from cubo_sobrevivencia import categorias, obter_cubo
+from instrumentacao import instrumentar
+from intervalos import SEMENTE_PADRAO, gerador_aleatorio
+
+N_PERMUTACOES_PADRAO = 1_000_000
+
+# Permutações sorteadas por vez; limita a memória a O(bloco × estratos)
+TAMANHO_BLOCO_PADRAO = 250_000
+
+ALTERNATIVAS = ('maior', 'menor', 'bilateral')
+
+
+def _contagens_por_estrato(cubo, dimensao, grupo, estratos):
+    """Sobreviventes e totais do grupo e de todos (grupo + demais categorias) em cada estrato."""
+    grupo = list(grupo) if isinstance(grupo, (list, tuple, set)) else [grupo]
+    desconhecidos = [g for g in grupo if g not in categorias(dimensao)]
+    if desconhecidos:
+        raise ValueError(f"Categorias desconhecidas para '{dimensao}': {desconhecidos}")
+
+    sobreviventes, totais = cubo.contagens([dimensao, *estratos])
+    no_grupo = np.isin(categorias(dimensao), grupo)
+
+    # Achatar os estratos em um único eixo: (categorias da dimensão, estratos)
+    sobreviventes = sobreviventes.reshape(len(no_grupo), -1)
+    totais = totais.reshape(len(no_grupo), -1)
+    return (
+        sobreviventes[no_grupo].sum(axis=0), totais[no_grupo].sum(axis=0),
+        sobreviventes.sum(axis=0), totais.sum(axis=0),
+    )
+
+
+def teste_permutacao(dados, dimensao, grupo, estratos=(), alternativa='maior',
+                     n_permutacoes=N_PERMUTACOES_PADRAO, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                     semente=SEMENTE_PADRAO):
+    """Teste de permutação da taxa de sobrevivência de `grupo` contra as demais categorias de `dimensao`.
+
+    Embaralhar os rótulos de `dimensao` entre os passageiros (dentro de cada
+    estrato, se houver `estratos`) mantém fixos os totais de sobreviventes e de
+    membros do grupo; o número de sobreviventes que cai no grupo segue então uma
+    hipergeométrica. Cada bloco de permutações é um único sorteio vetorizado de
+    forma (bloco, estratos), sem materializar as linhas.
+
+    A estatística é a soma, entre estratos, dos sobreviventes do grupo (a mesma
+    do teste de Cochran-Mantel-Haenszel); sem estratos equivale à diferença de
+    taxas. `grupo` pode ser uma categoria ou uma lista delas. Linhas sem valor
+    em `dimensao` ou nos estratos ficam de fora.
+    """
+    if alternativa not in ALTERNATIVAS:
+        raise ValueError(f"Alternativa inválida: {alternativa!r} (use {', '.join(ALTERNATIVAS)})")
+
+    estratos = list(estratos)
+    sobrev_grupo, total_grupo, sobrev_todos, total_todos = _contagens_por_estrato(
+        obter_cubo(dados), dimensao, grupo, estratos
+    )
+
+    # Estratos em que só há um dos lados não trazem informação e são descartados
+    informativos = (total_grupo > 0) & (total_grupo < total_todos)
+    sobrev_grupo, total_grupo = sobrev_grupo[informativos], total_grupo[informativos]
+    sobrev_todos, total_todos = sobrev_todos[informativos], total_todos[informativos]
+    if not informativos.any():
+        raise ValueError(f"Nenhum estrato com passageiros dentro e fora do grupo {grupo!r}")
+
+    observado = int(sobrev_grupo.sum())
+    esperado = float((total_grupo * sobrev_todos / total_todos).sum())
+
+    rng = gerador_aleatorio(semente)
+    extremos = 0
+    restantes = n_permutacoes
+    while restantes > 0:
+        bloco = min(tamanho_bloco, restantes)
+        simulados = rng.hypergeometric(
+            sobrev_todos, total_todos - sobrev_todos, total_grupo, size=(bloco, len(total_grupo))
+        ).sum(axis=1)
+        if alternativa == 'maior':
+            extremos += int(np.count_nonzero(simulados >= observado))
+        elif alternativa == 'menor':
+            extremos += int(np.count_nonzero(simulados <= observado))
+        else:
+            extremos += int(np.count_nonzero(np.abs(simulados - esperado) >= abs(observado - esperado) - 1e-9))
+        restantes -= bloco
+
+    restantes_sobrev = sobrev_todos - sobrev_grupo
+    restantes_total = total_todos - total_grupo
+    return {
+        'dimensao': dimensao,
+        'grupo': grupo,
+        'estratos': estratos,
+        'alternativa': alternativa,
+        'taxa_grupo': sobrev_grupo.sum() / total_grupo.sum() * 100,
+        'taxa_demais': restantes_sobrev.sum() / restantes_total.sum() * 100,
+        'sobreviventes_grupo': observado,
+        'sobreviventes_esperados': esperado,
+        'n_permutacoes': n_permutacoes,
+        # A própria amostra observada conta como uma permutação (p nunca é zero)
+        'p_valor': (extremos + 1) / (n_permutacoes + 1),
+    }
+
+
+@instrumentar
+def resumo_testes(dados, n_permutacoes=N_PERMUTACOES_PADRAO, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                  semente=SEMENTE_PADRAO):
+    """Testes unilaterais das hipóteses da Lei do Mar: mulheres e crianças sobreviveram mais.
+
+    Cada hipótese é testada no manifesto inteiro e estratificada por classe.
+    """
+    cubo = obter_cubo(dados)
+    rng = gerador_aleatorio(semente)
+    opcoes = {'n_permutacoes': n_permutacoes, 'tamanho_bloco': tamanho_bloco, 'semente': rng}
+    return {
+        'mulheres_homens': teste_permutacao(cubo, 'sex', 'female', **opcoes),
+        'mulheres_homens_por_classe': teste_permutacao(cubo, 'sex', 'female', ['pclass'], **opcoes),
+        'criancas_adultos': teste_permutacao(cubo, 'is_child', True, **opcoes),
+        'criancas_adultos_por_classe': teste_permutacao(cubo, 'is_child', True, ['pclass'], **opcoes),
+    }
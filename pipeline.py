@@ -0,0 +1,398 @@
+import argparse
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+
+import analise_titanic
+import botes
+import cubo_sobrevivencia
+import intervalos
+import lei_do_mar_titanic
+import modelo_sobrevivencia
+import permutacoes
+from cache_dados import DIRETORIO_CACHE, hash_arquivo
+from carregador import carregar_dados
+from cubo_sobrevivencia import IDADES, construir_cubo, construir_cubo_em_blocos
+from indice_cubo import EXTENSAO_INDICE, carregar_indice
+from motores import MOTORES, construir_cubo_csv, escolher_motor
+import instrumentacao
+from instrumentacao import etapa
+
+# Resultados intermediários gravados em disco (um arquivo pickle por etapa e chave)
+DIRETORIO_ETAPAS = os.path.join(DIRETORIO_CACHE, 'etapas')
+
+DIRETORIO_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+RELATORIOS = ('analise', 'lei_do_mar')
+
+# Funções de apresentação, cujo código entra só na chave das figuras e seções que montam
+PREFIXOS_APRESENTACAO = ('plotar_', 'paginas_', 'secoes_html_')
+
+
+def versao_codigo(objetos):
+    """Hash do código-fonte de funções, módulos ou arquivos (caminhos relativos a este diretório)."""
+    h = hashlib.sha256()
+    for objeto in objetos:
+        if isinstance(objeto, str):
+            with open(os.path.join(DIRETORIO_CODIGO, objeto), 'rb') as f:
+                h.update(objeto.encode())
+                h.update(f.read())
+        else:
+            h.update(os.path.basename(inspect.getsourcefile(objeto)).encode())
+            h.update(inspect.getsource(objeto).encode())
+    return h.hexdigest()
+
+
+def funcoes_de_analise(modulo):
+    """Funções do módulo, exceto as de apresentação (desenho das figuras e montagem das páginas)."""
+    return [
+        funcao for nome, funcao in inspect.getmembers(modulo, inspect.isfunction)
+        if funcao.__module__ == modulo.__name__ and not nome.startswith(PREFIXOS_APRESENTACAO)
+    ]
+
+
+class Pipeline:
+    """Grafo de etapas com dependências explícitas e resultados memoizados.
+
+    A chave de cada etapa combina o nome, o código declarado, os parâmetros e
+    as chaves das dependências, de modo que pode ser calculada sem executar
+    nada: uma etapa encontrada na memória ou em disco dispensa todas as etapas
+    anteriores. Etapas com `persistir=False` ficam só na memória do processo.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_ETAPAS, persistir=True):
+        self.diretorio = diretorio
+        self.persistir = persistir
+        self.etapas = {}
+        self.valores = {}
+        self._chaves = {}
+        # Origem de cada etapa obtida: 'executada', 'memoria' ou 'disco'
+        self.origens = {}
+
+    def declarar(self, nome, funcao, dependencias=(), parametros=None, codigo=(), persistir=True):
+        """Registra uma etapa; `funcao` recebe os valores das dependências, na ordem, e os parâmetros."""
+        self.etapas[nome] = {
+            'funcao': funcao,
+            'dependencias': list(dependencias),
+            'parametros': parametros or {},
+            'codigo': versao_codigo([funcao, *codigo]),
+            'persistir': persistir,
+        }
+
+    def declarar_entrada(self, nome, valor, chave):
+        """Registra um valor pronto (ex.: o caminho do manifesto) identificado por `chave`."""
+        self.etapas[nome] = {'funcao': None, 'dependencias': [], 'parametros': {}, 'codigo': '', 'persistir': False}
+        self._chaves[nome] = hashlib.sha256(f"{nome}:{chave}".encode()).hexdigest()
+        self.valores[self._chaves[nome]] = valor
+
+    def chave(self, nome):
+        if nome not in self._chaves:
+            declarada = self.etapas[nome]
+            h = hashlib.sha256(nome.encode())
+            h.update(declarada['codigo'].encode())
+            h.update(json.dumps(declarada['parametros'], sort_keys=True, default=str).encode())
+            for dependencia in declarada['dependencias']:
+                h.update(self.chave(dependencia).encode())
+            self._chaves[nome] = h.hexdigest()
+        return self._chaves[nome]
+
+    def _arquivo(self, nome):
+        return os.path.join(self.diretorio, f"{nome.replace(':', '_')}-{self.chave(nome)[:32]}.pkl")
+
+    def _persistente(self, nome):
+        return self.persistir and self.etapas[nome]['persistir']
+
+    def disponivel(self, nome):
+        """Indica se o valor da etapa já está na memória ou em disco."""
+        if self.chave(nome) in self.valores:
+            return True
+        return self._persistente(nome) and os.path.exists(self._arquivo(nome))
+
+    def registrar(self, nome, valor):
+        """Guarda um valor calculado fora do pipeline (ex.: figuras renderizadas em um pool)."""
+        self.valores[self.chave(nome)] = valor
+        self.origens[nome] = 'executada'
+        if self._persistente(nome):
+            self._gravar(nome, valor)
+
+    def _gravar(self, nome, valor):
+        arquivo = self._arquivo(nome)
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            with open(arquivo + '.tmp', 'wb') as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(arquivo + '.tmp', arquivo)
+        except OSError as e:
+            print(f"Não foi possível gravar a etapa '{nome}' em {arquivo}: {e}")
+
+    def obter(self, nome):
+        """Valor da etapa, da memória, do disco ou executando-a (e, antes, as dependências que faltarem)."""
+        chave = self.chave(nome)
+        if chave in self.valores:
+            self.origens.setdefault(nome, 'memoria')
+            return self.valores[chave]
+
+        if self._persistente(nome) and os.path.exists(self._arquivo(nome)):
+            with open(self._arquivo(nome), 'rb') as f:
+                valor = pickle.load(f)
+            self.valores[chave] = valor
+            self.origens[nome] = 'disco'
+            return valor
+
+        declarada = self.etapas[nome]
+        argumentos = [self.obter(dependencia) for dependencia in declarada['dependencias']]
+        with etapa(f"pipeline:{nome}"):
+            valor = declarada['funcao'](*argumentos, **declarada['parametros'])
+        self.registrar(nome, valor)
+        return valor
+
+
+def _estatisticas_analise(cubo, idades='observadas'):
+    return analise_titanic.estatisticas_do_cubo(cubo.com_idades(idades))
+
+
+def _estatisticas_lei_do_mar(cubo, idades='observadas'):
+    return lei_do_mar_titanic.estatisticas_do_cubo(cubo.com_idades(idades))
+
+
+def _tabelas_analise(estatisticas):
+    t = estatisticas['tabelas']
+    return t['sexo'], t['idade'], t['classe'], t['classe_sexo'], t['classe_idade']
+
+
+def _tabelas_lei_do_mar(estatisticas):
+    t = estatisticas['tabelas']
+    totais = estatisticas['totais']
+    return (t['sexo_classe'], t['faixa_etaria'], t['faixa_etaria_sexo'], t['botes_sexo'],
+            totais['sobreviventes'], totais['passageiros'], t['composicao_botes'], t['composicao_bordos'])
+
+
+def _texto_conclusoes_analise(estatisticas):
+    texto = io.StringIO()
+    with contextlib.redirect_stdout(texto):
+        sexo, idade, _, classe_sexo, classe_idade = _tabelas_analise(estatisticas)
+        analise_titanic.gerar_conclusoes(
+            sexo, idade, classe_sexo, classe_idade,
+            intervalos=estatisticas['intervalos'], testes=estatisticas['testes']
+        )
+    return texto.getvalue()
+
+
+def _texto_conclusoes_lei_do_mar(estatisticas):
+    texto = io.StringIO()
+    with contextlib.redirect_stdout(texto):
+        lei_do_mar_titanic.conclusoes_lei_do_mar(
+            *_tabelas_lei_do_mar(estatisticas)[:4],
+            intervalos=estatisticas['intervalos'], testes=estatisticas['testes'], modelo=estatisticas['modelo'],
+            bordos=estatisticas['tabelas']['composicao_bordos']
+        )
+    return texto.getvalue()
+
+
+def _paginas_analise(estatisticas):
+    return analise_titanic.paginas_analise_titanic(*_tabelas_analise(estatisticas))
+
+
+def _paginas_lei_do_mar(estatisticas):
+    return lei_do_mar_titanic.paginas_lei_do_mar(*_tabelas_lei_do_mar(estatisticas))
+
+
+def _secoes_html_analise(estatisticas):
+    return analise_titanic.secoes_html_analise_titanic(*_tabelas_analise(estatisticas))
+
+
+def _secoes_html_lei_do_mar(estatisticas):
+    return lei_do_mar_titanic.secoes_html_lei_do_mar(*_tabelas_lei_do_mar(estatisticas))
+
+
+def _renderizar_figura(paginas, indice):
+    from relatorio_pdf import renderizar_pagina
+    funcao, argumentos = paginas[indice]
+    return renderizar_pagina(funcao, argumentos)
+
+
+def _gravar_pdf(*imagens, saida):
+    from relatorio_pdf import gravar_relatorio
+    base = os.path.splitext(saida)[0]
+    gravar_relatorio(list(imagens), saida, [f"{base}_pagina_{i + 1}.png" for i in range(len(imagens))])
+    return saida
+
+
+def _gravar_html(secoes, texto_conclusoes, estatisticas, titulo, saida):
+    from relatorio_html import gerar_relatorio_html
+    base = os.path.splitext(saida)[0]
+    gerar_relatorio_html(titulo, secoes, saida, texto_conclusoes, estatisticas, f"{base}.json")
+    return saida
+
+
+# Para cada relatório: funções que montam estatísticas, texto, páginas e seções,
+# título e nome base das saídas (os mesmos dos scripts)
+_RELATORIOS = {
+    'analise': {
+        'modulo': analise_titanic,
+        'estatisticas': _estatisticas_analise,
+        'texto': _texto_conclusoes_analise,
+        'paginas': _paginas_analise,
+        'funcao_paginas': analise_titanic.paginas_analise_titanic,
+        'secoes': _secoes_html_analise,
+        'funcao_secoes': analise_titanic.secoes_html_analise_titanic,
+        'titulo': 'Análise de Sobrevivência do Titanic',
+        'saida': 'analise_titanic',
+    },
+    'lei_do_mar': {
+        'modulo': lei_do_mar_titanic,
+        'estatisticas': _estatisticas_lei_do_mar,
+        'texto': _texto_conclusoes_lei_do_mar,
+        'paginas': _paginas_lei_do_mar,
+        'funcao_paginas': lei_do_mar_titanic.paginas_lei_do_mar,
+        'secoes': _secoes_html_lei_do_mar,
+        'funcao_secoes': lei_do_mar_titanic.secoes_html_lei_do_mar,
+        'titulo': 'Análise da Lei do Mar no Titanic',
+        'saida': 'lei_do_mar_titanic',
+    },
+}
+
+
+def funcoes_das_paginas(funcao_paginas):
+    """Função de desenho de cada página, na ordem do relatório.
+
+    paginas_* apenas monta os pares (função, argumentos), então pode ser chamada
+    sem as tabelas; assim a chave de cada figura é conhecida antes de calculá-las.
+    """
+    n_argumentos = len(inspect.signature(funcao_paginas).parameters)
+    return [funcao for funcao, _ in funcao_paginas(*[None] * n_argumentos)]
+
+
+def montar_pipeline(arquivo, tamanho_bloco=None, diretorio=DIRETORIO_ETAPAS, persistir=True,
+                    diretorio_saida='.', motor='auto', idades='observadas'):
+    """Declara as etapas dos dois relatórios sobre um único carregamento e um único cubo.
+
+    Etapas: 'dados' (leitura, validação e colunas derivadas), 'cubo' (todas as
+    agregações), 'estatisticas:<relatorio>' (tabelas, intervalos, testes e
+    conclusões), 'conclusoes:<relatorio>' (texto), 'figura:<relatorio>:<funcao>'
+    (PNG de cada página), 'pdf:<relatorio>' e 'html:<relatorio>'. A entrada é
+    identificada pelo hash do conteúdo do arquivo. O cubo guarda as idades
+    observadas e as imputadas; `idades` só entra na chave das estatísticas.
+    """
+    pipe = Pipeline(diretorio, persistir)
+    pipe.declarar_entrada('arquivo', arquivo, hash_arquivo(arquivo))
+
+    # O DataFrame já tem o cache colunar de carregar_dados; aqui fica só na memória
+    pipe.declarar('dados', carregar_dados, ['arquivo'], codigo=['carregador.py', 'imputacao.py', 'cache_dados.py'],
+                  persistir=False)
+    if arquivo.endswith(EXTENSAO_INDICE):
+        pipe.declarar('cubo', carregar_indice, ['arquivo'], codigo=['indice_cubo.py', cubo_sobrevivencia])
+    elif escolher_motor(arquivo, motor) != 'pandas':
+        pipe.declarar('cubo', construir_cubo_csv, ['arquivo'], {'motor': escolher_motor(arquivo, motor)},
+                      codigo=['motores.py', 'leitura_paralela.py', 'carregador.py', 'imputacao.py', cubo_sobrevivencia])
+    elif tamanho_bloco:
+        pipe.declarar('cubo', construir_cubo_em_blocos, ['arquivo'], {'tamanho_bloco': tamanho_bloco},
+                      codigo=['carregador.py', 'imputacao.py', cubo_sobrevivencia])
+    else:
+        pipe.declarar('cubo', construir_cubo, ['dados'], codigo=[cubo_sobrevivencia])
+
+    for nome, relatorio in _RELATORIOS.items():
+        codigo_analise = [*funcoes_de_analise(relatorio['modulo']), intervalos, permutacoes, modelo_sobrevivencia, botes,
+                          cubo_sobrevivencia, 'cli_comum.py']
+        pipe.declarar(f'estatisticas:{nome}', relatorio['estatisticas'], ['cubo'], {'idades': idades},
+                      codigo=codigo_analise)
+        pipe.declarar(f'conclusoes:{nome}', relatorio['texto'], [f'estatisticas:{nome}'], codigo=codigo_analise)
+
+        # Cada figura depende do próprio código de desenho, do estilo e da rasterização
+        pipe.declarar(f'paginas:{nome}', relatorio['paginas'], [f'estatisticas:{nome}'],
+                      codigo=[relatorio['funcao_paginas']], persistir=False)
+        figuras = []
+        for indice, funcao in enumerate(funcoes_das_paginas(relatorio['funcao_paginas'])):
+            figura = f'figura:{nome}:{funcao.__name__}'
+            pipe.declarar(figura, _renderizar_figura, [f'paginas:{nome}'], {'indice': indice},
+                          codigo=[funcao, 'graficos.py', 'relatorio_pdf.py'])
+            figuras.append(figura)
+
+        saida = os.path.join(diretorio_saida, relatorio['saida'])
+        # As saídas são arquivos: sempre regravadas, mas só a partir das etapas memoizadas
+        pipe.declarar(f'pdf:{nome}', _gravar_pdf, figuras, {'saida': f"{saida}.pdf"}, persistir=False)
+        pipe.declarar(f'secoes_html:{nome}', relatorio['secoes'], [f'estatisticas:{nome}'],
+                      codigo=[relatorio['funcao_secoes'], 'relatorio_html.py'], persistir=False)
+        pipe.declarar(f'html:{nome}', _gravar_html,
+                      [f'secoes_html:{nome}', f'conclusoes:{nome}', f'estatisticas:{nome}'],
+                      {'titulo': relatorio['titulo'], 'saida': f"{saida}.html"}, persistir=False)
+    return pipe
+
+
+def _renderizar_pendentes(pipe, figuras, processos):
+    # Figuras que faltam (de todos os relatórios) são renderizadas juntas no pool de processos
+    pendentes = [figura for figura in figuras if not pipe.disponivel(figura)]
+    if not pendentes:
+        return
+    from relatorio_pdf import renderizar_paginas
+    paginas = [pipe.obter(pipe.etapas[f]['dependencias'][0])[pipe.etapas[f]['parametros']['indice']]
+               for f in pendentes]
+    with etapa('pipeline:figuras'):
+        for figura, png in zip(pendentes, renderizar_paginas(paginas, processos)):
+            pipe.registrar(figura, png)
+
+
+def executar(arquivo, relatorios=RELATORIOS, formato='pdf', processos=None, tamanho_bloco=None,
+             persistir=True, diretorio_saida='.', motor='auto', idades='observadas'):
+    """Gera os relatórios pedidos carregando e agregando o manifesto no máximo uma vez."""
+    pipe = montar_pipeline(arquivo, tamanho_bloco, persistir=persistir, diretorio_saida=diretorio_saida,
+                           motor=motor, idades=idades)
+    for nome in relatorios:
+        print(pipe.obter(f'conclusoes:{nome}'), end='')
+
+    if formato == 'pdf':
+        figuras = [f for nome in relatorios for f in pipe.etapas[f'pdf:{nome}']['dependencias']]
+        _renderizar_pendentes(pipe, figuras, processos)
+    for nome in relatorios:
+        pipe.obter(f'{formato}:{nome}')
+    return pipe
+
+
+def resumo_origens(pipe):
+    """Etapas agrupadas por origem do valor: executadas, da memória ou do disco."""
+    resumo = {'executada': [], 'memoria': [], 'disco': []}
+    for nome, origem in pipe.origens.items():
+        if nome != 'arquivo':
+            resumo[origem].append(nome)
+    return resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os relatórios do Titanic em um único pipeline de etapas memoizadas")
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, padrão glob das partes "
+                             "ou índice .cubo.npz")
+    parser.add_argument('--relatorios', nargs='+', choices=RELATORIOS, default=list(RELATORIOS),
+                        help="Relatórios a gerar (padrão: ambos)")
+    parser.add_argument('--formato', choices=['pdf', 'html'], default='pdf',
+                        help="Relatórios em PDF (matplotlib) ou em HTML com gráficos SVG e os dados em JSON")
+    parser.add_argument('--tamanho-bloco', type=int, default=None,
+                        help="Lê o CSV em blocos com este número de linhas (para manifestos maiores que a memória)")
+    parser.add_argument('--motor', choices=['auto', *MOTORES], default='auto',
+                        help="Quem lê e agrega o CSV; 'auto' usa DuckDB ou Polars (se instalados) "
+                             "ou o motor paralelo em arquivos grandes e o pandas nos demais")
+    parser.add_argument('--idades', choices=IDADES, default='observadas',
+                        help="Faixas etárias só com as idades observadas ou também com as imputadas "
+                             "pela mediana de (título, classe, sexo)")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número de processos para renderizar as figuras (1 = sem paralelismo)")
+    parser.add_argument('--sem-cache-disco', action='store_true',
+                        help=f"Memoiza as etapas só durante esta execução, sem ler nem gravar {DIRETORIO_ETAPAS}")
+    parser.add_argument('--instrumentar', action='store_true',
+                        help="Mede tempo, CPU e memória de cada etapa e grava em JSON e Chrome trace "
+                             f"(também ativado por {instrumentacao.VARIAVEL_AMBIENTE}=1)")
+    args = parser.parse_args()
+    if args.instrumentar:
+        instrumentacao.ativar()
+
+    pipe = executar(args.arquivo, args.relatorios, args.formato, args.processos, args.tamanho_bloco,
+                    persistir=not args.sem_cache_disco, motor=args.motor, idades=args.idades)
+
+    resumo = resumo_origens(pipe)
+    print(f"\nEtapas executadas ({len(resumo['executada'])}): {', '.join(resumo['executada']) or '-'}")
+    print(f"Etapas reaproveitadas do disco ({len(resumo['disco'])}): {', '.join(resumo['disco']) or '-'}")
+    instrumentacao.finalizar('pipeline')
@@ -0,0 +1,228 @@
+import html
+import math
+import os
+
+from instrumentacao import etapa
+from resultados import salvar_json
+
+# Este módulo não importa matplotlib: os gráficos são SVG montados como texto
+# diretamente a partir das tabelas agregadas
+
+# Dimensões de cada gráfico, em pixels
+LARGURA = 640
+ALTURA = 360
+MARGEM_ESQUERDA = 56
+MARGEM_DIREITA = 16
+MARGEM_TOPO = 40
+MARGEM_BASE = 56
+
+ESTILO = """
+body { font-family: Helvetica, Arial, sans-serif; margin: 2em auto; max-width: 720px; color: #222; }
+h1 { font-size: 1.6em; }
+h2 { font-size: 1.2em; margin-top: 2em; }
+table { border-collapse: collapse; font-size: 0.9em; margin: 0.5em 0 1em; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.6em; text-align: right; }
+th { background: #f2f2f2; }
+pre { background: #f7f7f7; padding: 1em; white-space: pre-wrap; font-size: 0.85em; }
+svg text { font-family: Helvetica, Arial, sans-serif; }
+"""
+
+
+def _num(valor):
+    return f"{valor:.1f}".rstrip('0').rstrip('.')
+
+
+def _passo_eixo(maximo, marcas=6):
+    """Passo 1, 2 ou 5 × 10^k que divide [0, maximo] em no máximo `marcas` intervalos."""
+    bruto = maximo / marcas
+    escala = 10 ** math.floor(math.log10(bruto))
+    for fator in (1, 2, 5, 10):
+        if fator * escala >= bruto:
+            return fator * escala
+    return 10 * escala
+
+
+def grafico_barras(titulo, categorias, series, rotulo_x='', rotulo_y='Taxa de Sobrevivência (%)'):
+    """SVG de barras agrupadas, com o valor (em %) anotado sobre cada barra.
+
+    `series` é uma lista de (nome, valores, cor), com um valor por categoria;
+    `cor` também pode ser uma lista, com uma cor por categoria. Valores ausentes
+    (None ou NaN) ficam sem barra. Com mais de uma série, uma legenda com os
+    nomes é desenhada no canto superior direito.
+    """
+    categorias = [str(c) for c in categorias]
+    validos = [v for _, valores, _ in series for v in valores if v is not None and not math.isnan(v)]
+    maximo = max(validos, default=0) * 1.15 or 1
+    passo = _passo_eixo(maximo)
+    topo = math.ceil(maximo / passo) * passo
+
+    x0, x1 = MARGEM_ESQUERDA, LARGURA - MARGEM_DIREITA
+    y0, y1 = ALTURA - MARGEM_BASE, MARGEM_TOPO
+    largura_grupo = (x1 - x0) / max(len(categorias), 1)
+    largura_barra = largura_grupo * 0.8 / max(len(series), 1)
+    # Rótulos longos demais para a largura do grupo são inclinados
+    inclinar = max((len(c) for c in categorias), default=0) * 7 > largura_grupo
+
+    def y(valor):
+        return y0 - (y0 - y1) * valor / topo
+
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{LARGURA}" height="{ALTURA}" '
+        f'viewBox="0 0 {LARGURA} {ALTURA}" role="img">',
+        f'<title>{html.escape(titulo)}</title>',
+        f'<text x="{LARGURA / 2}" y="22" text-anchor="middle" font-size="15">{html.escape(titulo)}</text>',
+    ]
+    marca = 0
+    while marca <= topo + 1e-9:
+        partes.append(f'<line x1="{x0}" x2="{x1}" y1="{y(marca):.1f}" y2="{y(marca):.1f}" stroke="#e5e5e5"/>')
+        partes.append(f'<text x="{x0 - 6}" y="{y(marca) + 4:.1f}" text-anchor="end" font-size="11">{_num(marca)}</text>')
+        marca += passo
+
+    for i, categoria in enumerate(categorias):
+        inicio_grupo = x0 + i * largura_grupo + largura_grupo * 0.1
+        for j, (nome, valores, cor) in enumerate(series):
+            valor = valores[i]
+            if valor is None or math.isnan(valor):
+                continue
+            x = inicio_grupo + j * largura_barra
+            if isinstance(cor, (list, tuple)):
+                cor = cor[i % len(cor)]
+            partes.append(
+                f'<rect x="{x:.1f}" y="{y(valor):.1f}" width="{largura_barra:.1f}" height="{y0 - y(valor):.1f}" '
+                f'fill="{cor}"><title>{html.escape(f"{categoria} · {nome}" if nome else categoria)}: '
+                f'{valor:.1f}%</title></rect>'
+            )
+            partes.append(
+                f'<text x="{x + largura_barra / 2:.1f}" y="{y(valor) - 4:.1f}" text-anchor="middle" '
+                f'font-size="11">{valor:.1f}%</text>'
+            )
+        centro = x0 + (i + 0.5) * largura_grupo
+        if inclinar:
+            partes.append(
+                f'<text x="{centro:.1f}" y="{y0 + 14}" text-anchor="end" font-size="11" '
+                f'transform="rotate(-30 {centro:.1f} {y0 + 14})">{html.escape(categoria)}</text>'
+            )
+        else:
+            partes.append(
+                f'<text x="{centro:.1f}" y="{y0 + 16}" text-anchor="middle" font-size="12">{html.escape(categoria)}</text>'
+            )
+
+    partes.append(f'<line x1="{x0}" x2="{x1}" y1="{y0}" y2="{y0}" stroke="#333"/>')
+    partes.append(f'<line x1="{x0}" x2="{x0}" y1="{y0}" y2="{y1}" stroke="#333"/>')
+    if rotulo_x and not inclinar:
+        partes.append(f'<text x="{(x0 + x1) / 2}" y="{ALTURA - 12}" text-anchor="middle" font-size="12">'
+                      f'{html.escape(rotulo_x)}</text>')
+    partes.append(f'<text x="14" y="{(y0 + y1) / 2}" text-anchor="middle" font-size="12" '
+                  f'transform="rotate(-90 14 {(y0 + y1) / 2})">{html.escape(rotulo_y)}</text>')
+
+    if len(series) > 1:
+        for j, (nome, _, cor) in enumerate(series):
+            ly = MARGEM_TOPO + j * 18
+            partes.append(f'<rect x="{x1 - 130}" y="{ly}" width="12" height="12" fill="{cor}"/>')
+            partes.append(f'<text x="{x1 - 112}" y="{ly + 10}" font-size="12">{html.escape(str(nome))}</text>')
+
+    partes.append('</svg>')
+    return '\n'.join(partes)
+
+
+def barras_da_tabela(titulo, tabela, x, y, cores, grupo=None, nomes=None, rotulo_x='',
+                     rotulo_y='Taxa de Sobrevivência (%)'):
+    """Gráfico de barras de uma tabela agregada, com uma linha por barra (como o sns.barplot).
+
+    Sem `grupo`, cada categoria de `x` recebe a cor seguinte de `cores`; com
+    `grupo`, cada valor dele vira uma série. `nomes` traduz categorias e
+    grupos para os rótulos exibidos.
+    """
+    nomes = nomes or {}
+    categorias = list(dict.fromkeys(tabela[x]))
+    if grupo is None:
+        series = [('', tabela.set_index(x)[y].reindex(categorias).tolist(), list(cores))]
+    else:
+        pivo = tabela.pivot(index=x, columns=grupo, values=y).reindex(categorias)
+        grupos = list(dict.fromkeys(tabela[grupo]))
+        series = [(nomes.get(g, g), pivo[g].tolist(), cor) for g, cor in zip(grupos, cores)]
+    return grafico_barras(titulo, [nomes.get(c, c) for c in categorias], series, rotulo_x, rotulo_y)
+
+
+def grafico_pizza(titulo, rotulos, valores, cores):
+    """SVG de pizza com o percentual de cada fatia no rótulo."""
+    total = sum(valores)
+    cx, cy, raio = LARGURA / 2, (ALTURA + MARGEM_TOPO) / 2, (ALTURA - MARGEM_TOPO) / 2 - 30
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{LARGURA}" height="{ALTURA}" '
+        f'viewBox="0 0 {LARGURA} {ALTURA}" role="img">',
+        f'<title>{html.escape(titulo)}</title>',
+        f'<text x="{LARGURA / 2}" y="22" text-anchor="middle" font-size="15">{html.escape(titulo)}</text>',
+    ]
+    angulo = 0.0
+    for rotulo, valor, cor in zip(rotulos, valores, cores):
+        fracao = valor / total if total else 0
+        if fracao >= 1:
+            partes.append(f'<circle cx="{cx}" cy="{cy}" r="{raio}" fill="{cor}"/>')
+        elif fracao > 0:
+            # Ângulos medidos a partir do topo, no sentido horário
+            fim = angulo + fracao * 2 * math.pi
+            xa, ya = cx + raio * math.sin(angulo), cy - raio * math.cos(angulo)
+            xb, yb = cx + raio * math.sin(fim), cy - raio * math.cos(fim)
+            partes.append(
+                f'<path d="M{cx},{cy} L{xa:.1f},{ya:.1f} A{raio},{raio} 0 {int(fracao > 0.5)} 1 {xb:.1f},{yb:.1f} Z" '
+                f'fill="{cor}" stroke="#fff"><title>{html.escape(rotulo)}: {valor}</title></path>'
+            )
+        meio = angulo + fracao * math.pi
+        tx, ty = cx + raio * 0.6 * math.sin(meio), cy - raio * 0.6 * math.cos(meio)
+        partes.append(f'<text x="{tx:.1f}" y="{ty:.1f}" text-anchor="middle" font-size="13">{fracao * 100:.1f}%</text>')
+        lx, ly = cx + (raio + 16) * math.sin(meio), cy - (raio + 16) * math.cos(meio)
+        ancora = 'start' if math.sin(meio) > 0.05 else 'end' if math.sin(meio) < -0.05 else 'middle'
+        partes.append(f'<text x="{lx:.1f}" y="{ly:.1f}" text-anchor="{ancora}" font-size="12">{html.escape(rotulo)}</text>')
+        angulo += fracao * 2 * math.pi
+    partes.append('</svg>')
+    return '\n'.join(partes)
+
+
+def tabela_html(tabela, casas=1):
+    """Tabela HTML de um DataFrame, com números de ponto flutuante arredondados."""
+    return tabela.to_html(index=False, float_format=lambda v: f"{v:.{casas}f}", na_rep='—', border=0)
+
+
+def gerar_relatorio_html(titulo, secoes, output_html, texto_conclusoes='', dados=None, output_json=None):
+    """Grava um relatório HTML autocontido e, opcionalmente, o JSON com todos os dados.
+
+    Cada seção é um trio (título, svg, tabela); o SVG e a tabela (DataFrame)
+    podem ser None. `texto_conclusoes` é exibido como texto pré-formatado no
+    fim do relatório, e `dados` é gravado em `output_json` via salvar_json.
+    """
+    with etapa('escrever_html'):
+        partes = [
+            '<!DOCTYPE html>',
+            '<html lang="pt-BR">',
+            '<head>',
+            '<meta charset="utf-8">',
+            f'<title>{html.escape(titulo)}</title>',
+            f'<style>{ESTILO}</style>',
+            '</head>',
+            '<body>',
+            f'<h1>{html.escape(titulo)}</h1>',
+        ]
+        for titulo_secao, svg, tabela in secoes:
+            partes.append(f'<h2>{html.escape(titulo_secao)}</h2>')
+            if svg is not None:
+                partes.append(svg)
+            if tabela is not None:
+                partes.append(tabela_html(tabela))
+        if texto_conclusoes:
+            partes.append('<h2>Conclusões</h2>')
+            partes.append(f'<pre>{html.escape(texto_conclusoes.strip())}</pre>')
+        if output_json:
+            # O JSON é gravado ao lado do HTML, então o link é relativo
+            nome_json = html.escape(os.path.basename(output_json))
+            partes.append(f'<p>Dados completos em <a href="{nome_json}">{nome_json}</a>.</p>')
+        partes += ['</body>', '</html>']
+
+        with open(output_html, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(partes))
+
+    if dados is not None and output_json:
+        with etapa('escrever_json'):
+            salvar_json(dados, output_json)
+    destino = f"'{output_html}' e '{output_json}'" if dados is not None and output_json else f"'{output_html}'"
+    print(f"\nAnálise concluída. Os resultados foram salvos em {destino}")
@@ -0,0 +1,105 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.image
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from instrumentacao import coletar, etapa, incorporar
+
+# Resolução usada para rasterizar cada página nos processos de trabalho
+DPI_PADRAO = 150
+
+
+def renderizar_pagina(funcao, argumentos, dpi=DPI_PADRAO):
+    """Cria a figura de uma página, rasteriza em PNG e libera a figura imediatamente."""
+    with etapa(f"figura:{funcao.__name__}"):
+        with etapa('desenhar'):
+            fig = funcao(*argumentos)
+        try:
+            with etapa('rasterizar_png'):
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format='png', dpi=dpi)
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+
+def _renderizar_pagina(pagina, dpi):
+    # Devolve também as etapas medidas neste processo, para juntá-las às do processo principal
+    inicio = len(coletar())
+    funcao, argumentos = pagina
+    png = renderizar_pagina(funcao, argumentos, dpi)
+    return png, coletar(inicio)
+
+
+def renderizar_paginas(paginas, processos=None, dpi=DPI_PADRAO):
+    """Gera o PNG de cada página, na ordem de `paginas`.
+
+    Cada página é um par (função, argumentos) em que a função devolve uma figura;
+    ambos precisam ser serializáveis para rodar em outro processo. Como o
+    matplotlib não é thread-safe, o paralelismo é feito com processos.
+    """
+    if processos == 1 or len(paginas) <= 1:
+        for funcao, argumentos in paginas:
+            yield renderizar_pagina(funcao, argumentos, dpi)
+        return
+
+    processos = min(processos or os.cpu_count() or 1, len(paginas))
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        # map devolve os resultados na ordem de submissão, mesmo que terminem fora de ordem
+        for png, registros in executor.map(_renderizar_pagina, paginas, [dpi] * len(paginas)):
+            incorporar(registros)
+            yield png
+
+
+def _pagina_pdf(png, dpi):
+    imagem = matplotlib.image.imread(io.BytesIO(png), format='png')
+    altura, largura = imagem.shape[:2]
+    fig = plt.figure(figsize=(largura / dpi, altura / dpi), dpi=dpi)
+    fig.figimage(imagem, resize=False)
+    return fig
+
+
+def _gravar_pdf(imagens, output_pdf, nomes_png, dpi, restantes):
+    gravadas = []
+    try:
+        # O tempo desta etapa inclui a espera pelas páginas renderizadas nos processos
+        with etapa('escrever_pdf'), PdfPages(output_pdf) as pdf:
+            for png in imagens:
+                gravadas.append(png)
+                with etapa('pdf_savefig'):
+                    fig = _pagina_pdf(png, dpi)
+                    pdf.savefig(fig)
+                    plt.close(fig)
+
+        print(f"\nAnálise concluída. Os resultados foram salvos em '{output_pdf}'")
+    except Exception as e:
+        print(f"\nErro ao salvar o PDF: {e}")
+        print("Tentando salvar as figuras individualmente como arquivos PNG...")
+
+        # Plano B: gravar os PNGs já rasterizados e obter os que faltarem
+        for nome_arquivo, png in zip(nomes_png, [*gravadas, *restantes(len(gravadas))]):
+            with open(nome_arquivo, 'wb') as f:
+                f.write(png)
+            print(f"Figura salva como {nome_arquivo}")
+
+        print("Figuras salvas como arquivos PNG separados.")
+
+
+def gerar_relatorio(paginas, output_pdf, nomes_png, processos=None, dpi=DPI_PADRAO):
+    """Renderiza as páginas em paralelo e as grava no PDF em ordem fixa.
+
+    Se o PDF não puder ser gravado, as páginas já rasterizadas são salvas como
+    arquivos PNG individuais com os nomes em `nomes_png`.
+    """
+    _gravar_pdf(
+        renderizar_paginas(paginas, processos, dpi), output_pdf, nomes_png, dpi,
+        lambda feitas: renderizar_paginas(paginas[feitas:], processos, dpi),
+    )
+
+
+def gravar_relatorio(imagens, output_pdf, nomes_png, dpi=DPI_PADRAO):
+    """Grava no PDF páginas já rasterizadas (PNG), com o mesmo plano B de gerar_relatorio."""
+    _gravar_pdf(imagens, output_pdf, nomes_png, dpi, lambda feitas: imagens[feitas:])
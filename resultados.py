@@ -0,0 +1,28 @@
+import json
+
+import pandas as pd
+
+
+def tabela_para_registros(tabela):
+    """Converte um DataFrame em lista de dicionários com tipos nativos do Python."""
+    return json.loads(tabela.to_json(orient='records', force_ascii=False))
+
+
+def para_json(resultado):
+    """Converte recursivamente tabelas e escalares NumPy em estruturas serializáveis."""
+    if isinstance(resultado, pd.DataFrame):
+        return tabela_para_registros(resultado)
+    if isinstance(resultado, dict):
+        return {str(chave): para_json(valor) for chave, valor in resultado.items()}
+    if isinstance(resultado, (list, tuple)):
+        return [para_json(valor) for valor in resultado]
+    if hasattr(resultado, 'item'):
+        # Escalares NumPy (np.int64, np.float32, np.bool_...)
+        return resultado.item()
+    return resultado
+
+
+def salvar_json(resultado, arquivo):
+    """Grava o resultado como JSON legível (UTF-8)."""
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        json.dump(para_json(resultado), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,334 @@
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from botes import IndiceBotes
+from carregador import BOTES, ESQUEMA, carregar_dados, colunas_idade
+from cubo_sobrevivencia import IDADES, LADO_DO_BOTE, LADOS_BOTE
+from resultados import para_json
+
+# Número máximo de respostas de consultas guardadas em memória
+TAMANHO_CACHE_PADRAO = 1024
+
+# Colunas derivadas pelo carregador (ou por este serviço) que também podem ser consultadas
+COLUNAS_DERIVADAS = {'titulo': 'category', 'is_child': 'bool', 'categoria_idade': 'category',
+                     'age_imputada': 'float32', 'idade_imputada': 'bool', 'tamanho_familia': 'category',
+                     'bote': 'category', 'em_bote': 'bool', 'lado_bote': 'category'}
+
+# Parâmetros da URL que não são filtros
+PARAMETROS_RESERVADOS = {'agrupar', 'idades'}
+
+# Colunas devolvidas para cada ocupante em GET /botes/<bote>
+COLUNAS_OCUPANTES = ['name', 'sex', 'age', 'age_imputada', 'idade_imputada', 'pclass', 'survived']
+
+
+def _tipos_colunas():
+    return {**{nome: coluna['tipo'] for nome, coluna in ESQUEMA.items()}, **COLUNAS_DERIVADAS}
+
+
+def _converter_valor(coluna, tipo, valor):
+    """Converte um valor vindo da URL ou do JSON para o tipo da coluna."""
+    if valor is None:
+        return None
+    try:
+        if tipo == 'bool':
+            if isinstance(valor, str):
+                if valor.lower() in ('true', '1', 'sim'):
+                    return True
+                if valor.lower() in ('false', '0', 'nao', 'não'):
+                    return False
+                raise ValueError
+            return bool(valor)
+        if tipo == 'int8':
+            return int(valor)
+        if tipo == 'float32':
+            return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para '{coluna}': {valor!r}") from None
+    return str(valor)
+
+
+class ServicoConsultas:
+    """Mantém o manifesto em memória e responde consultas de sobrevivência com cache LRU."""
+
+    def __init__(self, arquivo, tamanho_cache=TAMANHO_CACHE_PADRAO):
+        self.arquivo = arquivo
+        self.tamanho_cache = tamanho_cache
+        self.tipos = _tipos_colunas()
+        self._trava = threading.Lock()
+        self._cache = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.versao = 0
+        self.df = None
+        self.indice_botes = None
+        self.colunas_idades = None
+        self.recarregar()
+
+    def recarregar(self):
+        """Relê o manifesto (via carregar_dados) e descarta as respostas em cache."""
+        df = carregar_dados(self.arquivo)
+        df['em_bote'] = df['bote'].notna()
+        df['lado_bote'] = pd.Categorical(df['bote'].map(LADO_DO_BOTE), categories=LADOS_BOTE)
+        indice = IndiceBotes.dos_dados(df)
+        # Colunas de idade que substituem as de `df` em cada visão (veja consultar)
+        colunas_idades = {
+            'observadas': {},
+            'imputadas': {'age': df['age_imputada'], **colunas_idade(df['age_imputada'])},
+        }
+        with self._trava:
+            self.df = df
+            self.indice_botes = indice
+            self.colunas_idades = colunas_idades
+            self._cache.clear()
+            self.versao += 1
+        return {'arquivo': self.arquivo, 'linhas': len(df), 'versao': self.versao}
+
+    def normalizar(self, filtros, agrupar):
+        """Valida colunas e valores e devolve a consulta em forma canônica (usada como chave do cache)."""
+        desconhecidas = [c for c in [*filtros, *agrupar] if c not in self.tipos]
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas: {desconhecidas}. Disponíveis: {sorted(self.tipos)}")
+
+        normalizados = {}
+        for coluna, condicao in filtros.items():
+            tipo = self.tipos[coluna]
+            if isinstance(condicao, dict):
+                # Intervalo numérico: {"min": ..., "max": ...} (limites inclusivos)
+                if tipo not in ('int8', 'float32') or not set(condicao) <= {'min', 'max'}:
+                    raise ValueError(f"Intervalo só é aceito em colunas numéricas, com 'min' e/ou 'max': '{coluna}'")
+                normalizados[coluna] = {k: _converter_valor(coluna, tipo, v) for k, v in sorted(condicao.items())}
+            else:
+                valores = condicao if isinstance(condicao, list) else [condicao]
+                convertidos = {_converter_valor(coluna, tipo, v) for v in valores}
+                normalizados[coluna] = sorted(convertidos, key=lambda v: (v is None, str(v)))
+        return dict(sorted(normalizados.items())), list(agrupar)
+
+    @staticmethod
+    def _linhas_dos_botes(indice, filtros):
+        """Posições das linhas nos botes permitidos pelos filtros 'bote' e 'lado_bote', pelo índice.
+
+        Devolve None quando a consulta não restringe os botes (ou aceita quem
+        não estava em bote), e então o manifesto inteiro é filtrado.
+        """
+        botes = set(BOTES)
+        for coluna, valores_do_bote in (('bote', lambda b: b), ('lado_bote', LADO_DO_BOTE.get)):
+            condicao = filtros.get(coluna)
+            if condicao is None:
+                continue
+            if None in condicao:
+                return None
+            botes &= {b for b in BOTES if valores_do_bote(b) in condicao}
+        if len(botes) == len(BOTES):
+            return None
+        return np.sort(np.concatenate([np.empty(0, dtype=np.intp), *[indice.linhas(b) for b in BOTES if b in botes]]))
+
+    def _calcular(self, df, indice, filtros, agrupar, idades, substitutas):
+        linhas = self._linhas_dos_botes(indice, filtros)
+
+        def coluna_consultada(nome):
+            serie = substitutas[nome] if nome in substitutas else df[nome]
+            # Só os ocupantes dos botes pedidos são filtrados, sem percorrer o manifesto
+            return serie if linhas is None else serie.iloc[linhas]
+
+        mascara = pd.Series(True, index=df.index if linhas is None else df.index[linhas])
+        for coluna, condicao in filtros.items():
+            serie = coluna_consultada(coluna)
+            if isinstance(condicao, dict):
+                if 'min' in condicao:
+                    mascara &= serie >= condicao['min']
+                if 'max' in condicao:
+                    mascara &= serie <= condicao['max']
+            else:
+                valores = [v for v in condicao if v is not None]
+                selecionados = serie.isin(valores)
+                if None in condicao:
+                    selecionados |= serie.isna()
+                mascara &= selecionados
+
+        selecao = pd.DataFrame({c: coluna_consultada(c) for c in [*agrupar, 'survived']})[mascara]
+        if agrupar:
+            grupos = selecao.groupby(agrupar, observed=True, dropna=False)['survived'].agg(['sum', 'count'])
+            tabela = grupos.reset_index().rename(columns={'sum': 'sobreviventes', 'count': 'total'})
+        else:
+            tabela = pd.DataFrame({'sobreviventes': [int(selecao['survived'].sum())], 'total': [len(selecao)]})
+        tabela['taxa_sobrevivencia'] = tabela['sobreviventes'] / tabela['total'] * 100
+        return {
+            'filtros': filtros,
+            'agrupar': agrupar,
+            'idades': idades,
+            'total': int(tabela['total'].sum()),
+            'grupos': para_json(tabela.astype(object).where(tabela.notna(), None)),
+        }
+
+    def consultar(self, filtros=None, agrupar=(), idades='observadas'):
+        """Taxa de sobrevivência das linhas que atendem aos filtros, opcionalmente por grupo.
+
+        Como em CuboSobrevivencia.com_idades, `idades` escolhe a visão das colunas
+        'age', 'is_child' e 'categoria_idade': 'observadas' (padrão) deixa sem
+        idade quem não a tem registrada, e 'imputadas' usa as idades estimadas.
+        """
+        if idades not in IDADES:
+            raise ValueError(f"Opção de idades desconhecida: {idades!r} (use {' ou '.join(IDADES)})")
+        filtros, agrupar = self.normalizar(filtros or {}, agrupar)
+        chave = json.dumps([filtros, agrupar, idades], sort_keys=True, default=str)
+
+        with self._trava:
+            df, indice, versao = self.df, self.indice_botes, self.versao
+            substitutas = self.colunas_idades[idades]
+            if chave in self._cache:
+                self._cache.move_to_end(chave)
+                self.acertos += 1
+                return {**self._cache[chave], 'cache': True}
+            self.falhas += 1
+
+        resposta = self._calcular(df, indice, filtros, agrupar, idades, substitutas)
+        with self._trava:
+            # Uma recarga durante o cálculo torna a resposta obsoleta para o cache
+            if versao == self.versao:
+                self._cache[chave] = resposta
+                while len(self._cache) > self.tamanho_cache:
+                    self._cache.popitem(last=False)
+        return {**resposta, 'cache': False}
+
+    def ocupantes(self, bote):
+        """Ocupantes registrados de um bote (posições tiradas do índice de botes), com o bordo e a sobrevivência."""
+        bote = str(bote).upper()
+        if bote not in BOTES:
+            raise ValueError(f"Bote desconhecido: {bote!r} (use {', '.join(BOTES)})")
+        with self._trava:
+            df, indice = self.df, self.indice_botes
+        ocupantes = indice.ocupantes(df, bote)[COLUNAS_OCUPANTES]
+        return {
+            'bote': bote,
+            'bordo': LADO_DO_BOTE[bote],
+            'total': len(ocupantes),
+            'sobreviventes': int(ocupantes['survived'].sum()),
+            'ocupantes': para_json(ocupantes.astype(object).where(ocupantes.notna(), None)),
+        }
+
+    def estado(self):
+        with self._trava:
+            return {
+                'arquivo': self.arquivo,
+                'linhas': len(self.df),
+                'versao': self.versao,
+                'colunas': sorted(self.tipos),
+                'cache': {'itens': len(self._cache), 'limite': self.tamanho_cache,
+                          'acertos': self.acertos, 'falhas': self.falhas},
+            }
+
+
+def _consulta_da_url(parametros):
+    agrupar = [c for valor in parametros.get('agrupar', []) for c in valor.split(',') if c]
+    idades = parametros.get('idades', ['observadas'])[-1]
+    filtros = {
+        coluna: valores if len(valores) > 1 else valores[0]
+        for coluna, valores in parametros.items() if coluna not in PARAMETROS_RESERVADOS
+    }
+    return filtros, agrupar, idades
+
+
+class ManipuladorConsultas(BaseHTTPRequestHandler):
+    """Rotas: GET /saude, GET|POST /consulta, GET /botes/<bote> e POST /recarregar."""
+
+    servico = None
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _executar(self, acao):
+        try:
+            self._responder(200, acao())
+        except ValueError as e:
+            self._responder(400, {'erro': str(e)})
+        except Exception as e:
+            self._responder(500, {'erro': f"{type(e).__name__}: {e}"})
+
+    def _ler_json(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if not tamanho:
+            return {}
+        try:
+            corpo = json.loads(self.rfile.read(tamanho))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}") from None
+        if not isinstance(corpo, dict):
+            raise ValueError("O corpo da requisição deve ser um objeto JSON")
+        return corpo
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/saude':
+            self._executar(self.servico.estado)
+        elif url.path == '/consulta':
+            filtros, agrupar, idades = _consulta_da_url(parse_qs(url.query, keep_blank_values=True))
+            self._executar(lambda: self.servico.consultar(filtros, agrupar, idades))
+        elif url.path.startswith('/botes/'):
+            bote = url.path[len('/botes/'):]
+            self._executar(lambda: self.servico.ocupantes(bote))
+        else:
+            self._responder(404, {'erro': f"Rota desconhecida: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path == '/consulta':
+            def consultar():
+                corpo = self._ler_json()
+                return self.servico.consultar(corpo.get('filtros', {}), corpo.get('agrupar', []),
+                                              corpo.get('idades', 'observadas'))
+            self._executar(consultar)
+        elif url.path == '/recarregar':
+            self._executar(self.servico.recarregar)
+        else:
+            self._responder(404, {'erro': f"Rota desconhecida: {url.path}"})
+
+    def log_message(self, formato, *args):
+        # Sem uma linha de log por requisição; erros são devolvidos no JSON
+        pass
+
+
+def criar_servidor(arquivo, host='127.0.0.1', porta=8000, tamanho_cache=TAMANHO_CACHE_PADRAO):
+    """Cria o servidor HTTP (porta 0 escolhe uma porta livre, útil em testes)."""
+    servico = ServicoConsultas(arquivo, tamanho_cache)
+    manipulador = type('Manipulador', (ManipuladorConsultas,), {'servico': servico})
+    return ThreadingHTTPServer((host, porta), manipulador)
+
+
+def iniciar_em_segundo_plano(arquivo, host='127.0.0.1', porta=0, **opcoes):
+    """Inicia o servidor em uma thread e devolve-o; encerre com `servidor.shutdown()`."""
+    servidor = criar_servidor(arquivo, host, porta, **opcoes)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON de consultas de sobrevivência do Titanic")
+    parser.add_argument('arquivo', nargs='?', default='titanic3.csv',
+                        help="CSV do manifesto (separado por ';'), comprimido ou não, ou padrão glob das partes")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço em que o serviço escuta")
+    parser.add_argument('--porta', type=int, default=8000, help="Porta HTTP")
+    parser.add_argument('--tamanho-cache', type=int, default=TAMANHO_CACHE_PADRAO,
+                        help="Número máximo de respostas guardadas no cache LRU")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.arquivo, args.host, args.porta, args.tamanho_cache)
+    host, porta = servidor.server_address[:2]
+    print(f"Servindo consultas em http://{host}:{porta} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório, sem pacote
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MANIFESTO = os.path.join(RAIZ, 'titanic3.csv')
+
+# Casos de borda: idade, embarque e bote ausentes, código com mais de um bote,
+# texto ausente ('NA') e nenhuma quebra de linha depois da última linha
+CSV_BORDA = (
+    "pclass;survived;name;sex;age;sibsp;parch;ticket;fare;cabin;embarked;boat;body;home.dest\n"
+    "1;1;Smith, Mrs. Anna;female;38;1;0;PC 1;71,2833;C85;C;4;;New York, NY\n"
+    "1;0;Smith, Mr. John;male;;1;0;PC 1;71,2833;C85;C;;135;New York, NY\n"
+    "1;1;Brown, Miss. Clara;female;;0;0;113;26,55;NA;;13 15;;\n"
+    "2;1;Silva, Master. Pedro;male;0,8333;1;1;248;29;;S;C D;;Lisboa\n"
+    "2;0;Silva, Mr. Paulo;male;;1;1;248;29;;S;;;Lisboa\n"
+    "2;1;Jones, Mrs. Mary;female;27;0;2;250;23;;Q;10;;\n"
+    "3;0;Kelly, Mr. James;male;34,5;0;0;330911;7,8292;;Q;;;\n"
+    "3;1;Kelly, Miss. Anne;female;;0;0;330912;7,75;;;15;;\n"
+    "3;0;Olsen, Mr. Karl;male;-1;4;2;347082;31,275;;S;;;\n"
+    "3;0;Olsen, Master. Erik;male;;4;2;347082;31,275;;S;;;"
+)
+
+
+@pytest.fixture
+def csv_borda(tmp_path):
+    caminho = tmp_path / 'borda.csv'
+    caminho.write_text(CSV_BORDA, encoding='utf-8')
+    return str(caminho)
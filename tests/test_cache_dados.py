@@ -0,0 +1,40 @@
+import os
+
+import imputacao
+from cache_dados import carregar_com_cache, estatisticas
+from carregador import _argumentos_cache, preprocessar_dados
+
+
+def _entradas(diretorio_cache):
+    return sorted(os.listdir(diretorio_cache))
+
+
+def test_poda_das_entradas_obsoletas(tmp_path, csv_borda):
+    cache = str(tmp_path / 'cache')
+    outro = tmp_path / 'outro.csv'
+    outro.write_text(open(csv_borda, encoding='utf-8').read().rsplit('\n', 1)[0], encoding='utf-8')
+    os.makedirs(os.path.join(cache, 'etapas'))
+
+    carregar_com_cache(csv_borda, preprocessar_dados, 1, cache)
+    carregar_com_cache(str(outro), preprocessar_dados, 1, cache)
+    inicial = _entradas(cache)
+    assert len(inicial) == 3
+
+    # Conteúdo novo do mesmo manifesto substitui só a entrada dele
+    with open(csv_borda, 'a', encoding='utf-8') as f:
+        f.write("\n3;0;Novo, Mr. Ivo;male;40;0;0;1;8;;S;;;\n")
+    carregar_com_cache(csv_borda, preprocessar_dados, 1, cache)
+    depois = _entradas(cache)
+    assert len(depois) == 3 and 'etapas' in depois
+    assert len(set(depois) & set(inicial)) == 2
+
+    # Outra versão da limpeza descarta as entradas de todos os manifestos
+    removidas = estatisticas['removidas']
+    carregar_com_cache(str(outro), preprocessar_dados, 2, cache)
+    assert len(_entradas(cache)) == 2
+    assert estatisticas['removidas'] == removidas + 2
+
+
+def test_chave_inclui_os_modulos_de_limpeza():
+    # Constantes e funções auxiliares (REGEX_TITULO, medianas_idade, ...) fazem parte da chave
+    assert imputacao in _argumentos_cache()[2]
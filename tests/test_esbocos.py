@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import MANIFESTO
+from carregador import carregar_dados
+from esbocos import (
+    QUANTIS_PADRAO, EsbocoQuantis, EsbocosManifesto, HyperLogLog, comparar_com_exato, esbocos_do_arquivo,
+    erro_padrao_hll, erro_rank_kll,
+)
+
+
+@pytest.fixture(scope='module')
+def dados():
+    return carregar_dados(MANIFESTO, usar_cache=False)
+
+
+def test_erros_dentro_dos_limites(dados):
+    comparacao = comparar_com_exato(esbocos_do_arquivo(MANIFESTO), dados)
+    assert comparacao['limites']['erro_rank'] == pytest.approx(erro_rank_kll(200))
+    assert comparacao['limites']['erro_relativo_distintos'] == pytest.approx(3 * erro_padrao_hll(14))
+    assert comparacao['quantis']['Dentro do limite'].all()
+    assert comparacao['distintos']['Dentro do limite'].all()
+
+
+def test_mesclar_partes_igual_ao_manifesto_inteiro(dados, tmp_path):
+    with open(MANIFESTO, 'rb') as f:
+        cabecalho, *linhas = f.read().splitlines(keepends=True)
+    metade = len(linhas) // 2
+    (tmp_path / 'parte_1.csv').write_bytes(cabecalho + b''.join(linhas[:metade]))
+    (tmp_path / 'parte_2.csv').write_bytes(cabecalho + b''.join(linhas[metade:]))
+
+    inteiro = esbocos_do_arquivo(MANIFESTO)
+    partes = esbocos_do_arquivo(str(tmp_path / 'parte_*.csv'), processos=2)
+    assert partes.linhas == inteiro.linhas
+    for coluna, esboco in inteiro.distintos.items():
+        np.testing.assert_array_equal(partes.distintos[coluna].registradores, esboco.registradores)
+    for chave, esboco in inteiro.quantis.items():
+        assert partes.quantis[chave].n == esboco.n
+    assert comparar_com_exato(partes, dados)['quantis']['Dentro do limite'].all()
+
+
+def test_mesclar_quantis_sem_compactacao_e_exato():
+    valores = np.random.default_rng(1).gamma(2.0, 15.0, size=1_000)
+    inteiro = EsbocoQuantis(k=2_000).atualizar(valores)
+    mesclado = EsbocoQuantis(k=2_000).atualizar(valores[:400]).mesclar(EsbocoQuantis(k=2_000).atualizar(valores[400:]))
+    np.testing.assert_array_equal(mesclado.quantis(QUANTIS_PADRAO), inteiro.quantis(QUANTIS_PADRAO))
+    np.testing.assert_array_equal(inteiro.quantis([0.5]), np.sort(valores)[[499]])
+
+
+def test_mesclar_esbocos_de_blocos(dados):
+    inteiro = EsbocosManifesto().atualizar(dados)
+    mesclado = EsbocosManifesto(semente=1).atualizar(dados.iloc[:700]).mesclar(
+        EsbocosManifesto(semente=2).atualizar(dados.iloc[700:])
+    )
+    assert mesclado.tabela_distintos().equals(inteiro.tabela_distintos())
+    assert comparar_com_exato(mesclado, dados)['quantis']['Dentro do limite'].all()
+
+
+def test_hyperloglog_limite_em_muitos_distintos():
+    valores = pd.Series(np.arange(200_000).astype(str))
+    estimativa = HyperLogLog().atualizar(valores).estimativa()
+    assert abs(estimativa - len(valores)) / len(valores) <= 3 * erro_padrao_hll(14)
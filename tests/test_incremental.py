@@ -0,0 +1,64 @@
+import numpy as np
+
+from conftest import MANIFESTO
+from carregador import carregar_dados
+from cubo_sobrevivencia import construir_cubo
+from incremental import TAMANHO_JANELA, atualizar_cubo
+
+
+def test_acrescimos_sem_reconstrucao(tmp_path, capsys):
+    with open(MANIFESTO, 'rb') as f:
+        linhas = f.read().splitlines(keepends=True)
+    arquivo = tmp_path / 'manifesto.csv'
+    inicio = len(linhas) - 200
+    arquivo.write_bytes(b''.join(linhas[:inicio]))
+    atualizar_cubo(str(arquivo))
+
+    # Acréscimos de 50 linhas mudam as medianas de imputação, mas não exigem reler o arquivo
+    for i in range(inicio, len(linhas), 50):
+        with open(arquivo, 'ab') as f:
+            f.write(b''.join(linhas[i:i + 50]))
+        capsys.readouterr()
+        cubo = atualizar_cubo(str(arquivo))
+        assert 'Reconstruindo' not in capsys.readouterr().out
+        referencia = construir_cubo(carregar_dados(str(arquivo), usar_cache=False))
+        np.testing.assert_array_equal(cubo.totais, referencia.totais)
+        np.testing.assert_array_equal(cubo.sobreviventes, referencia.sobreviventes)
+
+
+def test_edicao_antiga_do_mesmo_tamanho(tmp_path, capsys):
+    with open(MANIFESTO, 'rb') as f:
+        conteudo = f.read()
+    arquivo = tmp_path / 'manifesto.csv'
+    arquivo.write_bytes(conteudo)
+    atualizar_cubo(str(arquivo))
+
+    # Inverte 'survived' da primeira linha: fora da janela conferida e sem mudar o tamanho
+    posicao = conteudo.index(b'\n') + 3
+    assert len(conteudo) - posicao > TAMANHO_JANELA
+    arquivo.write_bytes(conteudo[:posicao] + (b'0' if conteudo[posicao:posicao + 1] == b'1' else b'1')
+                        + conteudo[posicao + 1:])
+    capsys.readouterr()
+    cubo = atualizar_cubo(str(arquivo))
+    assert 'o conteúdo já processado foi alterado' in capsys.readouterr().out
+    referencia = construir_cubo(carregar_dados(str(arquivo), usar_cache=False))
+    np.testing.assert_array_equal(cubo.sobreviventes, referencia.sobreviventes)
+
+
+def test_ultima_linha_sem_quebra_final(csv_borda, capsys):
+    def conferir(cubo):
+        referencia = construir_cubo(carregar_dados(csv_borda, usar_cache=False))
+        np.testing.assert_array_equal(cubo.totais, referencia.totais)
+        np.testing.assert_array_equal(cubo.sobreviventes, referencia.sobreviventes)
+
+    # A última linha entra no cubo como na leitura completa, mas o estado para antes dela
+    conferir(atualizar_cubo(csv_borda))
+    conferir(atualizar_cubo(csv_borda))
+
+    # Completada por um acréscimo, ela é lida de novo uma única vez
+    with open(csv_borda, 'a', encoding='utf-8') as f:
+        f.write("\n3;1;Novo, Mr. Ivo;male;40;0;0;1;8;;S;C;;\n")
+    capsys.readouterr()
+    cubo = atualizar_cubo(csv_borda)
+    assert 'Reconstruindo' not in capsys.readouterr().out
+    conferir(cubo)
@@ -0,0 +1,37 @@
+import pickle
+
+import numpy as np
+
+from conftest import MANIFESTO
+from cache_dados import ColunasMapeadas, salvar_colunas
+from carregador import carregar_dados
+from intervalos import bootstrap_linhas
+
+
+def diferenca_tarifa_mediana(df):
+    """Tarifa mediana dos sobreviventes menos a dos mortos (não sai do cubo de contagens)."""
+    sobreviveu = df['survived'].to_numpy(dtype=bool)
+    tarifas = df['fare'].to_numpy(dtype=float)
+    return np.nanmedian(tarifas[sobreviveu]) - np.nanmedian(tarifas[~sobreviveu])
+
+
+def test_bootstrap_linhas_com_colunas_mapeadas(tmp_path):
+    df = carregar_dados(MANIFESTO, usar_cache=False)
+    salvar_colunas(df, str(tmp_path / 'colunas'))
+    colunas = ColunasMapeadas(str(tmp_path / 'colunas'))
+
+    # Os processos recebem só o caminho, não os dados
+    assert len(pickle.dumps(colunas)) < 1_000
+
+    # Mesma semente, mesmas reamostras, seja a origem um DataFrame ou as colunas mapeadas
+    em_memoria = bootstrap_linhas(df, diferenca_tarifa_mediana, n_reamostras=40, processos=1)
+    mapeadas = bootstrap_linhas(colunas, diferenca_tarifa_mediana, n_reamostras=40, processos=1)
+    np.testing.assert_allclose(em_memoria, mapeadas)
+
+    paralelo = bootstrap_linhas(colunas, diferenca_tarifa_mediana, n_reamostras=40, processos=2)
+    assert paralelo.shape == (40,)
+    np.testing.assert_allclose(
+        paralelo, bootstrap_linhas(colunas, diferenca_tarifa_mediana, n_reamostras=40, processos=2))
+
+    inferior, superior = np.quantile(paralelo, [0.025, 0.975])
+    assert inferior <= diferenca_tarifa_mediana(df) <= superior
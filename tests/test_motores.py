@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from conftest import MANIFESTO
+from carregador import carregar_dados
+from cubo_sobrevivencia import construir_cubo, construir_cubo_em_blocos
+from motores import construir_cubo_csv
+
+
+def _cubo_pandas(arquivo):
+    return construir_cubo(carregar_dados(arquivo, usar_cache=False))
+
+
+def _assert_cubos_iguais(cubo, referencia):
+    assert cubo.dimensoes == referencia.dimensoes
+    np.testing.assert_array_equal(cubo.totais, referencia.totais)
+    np.testing.assert_array_equal(cubo.sobreviventes, referencia.sobreviventes)
+
+
+@pytest.fixture(params=['manifesto', 'borda'])
+def arquivo(request, csv_borda):
+    return MANIFESTO if request.param == 'manifesto' else csv_borda
+
+
+@pytest.mark.parametrize('motor', ['paralelo', 'duckdb', 'polars'])
+def test_motor_igual_ao_pandas(arquivo, motor):
+    if motor != 'paralelo':
+        pytest.importorskip(motor)
+    _assert_cubos_iguais(construir_cubo_csv(arquivo, motor, processos=2), _cubo_pandas(arquivo))
+
+
+def test_blocos_igual_ao_pandas(arquivo):
+    _assert_cubos_iguais(construir_cubo_em_blocos(arquivo, 3), _cubo_pandas(arquivo))
+
+
+def test_borda_conta_todas_as_linhas(csv_borda):
+    cubo = _cubo_pandas(csv_borda)
+    assert cubo.total_registros == 10
+    assert int(cubo.sobreviventes.sum()) == 5
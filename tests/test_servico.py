@@ -0,0 +1,92 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import MANIFESTO
+from cubo_sobrevivencia import IDADES, construir_cubo
+from servico import ServicoConsultas, iniciar_em_segundo_plano
+
+
+@pytest.fixture(scope='module')
+def servico():
+    return ServicoConsultas(MANIFESTO)
+
+
+@pytest.mark.parametrize('filtros', [
+    {'bote': ['13', 'C']},
+    {'lado_bote': 'Bombordo', 'sex': 'male'},
+    {'bote': ['1', '2'], 'lado_bote': 'Estibordo'},
+])
+def test_consulta_pelo_indice_de_botes(servico, filtros):
+    resposta = servico.consultar(filtros, ['pclass'])
+    normalizados, _ = servico.normalizar(filtros, [])
+    assert servico._linhas_dos_botes(servico.indice_botes, normalizados) is not None
+
+    # Mesmo resultado que filtrar o manifesto inteiro
+    mascara = True
+    for coluna, valores in normalizados.items():
+        mascara = mascara & servico.df[coluna].isin(valores)
+    esperado = servico.df[mascara].groupby('pclass')['survived'].agg(['sum', 'count'])
+    assert resposta['total'] == esperado['count'].sum()
+    assert {g['pclass']: (g['sobreviventes'], g['total']) for g in resposta['grupos']} == {
+        pclass: (linha['sum'], linha['count']) for pclass, linha in esperado.iterrows() if linha['count']
+    }
+
+
+def test_ocupantes_do_bote(servico):
+    resposta = servico.ocupantes('13')
+    esperados = servico.df[servico.df['bote'] == '13']
+    assert resposta['bordo'] == 'Estibordo'
+    assert resposta['total'] == len(esperados)
+    assert resposta['sobreviventes'] == esperados['survived'].sum()
+    assert [o['name'] for o in resposta['ocupantes']] == esperados['name'].tolist()
+    with pytest.raises(ValueError):
+        servico.ocupantes('17')
+
+
+def test_visoes_de_idade(servico):
+    # 'age' guarda só as idades observadas; a estimativa fica em 'age_imputada'
+    assert servico.df['age'].isna().sum() == servico.df['idade_imputada'].sum()
+    criancas = {'categoria_idade': 'Criança (0-12)'}
+    cubo = construir_cubo(servico.df)
+    for idades in IDADES:
+        resposta = servico.consultar(criancas, idades=idades)
+        assert resposta['total'] == cubo.com_idades(idades).consultar(criancas)[1]
+    assert servico.consultar(criancas)['total'] < servico.consultar(criancas, idades='imputadas')['total']
+    with pytest.raises(ValueError):
+        servico.consultar(criancas, idades='todas')
+
+
+def _requisicao(servidor, caminho, corpo=None):
+    host, porta = servidor.server_address[:2]
+    dados = None if corpo is None else corpo.encode('utf-8')
+    try:
+        with urllib.request.urlopen(f"http://{host}:{porta}{caminho}", data=dados, timeout=30) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as e:
+        with e:
+            return e.code, json.loads(e.read())
+
+
+def test_servidor_http(servico):
+    servidor = iniciar_em_segundo_plano(MANIFESTO)
+    try:
+        status, resposta = _requisicao(servidor, '/consulta?sex=female&agrupar=pclass')
+        assert status == 200
+        assert resposta == json.loads(json.dumps(servico.consultar({'sex': 'female'}, ['pclass'])))
+        assert sum(g['total'] for g in resposta['grupos']) == resposta['total'] > 0
+
+        status, resposta = _requisicao(servidor, '/consulta', json.dumps({'filtros': {'bote': '13'}}))
+        assert status == 200 and resposta['total'] == servico.ocupantes('13')['total']
+
+        for caminho, corpo in [('/consulta?idades=todas', None), ('/consulta', '{invalido'),
+                               ('/botes/17', None)]:
+            status, resposta = _requisicao(servidor, caminho, corpo)
+            assert status == 400 and resposta['erro']
+        status, resposta = _requisicao(servidor, '/inexistente')
+        assert status == 404 and '/inexistente' in resposta['erro']
+    finally:
+        servidor.shutdown()
+        servidor.server_close()